@@ -44,6 +44,21 @@ app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
 app.config['MAIL_FROM'] = os.environ.get('MAIL_FROM') or app.config['MAIL_USERNAME']
 app.config['MAIL_SUPPRESS_SEND'] = _env_bool('MAIL_SUPPRESS_SEND', app.debug or app.testing)
 
+# Background export jobs: worker threads per process, artifact directory and retention
+app.config['EXPORT_JOB_WORKERS'] = _env_int('EXPORT_JOB_WORKERS', 2)
+app.config['EXPORT_JOB_TTL_SECONDS'] = _env_int('EXPORT_JOB_TTL_SECONDS', 24 * 3600)
+app.config['EXPORT_JOB_DIR'] = os.environ.get('EXPORT_JOB_DIR') or os.path.join(app.instance_path, 'exports')
+# Version-keyed export artifact cache; set EXPORT_CACHE_MAX_BYTES=0 to disable
+app.config['EXPORT_CACHE_MAX_BYTES'] = _env_int('EXPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+app.config['EXPORT_CACHE_DIR'] = os.environ.get('EXPORT_CACHE_DIR') or os.path.join(app.instance_path, 'export_cache')
+# Studies per page on the project page
+app.config['STUDY_PAGE_SIZE'] = max(1, _env_int('STUDY_PAGE_SIZE', 50))
+# Projects per page on the dashboard
+app.config['DASHBOARD_PAGE_SIZE'] = max(1, _env_int('DASHBOARD_PAGE_SIZE', 50))
+# Per-process cache of logged-in users (seconds; 0 disables) and its shared invalidation stamps
+app.config['USER_CACHE_TTL_SECONDS'] = _env_int('USER_CACHE_TTL_SECONDS', 60)
+app.config['USER_CACHE_DIR'] = os.environ.get('USER_CACHE_DIR') or os.path.join(app.instance_path, 'user_cache')
+
 # Database configuration: prefer DATABASE_URL (e.g., Railway Postgres), fallback to SQLite
 os.makedirs(app.instance_path, exist_ok=True)
 def _resolve_database_url() -> str | None:
@@ -122,8 +137,8 @@ from app import cli as _app_cli  # noqa: F401
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        from app.models import User
-        return User.query.get(int(user_id))
+        from app.user_cache import load_cached_user
+        return load_cached_user(int(user_id))
     except Exception:
         return None
 
@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from flask import g, has_request_context
+from flask_login import current_user
+from app import app
+from app.models import ProjectMembership
+
+# Authorization facts for the current user are resolved at most once per
+# project per request and memoized on flask.g, so route helpers, view code and
+# templates can all ask "may this user ...?" without re-querying memberships.
+
+
+@dataclass(frozen=True)
+class ProjectAccess:
+    project_id: int
+    is_admin: bool
+    membership: ProjectMembership | None
+
+    @property
+    def role(self) -> str:
+        return ((self.membership.role if self.membership else None) or '').lower()
+
+    @property
+    def is_owner(self) -> bool:
+        return self.role == 'owner'
+
+    @property
+    def is_member(self) -> bool:
+        return bool(self.membership and self.membership.is_member())
+
+    @property
+    def is_owner_or_admin(self) -> bool:
+        return self.is_admin or self.is_owner
+
+    @property
+    def can_view(self) -> bool:
+        return self.is_admin or self.membership is not None
+
+    @property
+    def role_label(self) -> str:
+        """Badge text shown next to the project title."""
+        if self.is_admin:
+            return 'Admin'
+        if self.membership and self.membership.role:
+            return self.membership.role.capitalize()
+        return ''
+
+
+def current_user_is_admin() -> bool:
+    return bool(getattr(current_user, 'is_authenticated', False) and getattr(current_user, 'is_admin', False))
+
+
+def _resolve(project_id: int) -> ProjectAccess:
+    membership = None
+    if getattr(current_user, 'is_authenticated', False):
+        membership = ProjectMembership.query.filter_by(user_id=current_user.id, project_id=project_id).first()
+    return ProjectAccess(project_id=project_id, is_admin=current_user_is_admin(), membership=membership)
+
+
+def project_access(project_id: int) -> ProjectAccess:
+    """Return the current user's access to a project, memoized for the request."""
+    if not has_request_context():
+        return _resolve(project_id)
+    cache = g.setdefault('_project_access', {})
+    access = cache.get(project_id)
+    if access is None:
+        access = cache[project_id] = _resolve(project_id)
+    return access
+
+
+@app.context_processor
+def _inject_project_access():
+    return {'project_access': project_access}
@@ -0,0 +1,569 @@
+import math
+from dataclasses import dataclass
+from operator import itemgetter
+import numpy as np
+from app import db
+from app.effect_sizes import (
+    CONTINUOUS_MEASURES,
+    DICHOTOMOUS_MEASURES,
+    OUTCOME_VALUE_COLUMNS,
+    RATIO_MEASURES,
+    STAT_SUMS,
+    load_effect_sizes,
+    value_array,
+)
+from app.models import ProjectOutcome, Study
+from app.outcomes import ROW_MODELS, outcome_key
+
+# Built-in meta-analysis of a project's outcomes. All outcome rows of one type
+# are read in one query into flat arrays, each row tagged with the index of the
+# outcome it belongs to, along with their stored per-study effect sizes (see
+# app.effect_sizes); every outcome is then pooled at once with np.bincount
+# over that index, so the cost does not grow with Python loops over studies.
+#
+# Each measure is pooled with fixed-effect inverse-variance (IV) and
+# random-effects models, dichotomous ones also with Mantel-Haenszel (MH) on
+# the raw counts, with Cochran's Q, I² and tau² as heterogeneity statistics.
+#
+# The between-study variance tau² comes from TAU2_ESTIMATORS: REML (the
+# default), Paule-Mandel or DerSimonian-Laird. The iterative ones run for all
+# outcomes in lockstep on the same flat arrays, each outcome leaving the loop
+# once its own iterate has converged.
+#
+# pool_outcome_sums() gives a cheaper running summary from the per-outcome
+# sums of app.effect_sizes: the fixed-effect estimate with Q, DL tau² and I².
+# The random-effects mean needs every study's weight 1 / (v + tau²) again, so
+# it is left to the full analysis.
+
+# Iterative tau² estimators stop once an iterate moves by less than
+# TAU2_TOLERANCE (relative above 1) or after TAU2_MAX_ITERATIONS rounds
+TAU2_TOLERANCE = 1e-10
+TAU2_MAX_ITERATIONS = 100
+# Two-sided 95% normal quantile
+Z_95 = 1.959963984540054
+
+
+@dataclass(frozen=True)
+class Estimate:
+    # On the reporting scale (exponentiated for ratio measures)
+    value: float | None
+    ci_low: float | None
+    ci_high: float | None
+    # On the analysis scale (log for ratio measures)
+    se: float | None
+    z: float | None = None
+    p_value: float | None = None
+
+
+@dataclass(frozen=True)
+class Heterogeneity:
+    q: float | None
+    df: int
+    i2: float | None
+    tau2: float | None
+    # Key of TAU2_ESTIMATORS, and whether its iterations converged
+    tau2_method: str
+    converged: bool
+
+
+@dataclass(frozen=True)
+class MeasureResult:
+    measure: str
+    # Studies that contributed to this measure
+    k: int
+    fixed: Estimate
+    # Mantel-Haenszel, dichotomous outcomes only
+    mh: Estimate | None
+    random: Estimate
+    heterogeneity: Heterogeneity
+
+
+@dataclass(frozen=True)
+class RunningPool:
+    """Fixed-effect pool of one declared outcome from its running sums."""
+    measure: str
+    k: int
+    fixed: Estimate
+    heterogeneity: Heterogeneity
+
+
+@dataclass(frozen=True)
+class StudyResult:
+    study_id: int
+    title: str
+    events_intervention: int | None
+    total_intervention: int | None
+    events_control: int | None
+    total_control: int | None
+    # measure -> Estimate, None when the study is left out of that measure
+    effects: dict
+    # measure -> share of the random-effects weight in percent
+    weights: dict
+
+
+@dataclass(frozen=True)
+class ContinuousStudyResult:
+    study_id: int
+    title: str
+    mean_intervention: float | None
+    sd_intervention: float | None
+    n_intervention: int | None
+    mean_control: float | None
+    sd_control: float | None
+    n_control: int | None
+    effects: dict
+    weights: dict
+
+
+@dataclass(frozen=True)
+class OutcomeAnalysis:
+    # None for outcome names recorded without a declared ProjectOutcome
+    outcome_id: int | None
+    name: str
+    # StudyResult or ContinuousStudyResult per outcome row
+    studies: tuple
+    # measure -> MeasureResult
+    measures: dict
+
+
+def _finite(value) -> float | None:
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _nullable(values) -> list:
+    """Array -> list of floats, with None for NaN and infinities."""
+    return np.where(np.isfinite(values), values, None).tolist()
+
+
+def _p_value(z: float) -> float:
+    return math.erfc(abs(z) / math.sqrt(2.0)) if math.isfinite(z) else math.nan
+
+
+def load_outcome_tables(project_id: int, outcome_type: str):
+    """Read a project's outcome rows of one type as arrays in two queries.
+
+    Returns ``(outcomes, studies, row_ids, group, values)``: ``outcomes``
+    lists ``(outcome_id, name)`` per outcome index, declared outcomes first by
+    name and then undeclared names; ``studies`` holds ``(study_id, title)``
+    per row; ``row_ids`` are the outcome row ids; ``group`` is the outcome
+    index of each row; ``values`` is a float array with one row per column of
+    OUTCOME_VALUE_COLUMNS[outcome_type], NaN where missing.
+    """
+    model = ROW_MODELS[outcome_type]
+    value_columns = OUTCOME_VALUE_COLUMNS[outcome_type]
+    declared = db.session.execute(
+        db.select(ProjectOutcome.id, ProjectOutcome.name)
+        .where(ProjectOutcome.project_id == project_id, ProjectOutcome.outcome_type == outcome_type)
+        .order_by(ProjectOutcome.name.asc(), ProjectOutcome.id.asc())
+    ).all()
+    outcomes = [(oid, name) for oid, name in declared]
+    index = {('id', oid): i for i, (oid, _name) in enumerate(outcomes)}
+    undeclared = {}
+
+    rows = db.session.execute(
+        db.select(
+            model.project_outcome_id,
+            model.outcome_name,
+            Study.id,
+            Study.title,
+            model.id,
+            *(getattr(model, column) for column in value_columns),
+        )
+        .join(Study, model.study_id == Study.id)
+        .where(Study.project_id == project_id)
+        .order_by(Study.id.asc(), model.id.asc())
+    ).all()
+
+    keys = []
+    for oid, name, *_rest in rows:
+        key = ('id', oid)
+        if key not in index:
+            key = ('name', outcome_key(name))
+            undeclared.setdefault(key, (name or '').strip())
+        keys.append(key)
+    # Undeclared names follow the declared outcomes, ordered by name
+    for key in sorted(undeclared, key=itemgetter(1)):
+        index[key] = len(outcomes)
+        outcomes.append((None, undeclared[key]))
+
+    studies = [(study_id, title) for _oid, _name, study_id, title, *_values in rows]
+    row_ids = np.fromiter((row[4] for row in rows), dtype=np.int64, count=len(rows))
+    group = np.fromiter((index[key] for key in keys), dtype=np.int64, count=len(keys))
+    values = value_array((row[5:] for row in rows), len(value_columns))
+    return outcomes, studies, row_ids, group, values
+
+
+def pool_inverse_variance(y, v, group, groups: int, tau2=None):
+    """Inverse-variance pooled mean and standard error of every group.
+
+    ``tau2`` (one value per group) turns the fixed-effect weights 1/v into
+    random-effects weights 1/(v + tau2). Returns ``(mu, se, weights)``.
+    """
+    w = 1.0 / (v if tau2 is None else v + tau2[group])
+    sw = np.bincount(group, w, groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = np.bincount(group, w * y, groups) / sw
+        se = 1.0 / np.sqrt(sw)
+    return mu, se, w
+
+
+def cochran_q(y, v, group, groups: int):
+    """Cochran's Q (about the fixed-effect mean) and the study count per group."""
+    w = 1.0 / v
+    k = np.bincount(group, minlength=groups)
+    sw = np.bincount(group, w, groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = np.bincount(group, w * y, groups) / sw
+    q = np.bincount(group, w * (y - mu[group]) ** 2, groups)
+    return np.where(k > 0, q, np.nan), k
+
+
+def i_squared(v, group, groups: int, tau2):
+    """I² in percent: tau² over tau² plus the typical within-study variance.
+
+    For the DerSimonian-Laird tau² this equals the familiar (Q - df) / Q.
+    """
+    w = 1.0 / v
+    k = np.bincount(group, minlength=groups)
+    sw = np.bincount(group, w, groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        typical = (k - 1) * sw / (sw * sw - np.bincount(group, w * w, groups))
+        i2 = 100.0 * tau2 / (tau2 + typical)
+    # Heterogeneity is undefined without at least two studies
+    return np.where(k > 1, i2, np.nan)
+
+
+def tau2_dersimonian_laird(y, v, group, groups: int):
+    """Method-of-moments tau² of every group; returns ``(tau2, converged)``."""
+    w = 1.0 / v
+    q, k = cochran_q(y, v, group, groups)
+    sw = np.bincount(group, w, groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = sw - np.bincount(group, w * w, groups) / sw
+        tau2 = np.where(scale > 0, np.maximum(0.0, (q - (k - 1)) / scale), 0.0)
+    return np.where(k > 0, tau2, np.nan), np.ones(groups, dtype=bool)
+
+
+def _iterate_tau2(step, y, v, group, groups: int, tau2, done):
+    """Run ``step`` for all groups in lockstep until each one converges.
+
+    ``step(y, v, group, tau2)`` returns the proposed change of every group's
+    tau² given the rows of the groups still iterating; iterates are kept
+    non-negative. Rows of converged groups are dropped from later rounds.
+    Returns ``(tau2, converged)``; groups that hit TAU2_MAX_ITERATIONS keep
+    their last iterate and are flagged unconverged.
+    """
+    tau2 = tau2.copy()
+    done = done.copy()
+    for _ in range(TAU2_MAX_ITERATIONS):
+        if done.all():
+            break
+        rows = ~done[group]
+        y, v, group = y[rows], v[rows], group[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = step(y, v, group, tau2)
+        active = ~done
+        new = np.where(active, np.maximum(0.0, tau2 + np.nan_to_num(change)), tau2)
+        done |= active & (np.abs(new - tau2) <= TAU2_TOLERANCE * np.maximum(1.0, tau2))
+        tau2 = new
+    return tau2, done
+
+
+def _reml_step(y, v, group, tau2):
+    """Newton step on the restricted log-likelihood (Viechtbauer, 2005).
+
+    Falls back to the Fisher scoring step where the log-likelihood is not
+    locally concave. Fisher scoring alone can oscillate for hundreds of
+    rounds when tau² is small.
+    """
+    groups = len(tau2)
+    w = 1.0 / (v + tau2[group])
+    sw = np.bincount(group, w, groups)
+    sw2 = np.bincount(group, w * w, groups)
+    sw3 = np.bincount(group, w * w * w, groups)
+    mu = np.bincount(group, w * y, groups) / sw
+    r = y - mu[group]
+    # With P = W - w w' / sum(w): y'PPy, y'PPPy, tr(P) and tr(PP)
+    ypy = np.bincount(group, (w * r) ** 2, groups)
+    yp3y = np.bincount(group, w ** 3 * r * r, groups) - np.bincount(group, w * w * r, groups) ** 2 / sw
+    trace_p = sw - sw2 / sw
+    trace_pp = sw2 - 2 * sw3 / sw + (sw2 / sw) ** 2
+    curvature = 2 * yp3y - trace_pp
+    return (ypy - trace_p) / np.where(curvature > 0, curvature, trace_pp)
+
+
+def _paule_mandel_step(y, v, group, tau2):
+    """Newton step towards the tau² at which the generalized Q equals k - 1."""
+    groups = len(tau2)
+    w = 1.0 / (v + tau2[group])
+    k = np.bincount(group, minlength=groups)
+    sw = np.bincount(group, w, groups)
+    mu = np.bincount(group, w * y, groups) / sw
+    r = y - mu[group]
+    q = np.bincount(group, w * r * r, groups)
+    # dQ/dtau² = -sum(w² r²); Q is convex and decreasing, so Newton steps from
+    # below never overshoot the root
+    return (q - (k - 1)) / np.bincount(group, (w * r) ** 2, groups)
+
+
+def tau2_reml(y, v, group, groups: int):
+    """Restricted maximum-likelihood tau² of every group, started from DL."""
+    start, _ = tau2_dersimonian_laird(y, v, group, groups)
+    k = np.bincount(group, minlength=groups)
+    tau2, converged = _iterate_tau2(_reml_step, y, v, group, groups, np.nan_to_num(start), k < 2)
+    return np.where(k > 0, np.where(k > 1, tau2, 0.0), np.nan), converged
+
+
+def tau2_paule_mandel(y, v, group, groups: int):
+    """Paule-Mandel tau² of every group, solved by Newton steps from zero."""
+    q, k = cochran_q(y, v, group, groups)
+    # Q(0) <= k - 1 means the root is at (or below) zero
+    done = (k < 2) | ~(q > k - 1)
+    tau2, converged = _iterate_tau2(_paule_mandel_step, y, v, group, groups, np.zeros(groups), done)
+    return np.where(k > 0, tau2, np.nan), converged
+
+
+# Between-study variance estimators by name; each returns (tau2, converged)
+TAU2_ESTIMATORS = {
+    'REML': tau2_reml,
+    'PM': tau2_paule_mandel,
+    'DL': tau2_dersimonian_laird,
+}
+DEFAULT_TAU2_ESTIMATOR = 'REML'
+
+
+def mantel_haenszel(measure: str, counts, group, groups: int):
+    """Mantel-Haenszel pooled estimate and standard error of every group.
+
+    Uses the uncorrected counts, with the Greenland-Robins variances (for OR
+    the Robins-Breslow-Greenland one). Ratio measures are on the log scale.
+    """
+    a, n1, c, n2 = counts
+    b, d = n1 - a, n2 - c
+    n = n1 + n2
+
+    def total(values):
+        return np.bincount(group, values, groups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if measure == 'RR':
+            r, s = total(a * n2 / n), total(c * n1 / n)
+            var = total((n1 * n2 * (a + c) - a * c * n) / (n * n)) / (r * s)
+            return np.log(r / s), np.sqrt(var)
+        if measure == 'OR':
+            ri, si = a * d / n, b * c / n
+            pi, qi = (a + d) / n, (b + c) / n
+            r, s = total(ri), total(si)
+            var = (
+                total(pi * ri) / (2 * r * r)
+                + total(pi * si + qi * ri) / (2 * r * s)
+                + total(qi * si) / (2 * s * s)
+            )
+            return np.log(r / s), np.sqrt(var)
+        w = total(n1 * n2 / n)
+        rd = total((a * n2 - c * n1) / n) / w
+        var = total((a * b * n2 ** 3 + c * d * n1 ** 3) / (n1 * n2 * n * n)) / (w * w)
+        return rd, np.sqrt(var)
+
+
+def _estimates(measure: str, mu, se, test: bool = True) -> list:
+    """Estimate objects for arrays of pooled (or per-study) values.
+
+    Values without a finite standard error (e.g. an MH ratio whose tables all
+    have an empty cell on one side) are reported as missing.
+    """
+    defined = np.isfinite(mu) & np.isfinite(se)
+    mu, se = np.where(defined, mu, np.nan), np.where(defined, se, np.nan)
+    low, high = mu - Z_95 * se, mu + Z_95 * se
+    if measure in RATIO_MEASURES:
+        value, low, high = np.exp(mu), np.exp(low), np.exp(high)
+    else:
+        value = mu
+    if not test:
+        return [
+            Estimate(value=v, ci_low=lo, ci_high=hi, se=e)
+            for v, lo, hi, e in zip(_nullable(value), _nullable(low), _nullable(high), _nullable(se))
+        ]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_values = np.where(se > 0, mu / se, np.nan)
+    p_values = [_finite(_p_value(z)) for z in z_values.tolist()]
+    return [
+        Estimate(value=v, ci_low=lo, ci_high=hi, se=e, z=z, p_value=pv)
+        for v, lo, hi, e, z, pv in zip(
+            _nullable(value), _nullable(low), _nullable(high), _nullable(se), _nullable(z_values), p_values
+        )
+    ]
+
+
+def _pool_measure(measure: str, effect, group, groups: int, mh=None, tau2_method: str = DEFAULT_TAU2_ESTIMATOR):
+    """Pool one measure over every outcome.
+
+    ``effect`` is a ``(y, v, include)`` triple; ``mh`` optionally computes
+    the Mantel-Haenszel ``(mu, se)`` from the include mask. Returns the
+    MeasureResult of every outcome, the Estimate (or None) of every row and
+    the random-effects weight percent of every row. The random-effects model
+    uses the ``tau2_method`` estimator of TAU2_ESTIMATORS.
+    """
+    y, v, include = effect
+    include = include & np.isfinite(y) & np.isfinite(v) & (v > 0)
+    yi, vi, gi = y[include], v[include], group[include]
+    k = np.bincount(gi, minlength=groups)
+    fixed_mu, fixed_se, _w = pool_inverse_variance(yi, vi, gi, groups)
+    q, _k = cochran_q(yi, vi, gi, groups)
+    df = np.maximum(k - 1, 0)
+    tau2, converged = TAU2_ESTIMATORS[tau2_method](yi, vi, gi, groups)
+    i2 = i_squared(vi, gi, groups, tau2)
+    random_mu, random_se, random_w = pool_inverse_variance(yi, vi, gi, groups, np.nan_to_num(tau2))
+    fixed = _estimates(measure, fixed_mu, fixed_se)
+    random = _estimates(measure, random_mu, random_se)
+    pooled_mh = _estimates(measure, *mh(include, gi)) if mh else [None] * groups
+    results = [
+        MeasureResult(
+            measure=measure,
+            k=int(k[j]),
+            fixed=fixed[j],
+            mh=pooled_mh[j],
+            random=random[j],
+            heterogeneity=Heterogeneity(
+                q=_finite(q[j]),
+                df=int(df[j]),
+                i2=_finite(i2[j]),
+                tau2=_finite(tau2[j]),
+                tau2_method=tau2_method,
+                converged=bool(converged[j]),
+            ),
+        )
+        for j in range(groups)
+    ]
+    per_study = _estimates(measure, y, np.sqrt(v), test=False)
+    weights = np.full(len(y), np.nan)
+    with np.errstate(invalid='ignore'):
+        weights[include] = random_w / np.bincount(gi, random_w, groups)[gi] * 100.0
+    return results, [e if ok else None for e, ok in zip(per_study, include)], weights
+
+
+def _analyze(outcomes, group, pooled: dict, make_study):
+    """Assemble OutcomeAnalysis objects from the pooled results of each measure."""
+    members = [[] for _ in outcomes]
+    for i, j in enumerate(group):
+        members[j].append(make_study(
+            i,
+            {m: per_study[i] for m, (_results, per_study, _weights) in pooled.items()},
+            {m: _finite(weights[i]) for m, (_results, _per_study, weights) in pooled.items()},
+        ))
+    return [
+        OutcomeAnalysis(
+            outcome_id=oid,
+            name=name,
+            studies=tuple(members[j]),
+            measures={m: results[j] for m, (results, _per_study, _weights) in pooled.items()},
+        )
+        for j, (oid, name) in enumerate(outcomes)
+    ]
+
+
+def _optional(value, cast=float):
+    return None if math.isnan(value) else cast(value)
+
+
+def analyze_dichotomous(project_id: int, tau2_method: str = DEFAULT_TAU2_ESTIMATOR) -> list:
+    """Pool every dichotomous outcome of a project with every measure and model."""
+    outcomes, studies, row_ids, group, counts = load_outcome_tables(project_id, 'dichotomous')
+    groups = len(outcomes)
+    effects = load_effect_sizes(project_id, 'dichotomous', row_ids)
+    pooled = {
+        measure: _pool_measure(
+            measure,
+            effects[measure],
+            group,
+            groups,
+            mh=lambda include, gi, measure=measure: mantel_haenszel(measure, counts[:, include], gi, groups),
+            tau2_method=tau2_method,
+        )
+        for measure in DICHOTOMOUS_MEASURES
+    }
+
+    def make_study(i, effects, weights):
+        a, n1, c, n2 = (_optional(x, int) for x in counts[:, i])
+        return StudyResult(
+            study_id=studies[i][0],
+            title=studies[i][1],
+            events_intervention=a,
+            total_intervention=n1,
+            events_control=c,
+            total_control=n2,
+            effects=effects,
+            weights=weights,
+        )
+
+    return _analyze(outcomes, group, pooled, make_study)
+
+
+def analyze_continuous(project_id: int, tau2_method: str = DEFAULT_TAU2_ESTIMATOR) -> list:
+    """Pool every continuous outcome of a project as MD and Hedges' g."""
+    outcomes, studies, row_ids, group, values = load_outcome_tables(project_id, 'continuous')
+    groups = len(outcomes)
+    effects = load_effect_sizes(project_id, 'continuous', row_ids)
+    pooled = {
+        measure: _pool_measure(measure, effects[measure], group, groups, tau2_method=tau2_method)
+        for measure in CONTINUOUS_MEASURES
+    }
+
+    def make_study(i, effects, weights):
+        m1, s1, n1, m2, s2, n2 = values[:, i]
+        return ContinuousStudyResult(
+            study_id=studies[i][0],
+            title=studies[i][1],
+            mean_intervention=_optional(m1),
+            sd_intervention=_optional(s1),
+            n_intervention=_optional(n1, int),
+            mean_control=_optional(m2),
+            sd_control=_optional(s2),
+            n_control=_optional(n2, int),
+            effects=effects,
+            weights=weights,
+        )
+
+    return _analyze(outcomes, group, pooled, make_study)
+
+
+def pool_outcome_sums(rows) -> dict:
+    """RunningPool of every outcome and measure from OutcomeEffectStats sums.
+
+    ``rows`` are ``(outcome_id, measure, k, *STAT_SUMS)`` as returned by
+    app.effect_sizes.get_outcome_effect_stats(). Returns ``{outcome_id:
+    {measure: RunningPool}}``. Q is expanded as sum(w y²) - sum(w y)² /
+    sum(w), which loses digits when the effects dwarf their spread; it is
+    clamped at zero.
+    """
+    if not rows:
+        return {}
+    k = np.array([row[2] for row in rows], dtype=float)
+    sw, swy, swy2, sw2 = (np.array([row[3 + i] for row in rows], dtype=float) for i in range(len(STAT_SUMS)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = np.where(k > 0, swy / sw, np.nan)
+        se = 1.0 / np.sqrt(sw)
+        q = np.where(k > 0, np.maximum(0.0, swy2 - swy * mu), np.nan)
+        scale = sw - sw2 / sw
+        tau2 = np.where(k > 0, np.where(scale > 0, np.maximum(0.0, (q - (k - 1)) / scale), 0.0), np.nan)
+        typical = (k - 1) * sw / (sw * sw - sw2)
+        i2 = np.where(k > 1, 100.0 * tau2 / (tau2 + typical), np.nan)
+    pools = {}
+    for j, (outcome_id, measure, *_sums) in enumerate(rows):
+        fixed, = _estimates(measure, mu[j:j + 1], se[j:j + 1])
+        pools.setdefault(outcome_id, {})[measure] = RunningPool(
+            measure=measure,
+            k=int(k[j]),
+            fixed=fixed,
+            heterogeneity=Heterogeneity(
+                q=_finite(q[j]),
+                df=max(int(k[j]) - 1, 0),
+                i2=_finite(i2[j]),
+                tau2=_finite(tau2[j]),
+                tau2_method='DL',
+                converged=True,
+            ),
+        )
+    return pools
+
@@ -1,6 +1,9 @@
 import click
 from app import db, app as flask_app
 from app.models import User, Project, ProjectMembership
+from app.effect_sizes import rebuild_project_effect_sizes
+from app.project_state import refresh_project_stats
+from app.user_cache import invalidate_user
 
 
 @flask_app.cli.command('create-user')
@@ -36,6 +39,7 @@ def promote_admin(email):
         return
     u.is_admin = True
     db.session.commit()
+    invalidate_user(u.id)
     click.echo(f'User {u.email} promoted to admin')
 
 
@@ -64,3 +68,26 @@ def add_membership(email, project_id, role):
         db.session.add(pm)
         db.session.commit()
         click.echo(f'Added membership: {u.email} -> Project {p.id} as {pm.role}')
+
+
+@flask_app.cli.command('refresh-project-stats')
+@click.argument('project_id', type=int, required=False)
+def refresh_project_stats_command(project_id):
+    """Recount the cached project counters (all projects when no id is given)."""
+    ids = [project_id] if project_id else [pid for (pid,) in db.session.query(Project.id).all()]
+    for pid in ids:
+        refresh_project_stats(pid)
+    db.session.commit()
+    click.echo(f'Refreshed stats for {len(ids)} project(s)')
+
+
+@flask_app.cli.command('rebuild-effect-sizes')
+@click.argument('project_id', type=int, required=False)
+def rebuild_effect_sizes_command(project_id):
+    """Recompute the stored study effect sizes (all projects when no id is given)."""
+    ids = [project_id] if project_id else [pid for (pid,) in db.session.query(Project.id).all()]
+    written = 0
+    for pid in ids:
+        written += rebuild_project_effect_sizes(pid)
+        db.session.commit()
+    click.echo(f'Rebuilt {written} effect size(s) for {len(ids)} project(s)')
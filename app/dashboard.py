@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from datetime import datetime
+from app import app, db
+from app.models import Project, ProjectMembership, ProjectStats
+
+# The dashboard lists one row per visible project with the viewer's role and
+# summary counts. Everything comes from a single query: the user's membership
+# is joined for the role, and the counters are read from project_stats (kept
+# current by the write paths) instead of being counted per project. Pages are
+# keyset-paginated on project id.
+
+
+@dataclass(frozen=True)
+class ProjectSummary:
+    id: int
+    name: str
+    created_at: datetime | None
+    role_label: str
+    study_count: int
+    last_activity: datetime | None
+    # Only reported to owners and admins, 0 otherwise
+    pending_count: int
+
+
+@dataclass(frozen=True)
+class DashboardPage:
+    projects: list
+    next_after: int | None
+    prev_before: int | None
+
+
+def load_dashboard(
+    user_id: int,
+    is_admin: bool,
+    after: int | None = None,
+    before: int | None = None,
+    page_size: int | None = None,
+) -> DashboardPage:
+    """Return one page of the projects visible to a user, ordered by id."""
+    page_size = page_size or app.config['DASHBOARD_PAGE_SIZE']
+    membership_on = db.and_(ProjectMembership.project_id == Project.id, ProjectMembership.user_id == user_id)
+    stmt = db.select(
+        Project.id,
+        Project.name,
+        Project.created_at,
+        ProjectMembership.role,
+        db.func.coalesce(ProjectStats.study_count, 0),
+        db.func.coalesce(ProjectStats.pending_request_count, 0),
+        db.func.coalesce(Project.data_updated_at, Project.created_at),
+    )
+    # Admins see every project; everyone else only those they belong to
+    if is_admin:
+        stmt = stmt.outerjoin(ProjectMembership, membership_on)
+    else:
+        stmt = stmt.join(ProjectMembership, membership_on)
+    stmt = stmt.outerjoin(ProjectStats, ProjectStats.project_id == Project.id)
+
+    backwards = before is not None
+    if backwards:
+        stmt = stmt.where(Project.id < before).order_by(Project.id.desc())
+    else:
+        if after is not None:
+            stmt = stmt.where(Project.id > after)
+        stmt = stmt.order_by(Project.id.asc())
+    rows = db.session.execute(stmt.limit(page_size + 1)).all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    has_next = True if backwards else has_more
+    has_prev = has_more if backwards else after is not None
+
+    projects = []
+    for pid, name, created_at, role, study_count, pending, last_activity in rows:
+        role_label = 'Admin' if is_admin else (role or '').capitalize()
+        can_review = is_admin or (role or '').lower() == 'owner'
+        projects.append(ProjectSummary(
+            id=pid,
+            name=name,
+            created_at=created_at,
+            role_label=role_label,
+            study_count=int(study_count or 0),
+            last_activity=last_activity,
+            pending_count=int(pending or 0) if can_review else 0,
+        ))
+    return DashboardPage(
+        projects=projects,
+        next_after=projects[-1].id if projects and has_next else None,
+        prev_before=projects[0].id if projects and has_prev else None,
+    )
@@ -0,0 +1,171 @@
+import json
+import math
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.form_schema import COMPOSITE_COLUMNS, get_form_schema
+from app.models import CustomFormField, Study, StudyDataValue
+
+# Rows per INSERT ... ON CONFLICT statement; keeps bound parameters well under
+# SQLite's variable limit while a typical full-form save stays a single statement.
+UPSERT_CHUNK_SIZE = 500
+
+# Field types whose text value is mirrored into the typed shadow columns:
+# value_num for plain numbers, value_json for the composite JSON documents
+NUMERIC_FIELD_TYPES = frozenset({'integer'})
+JSON_FIELD_TYPES = frozenset(COMPOSITE_COLUMNS)
+
+
+def load_study_values(study_id: int) -> dict[int, str | None]:
+    """Return {form_field_id: value} for a study using a single query."""
+    rows = (
+        db.session.query(StudyDataValue.form_field_id, StudyDataValue.value)
+        .filter(StudyDataValue.study_id == study_id)
+        .all()
+    )
+    return {fid: value for fid, value in rows}
+
+
+def typed_value_columns(field_type: str | None, value: str | None) -> dict:
+    """Return the value_num/value_json columns for a value of a field type.
+
+    Values that do not parse as the field type leave both columns NULL; the
+    text column stays the source of truth.
+    """
+    value_num = value_json = None
+    if value is not None:
+        if field_type in NUMERIC_FIELD_TYPES:
+            try:
+                value_num = float(value)
+            except ValueError:
+                pass
+            if value_num is not None and not math.isfinite(value_num):
+                value_num = None
+        elif field_type in JSON_FIELD_TYPES:
+            try:
+                value_json = json.loads(value)
+            except ValueError:
+                pass
+    return {'value_num': value_num, 'value_json': value_json}
+
+
+def _dialect_insert(dialect_name: str):
+    if dialect_name == 'postgresql':
+        return postgresql.insert
+    if dialect_name == 'sqlite':
+        return sqlite.insert
+    return None
+
+
+def upsert_study_values(study_id: int, project_id: int, values: dict[int, str | None], schema=None) -> None:
+    """Insert or update many StudyDataValue rows for one study.
+
+    ``project_id`` must be the study's project; it is stored on each new row.
+    The typed columns are derived from the field types of the project's form
+    ``schema`` (loaded when not given).
+
+    Uses ``INSERT ... ON CONFLICT (study_id, form_field_id) DO UPDATE`` on
+    Postgres and SQLite, so a full-form save costs one statement per
+    ``UPSERT_CHUNK_SIZE`` fields. Other backends load existing row ids in one
+    query and then issue one bulk UPDATE and one bulk INSERT. The caller commits.
+    """
+    if not values:
+        return
+    if schema is None:
+        schema = get_form_schema(project_id)
+    rows = []
+    for fid, value in values.items():
+        field = schema.fields_by_id.get(fid)
+        row = {'study_id': study_id, 'project_id': project_id, 'form_field_id': fid, 'value': value}
+        row.update(typed_value_columns(field.field_type if field else None, value))
+        rows.append(row)
+    dialect_insert = _dialect_insert(db.session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = dialect_insert(StudyDataValue).values(rows[start:start + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['study_id', 'form_field_id'],
+                set_={
+                    'value': stmt.excluded.value,
+                    'value_num': stmt.excluded.value_num,
+                    'value_json': stmt.excluded.value_json,
+                },
+            )
+            db.session.execute(stmt)
+        return
+
+    existing_ids = dict(
+        db.session.query(StudyDataValue.form_field_id, StudyDataValue.id)
+        .filter(StudyDataValue.study_id == study_id)
+        .all()
+    )
+    updates = [
+        {
+            'id': existing_ids[row['form_field_id']],
+            'value': row['value'],
+            'value_num': row['value_num'],
+            'value_json': row['value_json'],
+        }
+        for row in rows
+        if row['form_field_id'] in existing_ids
+    ]
+    inserts = [row for row in rows if row['form_field_id'] not in existing_ids]
+    if updates:
+        db.session.execute(update(StudyDataValue), updates)
+    if inserts:
+        db.session.execute(insert(StudyDataValue), inserts)
+
+
+def retype_field_values(field_id: int, field_type: str) -> None:
+    """Re-derive the typed columns of every value of a field after its type changed."""
+    rows = (
+        db.session.query(StudyDataValue.id, StudyDataValue.value)
+        .filter(StudyDataValue.form_field_id == field_id)
+        .all()
+    )
+    if rows:
+        db.session.execute(
+            update(StudyDataValue),
+            [{'id': vid, **typed_value_columns(field_type, value)} for vid, value in rows],
+        )
+
+
+def _set_typed_columns(connection, target):
+    field_type = None
+    if target.value is not None:
+        field = target.__dict__.get('form_field')
+        if field is not None:
+            field_type = field.field_type
+        else:
+            field_type = connection.scalar(
+                select(CustomFormField.field_type).where(CustomFormField.id == target.form_field_id)
+            )
+    for key, value in typed_value_columns(field_type, target.value).items():
+        setattr(target, key, value)
+
+
+@event.listens_for(StudyDataValue, 'before_insert')
+def _before_insert(_mapper, connection, target):
+    """Fill the denormalized project_id and the typed columns on ORM inserts.
+
+    A project_id that does not match the study's is rejected.
+    """
+    study = target.__dict__.get('study')
+    if study is not None:
+        study_project_id = study.project_id
+    else:
+        study_project_id = connection.scalar(select(Study.project_id).where(Study.id == target.study_id))
+    if target.project_id is None:
+        target.project_id = study_project_id
+    elif target.project_id != study_project_id:
+        raise ValueError(
+            f'StudyDataValue.project_id {target.project_id} does not match '
+            f'project {study_project_id} of study {target.study_id}'
+        )
+    _set_typed_columns(connection, target)
+
+
+@event.listens_for(StudyDataValue, 'before_update')
+def _before_update(_mapper, connection, target):
+    if inspect(target).attrs.value.history.has_changes():
+        _set_typed_columns(connection, target)
@@ -0,0 +1,398 @@
+import math
+from datetime import datetime
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import OutcomeEffectStats, ProjectOutcome, Study, StudyEffectSize
+from app.outcomes import EFFECT_SIZE_COLUMNS, ROW_MODELS
+
+# Per-study effect sizes of outcome rows, stored in study_effect_size so that
+# analyses read ready (yi, vi) arrays instead of transforming raw counts and
+# means on every request. The write paths that replace a study's outcome rows
+# call refresh_study_effect_sizes() before committing, which recomputes that
+# study only; `flask rebuild-effect-sizes` recomputes whole projects, e.g.
+# after the formulas below change. A row is stored only for the measures the
+# outcome row can enter.
+#
+# For declared outcomes, OutcomeEffectStats also keeps k, sum(w), sum(w y),
+# sum(w y²) and sum(w²) per measure, with w = 1 / vi: enough for the
+# fixed-effect estimate, Q, the DerSimonian-Laird tau² and I². Refreshing a
+# study locks the rows of the outcomes it touches, then reads its old effect
+# sizes and shifts the sums by the difference to its new ones, so a save costs
+# the same however many studies the outcome has. The lock makes overlapping
+# saves of one study take turns, so each reads the contribution the other
+# committed instead of drifting. Missing rows are built from the stored
+# effect sizes on first read, and a rebuild drops them so they start over
+# without accumulated rounding.
+#
+# Dichotomous outcomes use the risk ratio (RR), odds ratio (OR) and risk
+# difference (RD); RR and OR are on the log scale. Tables with an empty cell
+# get ZERO_CELL_CORRECTION added to every cell. Tables with no events, or only
+# events, in both arms say nothing about a ratio and are left out of RR and
+# OR, but still count towards RD.
+#
+# Continuous outcomes use the mean difference (MD) and the standardized mean
+# difference as Hedges' g (SMD). Arms with a missing mean, SD or n are masked,
+# and masked rows drop out of the measure.
+
+DICHOTOMOUS_MEASURES = ('RR', 'OR', 'RD')
+CONTINUOUS_MEASURES = ('MD', 'SMD')
+RATIO_MEASURES = frozenset({'RR', 'OR'})
+ZERO_CELL_CORRECTION = 0.5
+
+# outcome type -> outcome row columns the effect sizes derive from
+OUTCOME_VALUE_COLUMNS = {
+    'dichotomous': ('events_intervention', 'total_intervention', 'events_control', 'total_control'),
+    'continuous': ('mean_intervention', 'sd_intervention', 'n_intervention', 'mean_control', 'sd_control', 'n_control'),
+}
+OUTCOME_MEASURES = {
+    'dichotomous': DICHOTOMOUS_MEASURES,
+    'continuous': CONTINUOUS_MEASURES,
+}
+# OutcomeEffectStats sums, in the order of their terms in _stat_terms()
+STAT_SUMS = ('sum_w', 'sum_wy', 'sum_wy2', 'sum_w2')
+
+REBUILD_BATCH_SIZE = 5000
+
+
+def value_array(rows, width: int):
+    """Rows of nullable numbers -> float array of shape (width, rows), NaN for None."""
+    return np.array(
+        [[math.nan if v is None else v for v in row] for row in rows], dtype=float
+    ).reshape(-1, width).T
+
+
+def dichotomous_effects(counts):
+    """Per-study effect sizes of every measure for 2x2 tables given as arrays.
+
+    ``counts`` is (events_intervention, total_intervention, events_control,
+    total_control). Returns ``{measure: (y, v, include)}`` with the estimate
+    on the analysis scale, its variance and the mask of tables that enter the
+    measure.
+    """
+    a, n1, c, n2 = counts
+    b, d = n1 - a, n2 - c
+    with np.errstate(invalid='ignore'):
+        valid = (n1 > 0) & (n2 > 0) & (a >= 0) & (b >= 0) & (c >= 0) & (d >= 0)
+        empty_cell = valid & ((a == 0) | (b == 0) | (c == 0) | (d == 0))
+        uninformative = valid & (((a == 0) & (c == 0)) | ((b == 0) & (d == 0)))
+    add = np.where(empty_cell, ZERO_CELL_CORRECTION, 0.0)
+    ac, bc, cc, dc = a + add, b + add, c + add, d + add
+    n1c, n2c = ac + bc, cc + dc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p1c, p2c = ac / n1c, cc / n2c
+        effects = {
+            'RR': (np.log(p1c / p2c), 1 / ac - 1 / n1c + 1 / cc - 1 / n2c, valid & ~uninformative),
+            'OR': (np.log((ac * dc) / (bc * cc)), 1 / ac + 1 / bc + 1 / cc + 1 / dc, valid & ~uninformative),
+            # The difference itself needs no correction, only its variance does
+            'RD': (a / n1 - c / n2, p1c * (1 - p1c) / n1c + p2c * (1 - p2c) / n2c, valid),
+        }
+    return effects
+
+
+def continuous_effects(values):
+    """Per-study MD and Hedges' g for arm summaries given as arrays.
+
+    ``values`` is (mean, SD, n) of the intervention arm followed by those of
+    the control arm, NaN where missing. Returns ``{measure: (y, v, include)}``
+    like dichotomous_effects(). g uses the usual small-sample correction
+    J = 1 - 3 / (4 df - 1) and the large-sample variance 1/n1 + 1/n2 +
+    g² / (2 (n1 + n2)).
+    """
+    m1, s1, n1, m2, s2, n2 = np.ma.masked_invalid(values)
+    # Arms that cannot yield an effect are masked along with missing ones
+    bad = (n1 < 1) | (n2 < 1) | (s1 < 0) | (s2 < 0)
+    m1, s1, n1, m2, s2, n2 = (np.ma.masked_where(bad, x) for x in (m1, s1, n1, m2, s2, n2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        md = m1 - m2
+        md_var = s1 ** 2 / n1 + s2 ** 2 / n2
+        df = np.ma.masked_less(n1 + n2 - 2, 1)
+        sd_pooled = np.ma.sqrt(((n1 - 1) * s1 ** 2 + (n2 - 1) * s2 ** 2) / df)
+        g = (1 - 3 / (4 * df - 1)) * md / np.ma.masked_equal(sd_pooled, 0)
+        g_var = 1 / n1 + 1 / n2 + g ** 2 / (2 * (n1 + n2))
+    effects = {}
+    for measure, y, v in (('MD', md, md_var), ('SMD', g, g_var)):
+        include = ~(np.ma.getmaskarray(y) | np.ma.getmaskarray(v))
+        effects[measure] = (y.filled(np.nan), v.filled(np.nan), include)
+    return effects
+
+
+EFFECT_FUNCTIONS = {
+    'dichotomous': dichotomous_effects,
+    'continuous': continuous_effects,
+}
+
+
+def effect_size_rows(outcome_type: str, project_id: int, rows) -> list:
+    """StudyEffectSize insert parameters for outcome rows.
+
+    ``rows`` are ``(row id, study id, project outcome id,
+    *OUTCOME_VALUE_COLUMNS[outcome_type])``.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    values = value_array((row[3:] for row in rows), len(OUTCOME_VALUE_COLUMNS[outcome_type]))
+    column = EFFECT_SIZE_COLUMNS[outcome_type].key
+    params = []
+    for measure, (y, v, include) in EFFECT_FUNCTIONS[outcome_type](values).items():
+        with np.errstate(invalid='ignore'):
+            usable = include & np.isfinite(y) & np.isfinite(v) & (v > 0)
+        for i, yi, vi in zip(np.flatnonzero(usable).tolist(), y[usable].tolist(), v[usable].tolist()):
+            params.append({
+                'project_id': project_id,
+                'study_id': rows[i][1],
+                column: rows[i][0],
+                'project_outcome_id': rows[i][2],
+                'measure': measure,
+                'yi': yi,
+                'vi': vi,
+            })
+    return params
+
+
+def _outcome_rows(outcome_type: str, condition):
+    model = ROW_MODELS[outcome_type]
+    return db.select(
+        model.id,
+        model.study_id,
+        model.project_outcome_id,
+        *(getattr(model, column) for column in OUTCOME_VALUE_COLUMNS[outcome_type]),
+    ).where(condition).order_by(model.id)
+
+
+def _insert(params) -> None:
+    if params:
+        db.session.execute(db.insert(StudyEffectSize), params)
+
+
+def _stat_terms(yi, vi) -> tuple:
+    """Terms one effect size adds to the STAT_SUMS (Python floats or SQL)."""
+    w = 1.0 / vi
+    return w, w * yi, w * yi * yi, w * w
+
+
+def _stored_sums(condition) -> dict:
+    """(outcome id, measure) -> [k, *STAT_SUMS] of the stored effect sizes matching ``condition``."""
+    terms = _stat_terms(StudyEffectSize.yi, StudyEffectSize.vi)
+    rows = db.session.execute(
+        db.select(
+            StudyEffectSize.project_outcome_id,
+            StudyEffectSize.measure,
+            db.func.count(),
+            *(db.func.sum(term) for term in terms),
+        )
+        .where(condition, StudyEffectSize.project_outcome_id.is_not(None))
+        .group_by(StudyEffectSize.project_outcome_id, StudyEffectSize.measure)
+    ).all()
+    return {(oid, measure): [k, *sums] for oid, measure, k, *sums in rows}
+
+
+def _param_sums(params) -> dict:
+    """Like _stored_sums() for StudyEffectSize insert parameters."""
+    sums = {}
+    for row in params:
+        if row['project_outcome_id'] is None:
+            continue
+        total = sums.setdefault((row['project_outcome_id'], row['measure']), [0, 0.0, 0.0, 0.0, 0.0])
+        total[0] += 1
+        for i, term in enumerate(_stat_terms(row['yi'], row['vi']), start=1):
+            total[i] += term
+    return sums
+
+
+def _lock_outcome_stats(condition) -> None:
+    """Lock the OutcomeEffectStats rows matching ``condition`` until commit.
+
+    Rows are locked in primary key order so that concurrent saves touching the
+    same outcomes queue up instead of deadlocking. Take the lock before
+    reading a study's old effect sizes, so that the difference applied by
+    _shift_outcome_stats() starts from what an overlapping save committed.
+    """
+    db.session.execute(
+        db.select(OutcomeEffectStats.project_outcome_id, OutcomeEffectStats.measure)
+        .where(condition)
+        .order_by(OutcomeEffectStats.project_outcome_id, OutcomeEffectStats.measure)
+        .with_for_update()
+    ).all()
+
+
+def _shift_outcome_stats(before: dict, after: dict) -> None:
+    """Move locked OutcomeEffectStats rows from the ``before`` to the ``after`` sums.
+
+    Runs one UPDATE per changed outcome and measure, adding the difference in
+    SQL so concurrent saves of other studies compose. Rows not built yet are
+    left to get_outcome_effect_stats().
+    """
+    empty = [0, 0.0, 0.0, 0.0, 0.0]
+    now = datetime.utcnow()
+    for outcome_id, measure in before.keys() | after.keys():
+        old = before.get((outcome_id, measure), empty)
+        new = after.get((outcome_id, measure), empty)
+        if old == new:
+            continue
+        k = OutcomeEffectStats.k + (new[0] - old[0])
+        values = {'k': k, 'updated_at': now}
+        for name, old_sum, new_sum in zip(STAT_SUMS, old[1:], new[1:]):
+            column = getattr(OutcomeEffectStats, name)
+            # An outcome left without studies restarts from exact zeros
+            values[name] = db.case((k == 0, 0.0), else_=column + (new_sum - old_sum))
+        db.session.execute(
+            db.update(OutcomeEffectStats)
+            .where(OutcomeEffectStats.project_outcome_id == outcome_id, OutcomeEffectStats.measure == measure)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def refresh_study_effect_sizes(study_id: int, project_id: int, *outcome_types: str) -> None:
+    """Recompute the stored effect sizes of one study's outcome rows.
+
+    Pass the outcome types whose rows were written (all types when omitted).
+    The OutcomeEffectStats of the outcomes the study had or now has rows for
+    are locked, then shifted to match. Pending outcome rows are flushed first.
+    The caller commits.
+    """
+    db.session.flush()
+    for outcome_type in outcome_types or tuple(OUTCOME_MEASURES):
+        model = ROW_MODELS[outcome_type]
+        stored = db.and_(
+            StudyEffectSize.study_id == study_id,
+            StudyEffectSize.measure.in_(OUTCOME_MEASURES[outcome_type]),
+        )
+        _lock_outcome_stats(db.or_(
+            OutcomeEffectStats.project_outcome_id.in_(db.select(StudyEffectSize.project_outcome_id).where(stored)),
+            OutcomeEffectStats.project_outcome_id.in_(db.select(model.project_outcome_id).where(model.study_id == study_id)),
+        ))
+        before = _stored_sums(stored)
+        db.session.execute(
+            db.delete(StudyEffectSize).where(stored).execution_options(synchronize_session=False)
+        )
+        rows = db.session.execute(_outcome_rows(outcome_type, model.study_id == study_id)).all()
+        params = effect_size_rows(outcome_type, project_id, rows)
+        _insert(params)
+        _shift_outcome_stats(before, _param_sums(params))
+
+
+def discard_study_effect_sizes(study_id: int) -> None:
+    """Remove a study's stored effect sizes, and their share of OutcomeEffectStats.
+
+    Call it before deleting the study: the ORM cascade alone would drop the
+    rows without shifting the sums. The caller commits.
+    """
+    stored = StudyEffectSize.study_id == study_id
+    _lock_outcome_stats(
+        OutcomeEffectStats.project_outcome_id.in_(db.select(StudyEffectSize.project_outcome_id).where(stored))
+    )
+    _shift_outcome_stats(_stored_sums(stored), {})
+    db.session.execute(
+        db.delete(StudyEffectSize).where(stored).execution_options(synchronize_session=False)
+    )
+
+
+def rebuild_project_effect_sizes(project_id: int) -> int:
+    """Recompute every stored effect size of a project; returns the row count.
+
+    Its OutcomeEffectStats are dropped, to be built afresh on first read.
+    The caller commits.
+    """
+    db.session.execute(
+        db.delete(StudyEffectSize)
+        .where(StudyEffectSize.project_id == project_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        db.delete(OutcomeEffectStats)
+        .where(OutcomeEffectStats.project_outcome_id.in_(
+            db.select(ProjectOutcome.id).where(ProjectOutcome.project_id == project_id)
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    written = 0
+    for outcome_type in OUTCOME_MEASURES:
+        model = ROW_MODELS[outcome_type]
+        in_project = model.study_id.in_(db.select(Study.id).where(Study.project_id == project_id))
+        result = db.session.execute(
+            _outcome_rows(outcome_type, in_project).execution_options(yield_per=REBUILD_BATCH_SIZE)
+        )
+        for batch in result.partitions():
+            params = effect_size_rows(outcome_type, project_id, batch)
+            _insert(params)
+            written += len(params)
+    return written
+
+
+def load_effect_sizes(project_id: int, outcome_type: str, row_ids) -> dict:
+    """Stored effect sizes aligned with ``row_ids``, in one query.
+
+    Returns ``{measure: (y, v, include)}``, the layout of
+    dichotomous_effects(), with NaN and include False where no row is stored.
+    """
+    measures = OUTCOME_MEASURES[outcome_type]
+    n = len(row_ids)
+    effects = {m: (np.full(n, np.nan), np.full(n, np.nan), np.zeros(n, dtype=bool)) for m in measures}
+    stored = db.session.execute(
+        db.select(EFFECT_SIZE_COLUMNS[outcome_type], StudyEffectSize.measure, StudyEffectSize.yi, StudyEffectSize.vi)
+        .where(StudyEffectSize.project_id == project_id, StudyEffectSize.measure.in_(measures))
+    ).all()
+    if not stored or not n:
+        return effects
+    ids, labels, yi, vi = zip(*stored)
+    ids = np.asarray(ids, dtype=np.int64)
+    order = np.argsort(row_ids)
+    sorted_ids = row_ids[order]
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), n - 1)
+    # Rows written after the outcome rows were read have no position
+    known = sorted_ids[positions] == ids
+    rows = order[positions]
+    labels, yi, vi = np.asarray(labels), np.asarray(yi, dtype=float), np.asarray(vi, dtype=float)
+    for measure, (y, v, include) in effects.items():
+        mask = known & (labels == measure)
+        y[rows[mask]] = yi[mask]
+        v[rows[mask]] = vi[mask]
+        include[rows[mask]] = True
+    return effects
+
+
+def _build_outcome_stats(outcome_ids, measures) -> None:
+    """Create the OutcomeEffectStats rows of outcomes from their stored effect sizes."""
+    sums = _stored_sums(StudyEffectSize.project_outcome_id.in_(outcome_ids))
+    now = datetime.utcnow()
+    rows = []
+    for outcome_id in outcome_ids:
+        for measure in measures:
+            k, *totals = sums.get((outcome_id, measure), [0, 0.0, 0.0, 0.0, 0.0])
+            rows.append(dict(zip(STAT_SUMS, totals), project_outcome_id=outcome_id, measure=measure, k=k, updated_at=now))
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(OutcomeEffectStats), rows)
+    except IntegrityError:
+        # A concurrent request built some of them first; the rest follow on a later read
+        pass
+
+
+def get_outcome_effect_stats(project_id: int, outcome_type: str) -> list:
+    """Running sums of every declared outcome of one type, building missing ones.
+
+    Returns rows of ``(outcome_id, measure, k, *STAT_SUMS)``. Commits when it
+    had to build rows, like get_project_stats().
+    """
+    stmt = (
+        db.select(
+            ProjectOutcome.id,
+            OutcomeEffectStats.measure,
+            OutcomeEffectStats.k,
+            *(getattr(OutcomeEffectStats, name) for name in STAT_SUMS),
+        )
+        .outerjoin(OutcomeEffectStats, OutcomeEffectStats.project_outcome_id == ProjectOutcome.id)
+        .where(ProjectOutcome.project_id == project_id, ProjectOutcome.outcome_type == outcome_type)
+        .order_by(ProjectOutcome.id, OutcomeEffectStats.measure)
+    )
+    rows = db.session.execute(stmt).all()
+    missing = [row[0] for row in rows if row[1] is None]
+    if missing:
+        _build_outcome_stats(missing, OUTCOME_MEASURES[outcome_type])
+        db.session.commit()
+        rows = db.session.execute(stmt).all()
+    return [row for row in rows if row[1] is not None]
+
@@ -0,0 +1,155 @@
+import os
+import shutil
+import threading
+from app import app
+from app.exports import EXPORT_KINDS
+
+# Finished export artifacts are kept on disk under EXPORT_CACHE_DIR, keyed by
+# (project id, creation stamp, Project.data_version, export kind). The creation
+# stamp keeps a project that reused a deleted project's id from being served the
+# old project's artifacts. Any write to a project bumps its data version, so
+# entries never need invalidating: stale ones are simply never looked up again
+# and age out through the size-bounded LRU eviction.
+# File mtimes double as the LRU clock, which keeps the cache shared between
+# gunicorn workers without any extra bookkeeping.
+
+_evict_lock = threading.Lock()
+
+
+def _cache_dir() -> str:
+    path = app.config['EXPORT_CACHE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _enabled() -> bool:
+    return app.config['EXPORT_CACHE_MAX_BYTES'] > 0
+
+
+def _entry_prefix(project_id: int, created: int, kind: str) -> str:
+    return f'p{project_id}-{created}-{kind}-v'
+
+
+def cache_entry_path(project_id: int, created: int, data_version: int, kind: str) -> str:
+    ext = os.path.splitext(EXPORT_KINDS[kind][0])[1]
+    return os.path.join(_cache_dir(), f'{_entry_prefix(project_id, created, kind)}{data_version or 0}{ext}')
+
+
+def _part_path(project_id: int, created: int, data_version: int, kind: str) -> str:
+    # Unique per writer so concurrent misses for the same key never share a file
+    return f'{cache_entry_path(project_id, created, data_version, kind)}.{os.getpid()}-{threading.get_ident()}.part'
+
+
+def get_cached_export(project_id: int, created: int, data_version: int, kind: str) -> str | None:
+    """Return the path of a cached artifact and mark it recently used, or None."""
+    if not _enabled():
+        return None
+    path = cache_entry_path(project_id, created, data_version, kind)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def _drop_superseded(project_id: int, created: int, data_version: int, kind: str):
+    # Older versions of the same export can never be requested again. Newer
+    # ones are left alone: a slow writer may finish after a newer entry landed.
+    prefix = _entry_prefix(project_id, created, kind)
+    for name in os.listdir(_cache_dir()):
+        if not name.startswith(prefix) or name.endswith('.part'):
+            continue
+        version = os.path.splitext(name[len(prefix):])[0]
+        if version.isdigit() and int(version) < (data_version or 0):
+            try:
+                os.remove(os.path.join(_cache_dir(), name))
+            except OSError:
+                pass
+
+
+def purge_project_exports(project_id: int):
+    """Remove every cached export of a project, e.g. when it is deleted."""
+    prefix = f'p{project_id}-'
+    for name in os.listdir(_cache_dir()):
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(_cache_dir(), name))
+            except OSError:
+                pass
+
+
+def evict_export_cache(max_bytes: int | None = None):
+    """Delete least recently used artifacts until the cache fits in max_bytes."""
+    if max_bytes is None:
+        max_bytes = app.config['EXPORT_CACHE_MAX_BYTES']
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(_cache_dir()):
+            if name.endswith('.part'):
+                continue
+            path = os.path.join(_cache_dir(), name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def _commit_entry(part_path: str, project_id: int, created: int, data_version: int, kind: str):
+    os.replace(part_path, cache_entry_path(project_id, created, data_version, kind))
+    _drop_superseded(project_id, created, data_version, kind)
+    evict_export_cache()
+
+
+def store_cached_export(project_id: int, created: int, data_version: int, kind: str, src_path: str):
+    """Copy an already generated artifact (e.g. from a background job) into the cache."""
+    if not _enabled():
+        return
+    part_path = _part_path(project_id, created, data_version, kind)
+    try:
+        shutil.copyfile(src_path, part_path)
+        _commit_entry(part_path, project_id, created, data_version, kind)
+    except OSError:
+        app.logger.warning('Could not cache export %s for project %s', kind, project_id, exc_info=True)
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+
+
+def iter_and_cache(project_id: int, created: int, data_version: int, kind: str, chunks):
+    """Pass export chunks through unchanged while teeing them into the cache.
+
+    The entry only becomes visible once the whole stream has been written, so a
+    client disconnect or a failing export never leaves a truncated artifact.
+    """
+    if not _enabled():
+        yield from chunks
+        return
+    part_path = _part_path(project_id, created, data_version, kind)
+    out = open(part_path, 'wb')
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            yield chunk
+        out.close()
+        try:
+            _commit_entry(part_path, project_id, created, data_version, kind)
+        except OSError:
+            app.logger.warning('Could not cache export %s for project %s', kind, project_id, exc_info=True)
+    finally:
+        if not out.closed:
+            out.close()
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
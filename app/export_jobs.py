@@ -0,0 +1,164 @@
+import json
+import os
+import secrets
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app import app, db
+from app.exports import EXPORT_KINDS, build_export, export_download_name
+from app.export_cache import get_cached_export, store_cached_export
+from app.models import Project
+from app.project_state import project_created_stamp
+
+# Background export jobs run in a small per-process thread pool. Job state and
+# finished artifacts live under EXPORT_JOB_DIR (<instance>/exports) so that
+# every gunicorn worker can answer status polls and serve downloads for any job.
+
+# Minimum seconds between progress writes while a job is running
+_PROGRESS_INTERVAL = 1.0
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, app.config['EXPORT_JOB_WORKERS']),
+                thread_name_prefix='export-job',
+            )
+        return _executor
+
+
+def _job_dir() -> str:
+    path = app.config['EXPORT_JOB_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _status_path(job_id: str) -> str:
+    return os.path.join(_job_dir(), f'{job_id}.json')
+
+
+def _write_status(job: dict):
+    job['updated_at'] = datetime.utcnow().isoformat()
+    tmp_path = _status_path(job['id']) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, _status_path(job['id']))
+
+
+def get_export_job(job_id: str) -> dict | None:
+    # Job ids are generated hex tokens; reject anything else before touching the filesystem
+    if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+        return None
+    try:
+        with open(_status_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def export_job_artifact_path(job: dict) -> str:
+    ext = os.path.splitext(job['download_name'])[1] or '.bin'
+    return os.path.join(_job_dir(), f"{job['id']}{ext}")
+
+
+def purge_expired_jobs(max_age_seconds: int | None = None):
+    """Remove job status files and artifacts older than the configured TTL."""
+    if max_age_seconds is None:
+        max_age_seconds = app.config['EXPORT_JOB_TTL_SECONDS']
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(_job_dir()):
+        path = os.path.join(_job_dir(), name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _run_job(job: dict):
+    with app.app_context():
+        artifact = export_job_artifact_path(job)
+        part_path = artifact + '.part'
+        try:
+            job['status'] = 'running'
+            _write_status(job)
+            # Key the artifact by the version this job's session actually sees;
+            # writes queued behind the request would otherwise be cached under
+            # the older version that was current when the job was enqueued.
+            project = db.session.get(Project, job['project_id'])
+            if project is None:
+                raise ValueError('Project no longer exists')
+            created, data_version = project_created_stamp(project), project.data_version or 0
+            job['data_version'] = data_version
+            cached = get_cached_export(job['project_id'], created, data_version, job['kind'])
+            if cached:
+                shutil.copyfile(cached, part_path)
+                job['bytes_written'] = os.path.getsize(part_path)
+                os.replace(part_path, artifact)
+            else:
+                _name, _mimetype, chunks = build_export(job['kind'], job['project_id'], job['project_name'])
+                last_report = time.monotonic()
+                with open(part_path, 'wb') as out:
+                    for chunk in chunks:
+                        out.write(chunk)
+                        job['bytes_written'] += len(chunk)
+                        now = time.monotonic()
+                        if now - last_report >= _PROGRESS_INTERVAL:
+                            _write_status(job)
+                            last_report = now
+                os.replace(part_path, artifact)
+                store_cached_export(job['project_id'], created, data_version, job['kind'], artifact)
+            job['status'] = 'done'
+            job['finished_at'] = datetime.utcnow().isoformat()
+            _write_status(job)
+        except Exception as exc:
+            app.logger.exception('Export job %s failed', job['id'])
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            job['status'] = 'failed'
+            job['error'] = str(exc)
+            job['finished_at'] = datetime.utcnow().isoformat()
+            _write_status(job)
+
+
+def enqueue_export_job(
+    project_id: int,
+    project_name: str,
+    kind: str,
+    requested_by: int | None = None,
+) -> dict:
+    """Queue an export for background generation and return its status record.
+
+    The job is served from, and populates, the export cache; its data_version
+    is filled in once the job reads the project.
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f'Unknown export kind: {kind}')
+    purge_expired_jobs()
+    job = {
+        'id': secrets.token_hex(16),
+        'project_id': project_id,
+        'project_name': project_name,
+        'kind': kind,
+        'status': 'queued',
+        'download_name': export_download_name(kind, project_name),
+        'mimetype': EXPORT_KINDS[kind][1],
+        'requested_by': requested_by,
+        'data_version': None,
+        'bytes_written': 0,
+        'error': None,
+        'created_at': datetime.utcnow().isoformat(),
+        'finished_at': None,
+    }
+    _write_status(job)
+    _get_executor().submit(_run_job, dict(job))
+    return job
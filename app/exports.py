@@ -0,0 +1,430 @@
+import csv
+import io
+import zipfile
+from itertools import compress, groupby
+from operator import itemgetter
+import numpy as np
+from pandas import DataFrame
+from app import db
+from app.form_schema import STUDY_COLUMNS, get_form_schema
+from app.models import CustomFormField, Study, StudyContinuousOutcome, StudyDataValue, StudyNumericalOutcome
+
+DICHOTOMOUS_COLUMNS = ['Study', 'Intervention_events', 'Intervention_total', 'Control_events', 'Control_Total']
+CONTINUOUS_COLUMNS = [
+    'Study',
+    'Intervention_mean', 'Intervention_sd', 'Intervention_n',
+    'Control_mean', 'Control_sd', 'Control_n',
+]
+
+# Streaming exports fetch rows from a server-side cursor in batches of
+# STREAM_YIELD_PER and flush CSV text every STREAM_BUFFER_ROWS studies.
+STREAM_YIELD_PER = 1000
+STREAM_BUFFER_ROWS = 200
+
+
+def safe_filename(name: str, fallback: str = 'project') -> str:
+    return "".join([c for c in (name or '') if c.isalnum() or c in (' ', '.', '_', '-')]).strip() or fallback
+
+
+def _extract(parsed, path):
+    value = parsed
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _fill_row(row, targets, raw, doc):
+    """Write one stored value into its expanded column slot(s) of a row.
+
+    Composite slots read from ``doc``, the value's pre-parsed value_json.
+    """
+    if not targets:
+        return
+    for idx, path in targets:
+        if path is None:
+            row[idx] = raw
+        else:
+            row[idx] = _extract(doc, path) if doc else None
+
+
+def _object_array(values, count: int):
+    """Build a 1-D object array without numpy unpacking nested sequences."""
+    return np.fromiter(values, dtype=object, count=count)
+
+
+def load_project_frame(project_id: int, schema=None) -> DataFrame:
+    """Load every study of a project as a DataFrame in the static export layout.
+
+    The table is built column by column: each export column is one object
+    array preallocated for all studies, and each field's values are scattered
+    into its column slot(s) by study position with one vectorized assignment,
+    so no per-study row lists or dicts are created. Values stream from a
+    server-side cursor ordered by field (the (project_id, form_field_id)
+    index), so only one field's values are held at a time. Rows are ordered by
+    study id, and column dtypes are inferred as if built from rows.
+    """
+    if schema is None:
+        schema = get_form_schema(project_id)
+    columns = schema.export_columns
+    slots = schema.export_slots
+
+    studies = (
+        db.session.query(Study.id, Study.title, Study.author, Study.year)
+        .filter(Study.project_id == project_id)
+        .order_by(Study.id.asc())
+        .all()
+    )
+    n = len(studies)
+    data = [np.full(n, None, dtype=object) for _ in columns]
+    if n:
+        study_ids = np.fromiter((s[0] for s in studies), dtype=np.int64, count=n)
+        for idx in range(len(STUDY_COLUMNS)):
+            data[idx] = _object_array((s[idx + 1] for s in studies), n)
+
+        values = (
+            db.session.query(
+                StudyDataValue.form_field_id,
+                StudyDataValue.study_id,
+                StudyDataValue.value,
+                StudyDataValue.value_json,
+            )
+            .filter(StudyDataValue.project_id == project_id)
+            .order_by(StudyDataValue.form_field_id.asc())
+            .execution_options(yield_per=STREAM_YIELD_PER)
+        )
+        for fid, group in groupby(values, key=itemgetter(0)):
+            targets = slots.get(fid)
+            if not targets:
+                continue
+            _fids, sids, raws, docs = zip(*group)
+            sids = np.asarray(sids, dtype=np.int64)
+            positions = np.searchsorted(study_ids, sids)
+            # Drop values of studies added after the study list was read
+            known = study_ids[np.minimum(positions, n - 1)] == sids
+            if not known.all():
+                positions = positions[known]
+                raws = tuple(compress(raws, known))
+                docs = tuple(compress(docs, known))
+            for idx, path in targets:
+                if path is None:
+                    column = raws
+                else:
+                    column = [_extract(doc, path) if doc else None for doc in docs]
+                data[idx][positions] = _object_array(column, len(positions))
+
+    frame = DataFrame(dict(enumerate(data)), copy=False)
+    frame.columns = list(columns)
+    return frame.infer_objects()
+
+
+def iter_csv(columns, rows):
+    """Yield CSV text for a header and an iterable of list rows in small chunks."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= STREAM_BUFFER_ROWS:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _iter_static_rows(project_id: int, slots, width: int):
+    stmt = (
+        db.select(
+            Study.id, Study.title, Study.author, Study.year,
+            StudyDataValue.form_field_id, StudyDataValue.value, StudyDataValue.value_json,
+        )
+        .outerjoin(StudyDataValue, StudyDataValue.study_id == Study.id)
+        .where(Study.project_id == project_id)
+        .order_by(Study.id.asc())
+        .execution_options(yield_per=STREAM_YIELD_PER)
+    )
+    current_id = None
+    row = None
+    for sid, title, author, year, fid, raw, doc in db.session.execute(stmt):
+        if sid != current_id:
+            if row is not None:
+                yield row
+            current_id = sid
+            row = [None] * width
+            row[0], row[1], row[2] = title, author, year
+        if fid is not None:
+            _fill_row(row, slots.get(fid), raw, doc)
+    if row is not None:
+        yield row
+
+
+def iter_static_csv(project_id: int, schema=None):
+    """Yield the static-fields export as CSV text chunks.
+
+    Streams one outer join of studies and their values, ordered by study, from
+    a server-side cursor and pivots each study as its rows arrive, so memory is
+    bounded by STREAM_BUFFER_ROWS rows rather than the project size.
+    """
+    if schema is None:
+        schema = get_form_schema(project_id)
+    columns = schema.export_columns
+    yield from iter_csv(columns, _iter_static_rows(project_id, schema.export_slots, len(columns)))
+
+
+class _ZipChunkSink:
+    """Write-only, unseekable file object that collects what ZipFile writes."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries):
+    """Yield a ZIP archive as byte chunks while its entries are produced.
+
+    ``entries`` is an iterable of ``(arcname, text_chunks)``; each entry is
+    deflated and flushed to the caller as its chunks arrive. Because the sink
+    cannot seek, ZipFile writes sizes in trailing data descriptors.
+    """
+    sink = _ZipChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, chunks in entries:
+            with zf.open(arcname, mode='w') as dest:
+                for chunk in chunks:
+                    dest.write(chunk.encode('utf-8'))
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def load_field_values(project_id: int, field_ids, column=StudyDataValue.value) -> dict[int, dict]:
+    """Fetch the values of selected fields for every study of a project at once.
+
+    Returns ``{form_field_id: {study_id: value}}`` from a single query, reading
+    ``column`` (the text value by default, or one of the typed columns).
+    """
+    field_ids = list(field_ids)
+    if not field_ids:
+        return {}
+    rows = (
+        db.session.query(StudyDataValue.form_field_id, StudyDataValue.study_id, column)
+        .filter(StudyDataValue.project_id == project_id)
+        .filter(StudyDataValue.form_field_id.in_(field_ids))
+        .all()
+    )
+    grouped = {}
+    for fid, sid, value in rows:
+        grouped.setdefault(fid, {})[sid] = value
+    return grouped
+
+
+def legacy_dichotomous_tables(project_id: int, studies):
+    """Build outcome rows from legacy 'dichotomous_outcome' static fields.
+
+    Returns a list of ``(field, rows)`` in form order, skipping fields without
+    any values; rows are aligned with DICHOTOMOUS_COLUMNS. All field values are fetched in one grouped query rather than
+    one lookup per study and field.
+    """
+    legacy_fields = (
+        CustomFormField.query
+        .filter_by(project_id=project_id, field_type='dichotomous_outcome')
+        .order_by(
+            CustomFormField.section.asc(),
+            db.func.coalesce(CustomFormField.sort_order, CustomFormField.id).asc(),
+            CustomFormField.id.asc(),
+        )
+        .all()
+    )
+    docs = load_field_values(project_id, [f.id for f in legacy_fields], StudyDataValue.value_json)
+    tables = []
+    for f in legacy_fields:
+        by_study = docs.get(f.id, {})
+        rows = []
+        for study in studies:
+            doc = by_study.get(study.id)
+            events_val = total_val = None
+            if isinstance(doc, dict):
+                events_val = doc.get('events')
+                total_val = doc.get('total')
+            # Only add row if at least one value present
+            if events_val is not None or total_val is not None:
+                rows.append([study.title, events_val, total_val, None, None])
+        if rows:
+            tables.append((f, rows))
+    return tables
+
+
+def _iter_outcome_groups(project_id: int, model, value_columns):
+    """Yield ``(outcome_name, rows)`` for a project's outcome rows, one name at a time.
+
+    Names are in order of first appearance by study and row, and each group's
+    rows keep that order. Rows stream from a server-side cursor already sorted
+    into groups, so only the current outcome is held and each group can be
+    written before the next is read. ``rows`` is a lazy iterator that must be
+    consumed before advancing to the next group. Unnamed rows are skipped;
+    names are stored stripped (see the enter_data and autosave routes).
+    """
+    ordered = (
+        db.select(
+            model.outcome_name.label('name'),
+            Study.title.label('title'),
+            *value_columns,
+            db.func.row_number().over(order_by=(Study.id, model.id)).label('pos'),
+        )
+        .join(Study, Study.id == model.study_id)
+        .where(Study.project_id == project_id, model.outcome_name != '')
+        .subquery()
+    )
+    first = db.func.min(ordered.c.pos).over(partition_by=ordered.c.name)
+    values = [ordered.c[column.key] for column in value_columns]
+    stmt = (
+        db.select(ordered.c.name, ordered.c.title, *values)
+        .order_by(first, ordered.c.pos)
+        .execution_options(yield_per=STREAM_YIELD_PER)
+    )
+    for name, group in groupby(db.session.execute(stmt), key=itemgetter(0)):
+        yield name, ([title, *values] for _name, title, *values in group)
+
+
+def _iter_dichotomous_groups(project_id: int):
+    """Stream StudyNumericalOutcome rows by outcome name as DICHOTOMOUS_COLUMNS rows."""
+    return _iter_outcome_groups(project_id, StudyNumericalOutcome, (
+        StudyNumericalOutcome.events_intervention,
+        StudyNumericalOutcome.total_intervention,
+        StudyNumericalOutcome.events_control,
+        StudyNumericalOutcome.total_control,
+    ))
+
+
+def _iter_continuous_groups(project_id: int):
+    """Stream StudyContinuousOutcome rows by outcome name as CONTINUOUS_COLUMNS rows."""
+    return _iter_outcome_groups(project_id, StudyContinuousOutcome, (
+        StudyContinuousOutcome.mean_intervention,
+        StudyContinuousOutcome.sd_intervention,
+        StudyContinuousOutcome.n_intervention,
+        StudyContinuousOutcome.mean_control,
+        StudyContinuousOutcome.sd_control,
+        StudyContinuousOutcome.n_control,
+    ))
+
+
+def outcome_zip_entries(project_id: int, project_name: str):
+    """Yield (arcname, text_chunks) entries for the outcomes-only export."""
+    def safe(name: str) -> str:
+        return safe_filename(name, 'outcome')
+    prefix = safe(project_name)
+
+    # Try primary source: StudyNumericalOutcome rows
+    wrote_any = False
+    for outcome_name, data_rows in _iter_dichotomous_groups(project_id):
+        yield f"{prefix}_{safe(outcome_name)}_Dichotomous_Export.csv", iter_csv(DICHOTOMOUS_COLUMNS, data_rows)
+        wrote_any = True
+
+    # Fallback: build outcomes from legacy 'dichotomous_outcome' static fields
+    if not wrote_any:
+        studies = (
+            db.session.query(Study.id, Study.title)
+            .filter(Study.project_id == project_id)
+            .order_by(Study.id.asc())
+            .all()
+        )
+        for f, rows in legacy_dichotomous_tables(project_id, studies):
+            yield f"{prefix}_{safe(f.label)}_Dichotomous_Export.csv", iter_csv(DICHOTOMOUS_COLUMNS, rows)
+            wrote_any = True
+
+    # Additionally include continuous outcomes, grouped per outcome name
+    wrote_any_cont = False
+    for outcome_name, data_rows in _iter_continuous_groups(project_id):
+        # add a type suffix to distinguish
+        yield f"{prefix}_{safe(outcome_name)}_Continuous_Export.csv", iter_csv(CONTINUOUS_COLUMNS, data_rows)
+        wrote_any_cont = True
+
+    # If still nothing to write, include a README in the zip to avoid an empty archive
+    if not wrote_any and not wrote_any_cont:
+        yield "README.txt", [
+            "No outcomes found for this project.\n"
+            "- Enter dichotomous outcomes or continuous outcomes on the study page, or\n"
+            "- Use legacy dichotomous outcome fields and resubmit.\n"
+        ]
+
+
+def all_data_zip_entries(project_id: int, project_name: str):
+    """Yield (arcname, text_chunks) entries for the static + outcomes export."""
+    prefix = safe_filename(project_name)
+    yield f"{prefix}_Static_Fields.csv", iter_static_csv(project_id)
+
+    # Outcome CSVs (same logic as the outcomes export)
+    wrote_any_dich = False
+    for outcome_name, data_rows in _iter_dichotomous_groups(project_id):
+        yield f"{prefix}_{safe_filename(outcome_name)}_Dichotomous_Export.csv", iter_csv(DICHOTOMOUS_COLUMNS, data_rows)
+        wrote_any_dich = True
+
+    # Continuous outcomes per outcome file
+    wrote_any_cont = False
+    for outcome_name, data_rows in _iter_continuous_groups(project_id):
+        yield f"{prefix}_{safe_filename(outcome_name)}_Continuous_Export.csv", iter_csv(CONTINUOUS_COLUMNS, data_rows)
+        wrote_any_cont = True
+
+    if not wrote_any_dich and not wrote_any_cont:
+        yield "README_outcomes.txt", [
+            "No outcomes found for this project.\n"
+            "The zip includes only the static fields CSV.\n"
+        ]
+
+
+def _encode_chunks(chunks):
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+
+# kind -> (download name suffix, mimetype)
+EXPORT_KINDS = {
+    'static': ('_Static_Fields.csv', 'text/csv'),
+    'outcomes': ('_Outcomes_Export.zip', 'application/zip'),
+    'all': ('_All_Data.zip', 'application/zip'),
+}
+
+
+def export_download_name(kind: str, project_name: str) -> str:
+    suffix, _mimetype = EXPORT_KINDS[kind]
+    fallback = 'outcome' if kind == 'outcomes' else 'project'
+    return f"{safe_filename(project_name, fallback)}{suffix}"
+
+
+def build_export(kind: str, project_id: int, project_name: str):
+    """Return ``(download_name, mimetype, byte_chunks)`` for an export kind.
+
+    Nothing is queried until ``byte_chunks`` is iterated, and it only needs an
+    application context, so the same builder serves streamed responses and
+    background jobs.
+    """
+    _suffix, mimetype = EXPORT_KINDS[kind]
+    if kind == 'static':
+        chunks = _encode_chunks(iter_static_csv(project_id))
+    elif kind == 'outcomes':
+        chunks = iter_zip(outcome_zip_entries(project_id, project_name))
+    else:
+        chunks = iter_zip(all_data_zip_entries(project_id, project_name))
+    return export_download_name(kind, project_name), mimetype, chunks
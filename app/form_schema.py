@@ -0,0 +1,218 @@
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+from app import db
+from app.models import CustomFormField, Project
+
+# A project's data-entry form compiled once into immutable objects: ordered
+# sections, field descriptors with parsed options, and the expanded export
+# columns. Compiled schemas are cached per process and keyed by
+# Project.form_version, which every field add/edit/delete/reorder bumps, so a
+# worker never serves a form another worker has since changed. The project's
+# created_at is part of the key because SQLite may reuse a deleted project's id.
+
+STUDY_COLUMNS = ['Study', 'Author', 'Year']
+
+# Composite field types expand into several export columns:
+# field_type -> [(kind, column suffix, key path into the stored JSON value)]
+COMPOSITE_COLUMNS = {
+    'dichotomous_outcome': [
+        ('events', ' (events)', ('events',)),
+        ('total', ' (total)', ('total',)),
+    ],
+    'baseline_continuous': [
+        ('int_mean', ' (intervention mean)', ('intervention', 'mean')),
+        ('int_sd', ' (intervention sd)', ('intervention', 'sd')),
+        ('ctrl_mean', ' (control mean)', ('control', 'mean')),
+        ('ctrl_sd', ' (control sd)', ('control', 'sd')),
+    ],
+    'baseline_categorical': [
+        ('int_pct', ' (intervention %)', ('intervention', 'percent')),
+        ('ctrl_pct', ' (control %)', ('control', 'percent')),
+    ],
+}
+
+# Compiled schemas kept per process (least recently used dropped first)
+FORM_SCHEMA_CACHE_SIZE = 256
+
+_cache: 'OrderedDict[int, FormSchema]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class FormFieldSpec:
+    id: int
+    section: str
+    label: str
+    field_type: str
+    required: bool
+    help_text: str | None
+    # Raw JSON as stored, and its parsed, read-only form
+    options: str | None
+    parsed_options: Mapping
+
+
+@dataclass(frozen=True)
+class FormSection:
+    name: str
+    fields: tuple
+
+
+@dataclass(frozen=True)
+class FormSchema:
+    project_id: int
+    # (form_version, project created_at) the schema was compiled for
+    stamp: tuple
+    fields: tuple
+    fields_by_id: Mapping
+    sections: tuple
+    # Flat static export layout, see build_export_columns()
+    export_columns: tuple
+    expanded_fields: tuple
+    export_slots: Mapping
+
+    @property
+    def study_id_field_id(self) -> int | None:
+        """The oldest field labelled "Study ID", shown in study listings."""
+        return min((f.id for f in self.fields if (f.label or '').lower() == 'study id'), default=None)
+
+
+def ordered_form_fields(project_id: int):
+    """Load a project's form fields in the user-visible section/field order."""
+    return (
+        CustomFormField.query
+        .filter_by(project_id=project_id)
+        .order_by(
+            db.func.coalesce(CustomFormField.section_order, 999999).asc(),
+            CustomFormField.section.asc(),
+            db.func.coalesce(CustomFormField.sort_order, CustomFormField.id).asc(),
+            CustomFormField.id.asc(),
+        )
+        .all()
+    )
+
+
+def build_export_columns(fields):
+    """Return (columns, expanded_fields) for the flat static-fields export.
+
+    ``expanded_fields`` holds one ``(field, kind)`` pair per non-study column,
+    where kind is 'single' or one of the composite kinds in COMPOSITE_COLUMNS.
+    """
+    columns = list(STUDY_COLUMNS)
+    expanded_fields = []
+    for f in fields:
+        base = f"{f.section} - {f.label}".strip()
+        parts = COMPOSITE_COLUMNS.get(f.field_type)
+        if parts:
+            for kind, suffix, _path in parts:
+                columns.append(f"{base}{suffix}")
+                expanded_fields.append((f, kind))
+        else:
+            columns.append(base)
+            expanded_fields.append((f, 'single'))
+    return columns, expanded_fields
+
+
+def field_slots(expanded_fields):
+    """Map form_field_id -> [(column index, JSON key path or None for raw)]."""
+    slots = {}
+    offset = len(STUDY_COLUMNS)
+    for idx, (f, kind) in enumerate(expanded_fields, start=offset):
+        path = None
+        if kind != 'single':
+            path = next(p for k, _s, p in COMPOSITE_COLUMNS[f.field_type] if k == kind)
+        slots.setdefault(f.id, []).append((idx, path))
+    return slots
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _parse_options(raw: str | None) -> Mapping:
+    if not raw:
+        return MappingProxyType({})
+    try:
+        parsed = json.loads(raw)
+    except ValueError:
+        return MappingProxyType({})
+    return _freeze(parsed) if isinstance(parsed, dict) else MappingProxyType({})
+
+
+def compile_form_schema(project_id: int, stamp: tuple = ()) -> FormSchema:
+    fields = tuple(
+        FormFieldSpec(
+            id=f.id,
+            section=f.section,
+            label=f.label,
+            field_type=f.field_type,
+            required=bool(f.required),
+            help_text=f.help_text,
+            options=f.options,
+            parsed_options=_parse_options(f.options),
+        )
+        for f in ordered_form_fields(project_id)
+    )
+    # Group consecutive fields; the query order already is the section order
+    grouped = []
+    for f in fields:
+        if not grouped or grouped[-1][0] != f.section:
+            grouped.append((f.section, []))
+        grouped[-1][1].append(f)
+    columns, expanded_fields = build_export_columns(fields)
+    slots = field_slots(expanded_fields)
+    return FormSchema(
+        project_id=project_id,
+        stamp=stamp,
+        fields=fields,
+        fields_by_id=MappingProxyType({f.id: f for f in fields}),
+        sections=tuple(FormSection(name=name, fields=tuple(fs)) for name, fs in grouped),
+        export_columns=tuple(columns),
+        expanded_fields=tuple(expanded_fields),
+        export_slots=MappingProxyType({fid: tuple(targets) for fid, targets in slots.items()}),
+    )
+
+
+def get_form_schema(project_id: int, project: Project | None = None) -> FormSchema:
+    """Return the compiled form of a project, compiling it on a cache miss.
+
+    Pass the already loaded ``project`` when available; otherwise its version
+    is read from the database.
+    """
+    if project is not None:
+        stamp = (project.form_version or 0, project.created_at)
+    else:
+        row = (
+            db.session.query(Project.form_version, Project.created_at)
+            .filter(Project.id == project_id)
+            .first()
+        )
+        stamp = (row[0] or 0, row[1]) if row else (0, None)
+    with _cache_lock:
+        schema = _cache.get(project_id)
+        if schema is not None and schema.stamp == stamp:
+            _cache.move_to_end(project_id)
+            return schema
+    schema = compile_form_schema(project_id, stamp)
+    with _cache_lock:
+        _cache[project_id] = schema
+        _cache.move_to_end(project_id)
+        while len(_cache) > FORM_SCHEMA_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return schema
+
+
+def invalidate_form_schema(project_id: int | None = None):
+    """Drop the cached schema of one project, or of every project."""
+    with _cache_lock:
+        if project_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(project_id, None)
@@ -2,6 +2,7 @@ from app import db
 from flask_login import UserMixin
 from datetime import datetime
 from sqlalchemy import UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class Project(db.Model):
@@ -9,6 +10,11 @@ class Project(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Bumped by every write to the project's studies, form or extracted data
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_updated_at = db.Column(db.DateTime, nullable=True)
+    # Bumped only when the form itself (fields, order, options) changes
+    form_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     studies = db.relationship('Study', backref='project', lazy='dynamic')
     # Project-level predefined outcomes
     outcomes = db.relationship(
@@ -34,6 +40,13 @@ class Study(db.Model):
     # Optional auditing: who created it (nullable for legacy rows)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
+    # Keyset pagination of a project's studies by id, year or author
+    __table_args__ = (
+        db.Index('ix_study_project_id_id', 'project_id', 'id'),
+        db.Index('ix_study_project_year_id', 'project_id', 'year', 'id'),
+        db.Index('ix_study_project_author_id', 'project_id', 'author', 'id'),
+    )
+
 class CustomFormField(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
@@ -46,6 +59,10 @@ class CustomFormField(db.Model):
     help_text = db.Column(db.Text, nullable=True)
     options = db.Column(db.Text, nullable=True)  # JSON for select choices, etc.
 
+    __table_args__ = (
+        db.Index('ix_custom_form_field_project_section_sort', 'project_id', 'section', 'sort_order'),
+    )
+
     project = db.relationship('Project', backref=db.backref('form_fields', lazy='dynamic', cascade="all, delete-orphan"))
 
     def __repr__(self):
@@ -55,7 +72,21 @@ class StudyDataValue(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     study_id = db.Column(db.Integer, db.ForeignKey('study.id'), nullable=False)
     form_field_id = db.Column(db.Integer, db.ForeignKey('custom_form_field.id'), nullable=False)
+    # Copy of study.project_id so project-wide reads need no join to study;
+    # filled in and checked on insert (see app.data_values)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
     value = db.Column(db.Text, nullable=True)
+    # Typed copies of value derived from the field type on write (see
+    # app.data_values): numbers for 'integer' fields, the parsed document
+    # for composite fields; NULL otherwise
+    value_num = db.Column(db.Float, nullable=True)
+    value_json = db.Column(db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql'), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('study_id', 'form_field_id', name='uq_study_data_value_study_field'),
+        db.Index('ix_study_data_value_form_field_id', 'form_field_id'),
+        db.Index('ix_study_data_value_project_field', 'project_id', 'form_field_id'),
+    )
 
     study = db.relationship('Study', backref=db.backref('data_values', lazy='dynamic', cascade="all, delete-orphan"))
     form_field = db.relationship('CustomFormField', backref=db.backref('data_values', cascade="all, delete-orphan"))
@@ -67,12 +98,20 @@ class StudyNumericalOutcome(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     study_id = db.Column(db.Integer, db.ForeignKey('study.id'), nullable=False)
     outcome_name = db.Column(db.String(200), nullable=False)
+    # The declared outcome this row's name refers to, if any (see app.outcomes)
+    project_outcome_id = db.Column(db.Integer, db.ForeignKey('project_outcome.id', ondelete='SET NULL'), nullable=True)
     events_intervention = db.Column(db.Integer, nullable=True)
     total_intervention = db.Column(db.Integer, nullable=True)
     events_control = db.Column(db.Integer, nullable=True)
     total_control = db.Column(db.Integer, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_study_numerical_outcome_study_name', 'study_id', 'outcome_name'),
+        db.Index('ix_study_numerical_outcome_outcome_study', 'project_outcome_id', 'study_id'),
+    )
+
     study = db.relationship('Study', backref=db.backref('numerical_outcomes', lazy='dynamic', cascade="all, delete-orphan"))
+    project_outcome = db.relationship('ProjectOutcome', backref=db.backref('numerical_rows', lazy='dynamic'))
 
     def __repr__(self):
         return f'<StudyNumericalOutcome {self.outcome_name} for Study {self.study_id}>'
@@ -84,6 +123,10 @@ class ProjectOutcome(db.Model):
     name = db.Column(db.String(200), nullable=False)
     outcome_type = db.Column(db.String(50), nullable=False, default='dichotomous')  # future: continuous, etc.
 
+    __table_args__ = (
+        db.Index('ix_project_outcome_project_name', 'project_id', 'name'),
+    )
+
     def __repr__(self):
         return f'<ProjectOutcome {self.name} ({self.outcome_type})>'
 
@@ -92,6 +135,8 @@ class StudyContinuousOutcome(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     study_id = db.Column(db.Integer, db.ForeignKey('study.id'), nullable=False)
     outcome_name = db.Column(db.String(200), nullable=False)
+    # The declared outcome this row's name refers to, if any (see app.outcomes)
+    project_outcome_id = db.Column(db.Integer, db.ForeignKey('project_outcome.id', ondelete='SET NULL'), nullable=True)
     mean_intervention = db.Column(db.Float, nullable=True)
     sd_intervention = db.Column(db.Float, nullable=True)
     n_intervention = db.Column(db.Integer, nullable=True)
@@ -99,12 +144,76 @@ class StudyContinuousOutcome(db.Model):
     sd_control = db.Column(db.Float, nullable=True)
     n_control = db.Column(db.Integer, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_study_continuous_outcome_study_name', 'study_id', 'outcome_name'),
+        db.Index('ix_study_continuous_outcome_outcome_study', 'project_outcome_id', 'study_id'),
+    )
+
     study = db.relationship('Study', backref=db.backref('continuous_outcomes', lazy='dynamic', cascade="all, delete-orphan"))
+    project_outcome = db.relationship('ProjectOutcome', backref=db.backref('continuous_rows', lazy='dynamic'))
 
     def __repr__(self):
         return f'<StudyContinuousOutcome {self.outcome_name} for Study {self.study_id}>'
 
 
+class StudyEffectSize(db.Model):
+    """Effect size of one outcome row for one measure, maintained on save.
+
+    Rows exist only for measures the outcome row can enter (see
+    app.effect_sizes); ``yi`` is on the analysis scale (log for ratios).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    # Copy of study.project_id so an analysis reads its rows without a join
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    study_id = db.Column(db.Integer, db.ForeignKey('study.id'), nullable=False)
+    # Exactly one of the outcome row references is set
+    numerical_outcome_id = db.Column(db.Integer, db.ForeignKey('study_numerical_outcome.id', ondelete='CASCADE'), nullable=True)
+    continuous_outcome_id = db.Column(db.Integer, db.ForeignKey('study_continuous_outcome.id', ondelete='CASCADE'), nullable=True)
+    # Copy of the outcome row's project_outcome_id, kept for OutcomeEffectStats
+    project_outcome_id = db.Column(db.Integer, db.ForeignKey('project_outcome.id', ondelete='SET NULL'), nullable=True)
+    measure = db.Column(db.String(8), nullable=False)
+    yi = db.Column(db.Float, nullable=False)
+    vi = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('numerical_outcome_id', 'measure', name='uq_study_effect_size_numerical_measure'),
+        UniqueConstraint('continuous_outcome_id', 'measure', name='uq_study_effect_size_continuous_measure'),
+        db.Index('ix_study_effect_size_project_measure', 'project_id', 'measure'),
+        db.Index('ix_study_effect_size_study_id', 'study_id'),
+        db.Index('ix_study_effect_size_outcome_measure', 'project_outcome_id', 'measure'),
+    )
+
+    study = db.relationship('Study', backref=db.backref('effect_sizes', lazy='dynamic', cascade="all, delete-orphan"))
+    numerical_outcome = db.relationship(
+        'StudyNumericalOutcome', backref=db.backref('effect_sizes', cascade="all, delete-orphan", passive_deletes=True)
+    )
+    continuous_outcome = db.relationship(
+        'StudyContinuousOutcome', backref=db.backref('effect_sizes', cascade="all, delete-orphan", passive_deletes=True)
+    )
+
+    def __repr__(self):
+        return f'<StudyEffectSize {self.measure} for Study {self.study_id}>'
+
+
+class OutcomeEffectStats(db.Model):
+    """Running inverse-variance sums of a declared outcome's effect sizes.
+
+    One row per outcome and measure over its stored StudyEffectSize rows,
+    with w = 1 / vi; shifted by the difference on each save while the rows are
+    locked (see app.effect_sizes).
+    """
+    project_outcome_id = db.Column(db.Integer, db.ForeignKey('project_outcome.id', ondelete='CASCADE'), primary_key=True)
+    measure = db.Column(db.String(8), primary_key=True)
+    k = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    sum_w = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    sum_wy = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    sum_wy2 = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    sum_w2 = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    outcome = db.relationship('ProjectOutcome', backref=db.backref('effect_stats', lazy='dynamic', cascade="all, delete-orphan"))
+
+
 class PasswordResetToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -133,6 +242,11 @@ class User(db.Model, UserMixin):
     memberships = db.relationship('ProjectMembership', backref='user', lazy='dynamic', cascade="all, delete-orphan")
     studies_created = db.relationship('Study', backref='creator', lazy='dynamic')
 
+    # Logins and lookups match email case-insensitively
+    __table_args__ = (
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
+
     def set_password(self, password: str):
         self.password_hash = generate_password_hash(password)
 
@@ -150,6 +264,7 @@ class ProjectMembership(db.Model):
 
     __table_args__ = (
         UniqueConstraint('user_id', 'project_id', name='uq_membership_user_project'),
+        db.Index('ix_project_membership_project_role', 'project_id', 'role'),
     )
 
     def is_owner(self) -> bool:
@@ -172,6 +287,27 @@ class FormChangeRequest(db.Model):
     reviewed_at = db.Column(db.DateTime, nullable=True)
     resolution_notes = db.Column(db.Text, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_form_change_request_project_status', 'project_id', 'status'),
+    )
+
     project = db.relationship('Project', backref=db.backref('change_requests', lazy='dynamic', cascade="all, delete-orphan"))
     requester = db.relationship('User', foreign_keys=[requested_by])
     reviewer = db.relationship('User', foreign_keys=[reviewed_by])
+
+
+class ProjectStats(db.Model):
+    """Denormalized per-project counters, shifted by the write paths."""
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+    study_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    field_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    dichotomous_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    continuous_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_request_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    project = db.relationship('Project', backref=db.backref('stats', uselist=False, cascade="all, delete-orphan"))
+
+    @property
+    def outcome_row_count(self) -> int:
+        return (self.dichotomous_count or 0) + (self.continuous_count or 0)
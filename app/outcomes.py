@@ -0,0 +1,100 @@
+from sqlalchemy import delete, select, update
+from app import db
+from app.models import (
+    OutcomeEffectStats,
+    ProjectOutcome,
+    Study,
+    StudyContinuousOutcome,
+    StudyEffectSize,
+    StudyNumericalOutcome,
+)
+
+# Outcome rows keep the outcome_name they were entered with and, when that
+# names one of the project's declared outcomes of the matching type, also
+# reference the ProjectOutcome by id. Names match case-insensitively after
+# trimming, the rule the member permission checks have always used. Owners
+# may still record undeclared names; those rows have no project_outcome_id.
+
+ROW_MODELS = {
+    'dichotomous': StudyNumericalOutcome,
+    'continuous': StudyContinuousOutcome,
+}
+# outcome type -> StudyEffectSize column referencing the outcome row
+EFFECT_SIZE_COLUMNS = {
+    'dichotomous': StudyEffectSize.numerical_outcome_id,
+    'continuous': StudyEffectSize.continuous_outcome_id,
+}
+
+
+def outcome_key(name: str | None) -> str:
+    return (name or '').strip().lower()
+
+
+def outcome_ids_by_name(project_id: int, outcome_type: str) -> dict[str, int]:
+    """Return {outcome_key(name): ProjectOutcome id} for one outcome type in one query."""
+    rows = db.session.execute(
+        select(ProjectOutcome.id, ProjectOutcome.name)
+        .where(ProjectOutcome.project_id == project_id, ProjectOutcome.outcome_type == outcome_type)
+        # Oldest outcome wins should two names ever normalize alike
+        .order_by(ProjectOutcome.id.desc())
+    )
+    return {outcome_key(name): oid for oid, name in rows}
+
+
+def link_outcome_rows(outcome: ProjectOutcome) -> None:
+    """Point existing unlinked rows named like a newly declared outcome at it.
+
+    Their stored effect sizes follow, so the outcome's OutcomeEffectStats are
+    built from them on first use. ``outcome`` must have been flushed. The
+    caller commits.
+    """
+    model = ROW_MODELS.get(outcome.outcome_type)
+    if model is None:
+        return
+    db.session.execute(
+        update(model)
+        .where(
+            model.study_id.in_(select(Study.id).where(Study.project_id == outcome.project_id)),
+            model.project_outcome_id.is_(None),
+            db.func.lower(db.func.trim(model.outcome_name)) == outcome_key(outcome.name),
+        )
+        .values(project_outcome_id=outcome.id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(StudyEffectSize)
+        .where(EFFECT_SIZE_COLUMNS[outcome.outcome_type].in_(
+            select(model.id).where(model.project_outcome_id == outcome.id)
+        ))
+        .values(project_outcome_id=outcome.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def unlink_outcome_rows(outcome: ProjectOutcome) -> None:
+    """Detach rows and stored effect sizes from an outcome about to be deleted.
+
+    The foreign keys say ON DELETE SET NULL, but SQLite does not enforce them
+    and may hand the freed id to the next outcome, so the references are
+    cleared here and the outcome's OutcomeEffectStats dropped. The rows keep
+    their outcome_name, so declaring the outcome again links them back. Call
+    it before deleting the outcome; the caller commits.
+    """
+    for model in ROW_MODELS.values():
+        db.session.execute(
+            update(model)
+            .where(model.project_outcome_id == outcome.id)
+            .values(project_outcome_id=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.execute(
+        update(StudyEffectSize)
+        .where(StudyEffectSize.project_outcome_id == outcome.id)
+        .values(project_outcome_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        delete(OutcomeEffectStats)
+        .where(OutcomeEffectStats.project_outcome_id == outcome.id)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,144 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.form_schema import invalidate_form_schema
+from app.models import (
+    CustomFormField,
+    FormChangeRequest,
+    Project,
+    ProjectStats,
+    Study,
+    StudyContinuousOutcome,
+    StudyNumericalOutcome,
+)
+
+
+def bump_project_version(project_id: int, form_changed: bool = False) -> None:
+    """Mark a project's data as changed.
+
+    Increments ``Project.data_version`` in SQL (so concurrent writers never
+    lose an increment) and stamps ``data_updated_at``. Call it before the write
+    path commits so the bump lands in the same transaction as the change.
+    Pass ``form_changed=True`` when fields were added, edited, reordered or
+    deleted so that ``Project.form_version`` moves too.
+    """
+    values = {'data_version': Project.data_version + 1, 'data_updated_at': datetime.utcnow()}
+    if form_changed:
+        values['form_version'] = Project.form_version + 1
+    db.session.execute(
+        db.update(Project)
+        .where(Project.id == project_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if form_changed:
+        invalidate_form_schema(project_id)
+
+
+def project_created_stamp(project) -> int:
+    """Creation time in whole seconds, to tell apart projects that reused an id.
+
+    SQLite may hand a deleted project's id to a new one, whose data_version
+    starts over, so keys derived from (id, data_version) alone can collide.
+    """
+    return int(project.created_at.timestamp()) if project.created_at else 0
+
+
+def project_etag(project, kind: str) -> str:
+    """Validator for a derived artifact of a project, e.g. an export kind."""
+    return f"p{project.id}-{project_created_stamp(project)}-v{project.data_version or 0}-{kind}"
+
+
+def _stat_expressions(project_id: int) -> dict:
+    """ProjectStats column -> correlated COUNT subquery for one project."""
+    return {
+        'study_count': (
+            db.select(db.func.count(Study.id))
+            .where(Study.project_id == project_id)
+            .scalar_subquery()
+        ),
+        'field_count': (
+            db.select(db.func.count(CustomFormField.id))
+            .where(CustomFormField.project_id == project_id)
+            .scalar_subquery()
+        ),
+        'dichotomous_count': (
+            db.select(db.func.count(StudyNumericalOutcome.id))
+            .join(Study, StudyNumericalOutcome.study_id == Study.id)
+            .where(Study.project_id == project_id)
+            .scalar_subquery()
+        ),
+        'continuous_count': (
+            db.select(db.func.count(StudyContinuousOutcome.id))
+            .join(Study, StudyContinuousOutcome.study_id == Study.id)
+            .where(Study.project_id == project_id)
+            .scalar_subquery()
+        ),
+        'pending_request_count': (
+            db.select(db.func.count(FormChangeRequest.id))
+            .where(FormChangeRequest.project_id == project_id, FormChangeRequest.status == 'pending')
+            .scalar_subquery()
+        ),
+    }
+
+
+def refresh_project_stats(project_id: int, *counters: str) -> None:
+    """Recount the given ProjectStats counters (all when none are named).
+
+    Runs as one UPDATE with a COUNT subquery per counter over the whole
+    project, so it is meant for building and repairing the row (first read,
+    `flask refresh-project-stats`); write paths use shift_project_stats().
+    Creates the row when missing. Like bump_project_version, call it before
+    the commit.
+    """
+    expressions = _stat_expressions(project_id)
+    values = {name: expressions[name] for name in (counters or expressions)}
+    values['updated_at'] = datetime.utcnow()
+    result = db.session.execute(
+        db.update(ProjectStats)
+        .where(ProjectStats.project_id == project_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return
+    row = dict(expressions, project_id=project_id, updated_at=values['updated_at'])
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(ProjectStats).values(**row))
+    except IntegrityError:
+        # A concurrent writer created the row first; count again on top of it
+        refresh_project_stats(project_id, *counters)
+
+
+def shift_project_stats(project_id: int, **deltas: int) -> None:
+    """Add ``deltas`` to ProjectStats counters, e.g. ``study_count=1``.
+
+    One UPDATE that increments in SQL, so concurrent writers compose and the
+    cost does not depend on the project's size. A missing row is built by a
+    full recount instead, which already includes the pending change. Like
+    bump_project_version, call it before the commit.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    values = {name: getattr(ProjectStats, name) + delta for name, delta in deltas.items()}
+    values['updated_at'] = datetime.utcnow()
+    result = db.session.execute(
+        db.update(ProjectStats)
+        .where(ProjectStats.project_id == project_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        refresh_project_stats(project_id)
+
+
+def get_project_stats(project_id: int) -> ProjectStats:
+    """Return the counters row for a project, building it on first use."""
+    stats = db.session.get(ProjectStats, project_id)
+    if stats is None:
+        refresh_project_stats(project_id)
+        db.session.commit()
+        stats = db.session.get(ProjectStats, project_id)
+    return stats
@@ -1,18 +1,44 @@
 import io # Import io for BytesIO
-import zipfile # Import zipfile
 import os
 import secrets
 import hashlib
+from dataclasses import asdict
 from datetime import date, datetime, timedelta
 from sqlalchemy import or_
-from flask import render_template, flash, redirect, url_for, request, send_file, jsonify, abort # Import send_file, jsonify, abort
+from werkzeug.http import is_resource_modified
+from flask import render_template, flash, redirect, url_for, request, send_file, jsonify, abort, Response, stream_with_context # Import send_file, jsonify, abort
 from flask_login import current_user, login_user, logout_user, login_required
 from app import app, db
 from app.forms import ProjectForm, StudyForm, CustomFormFieldForm, OutcomeForm, RegisterForm, LoginForm, AddMemberForm, ForgotPasswordForm, ResetPasswordForm
-from app.models import Project, Study, CustomFormField, StudyDataValue, StudyNumericalOutcome, ProjectOutcome, StudyContinuousOutcome, User, ProjectMembership, FormChangeRequest, PasswordResetToken # Import new models
+from app.access import ProjectAccess, current_user_is_admin, project_access
+from app.user_cache import invalidate_user
+from app.models import Project, Study, CustomFormField, StudyNumericalOutcome, ProjectOutcome, StudyContinuousOutcome, User, ProjectMembership, FormChangeRequest, PasswordResetToken # Import new models
 from app.utils import load_template_and_create_form_fields, load_template_from_yaml_content, send_password_reset_email # Import the new utility functions
+from app.data_values import load_study_values, retype_field_values, upsert_study_values
+from app.analysis import DEFAULT_TAU2_ESTIMATOR, TAU2_ESTIMATORS, analyze_continuous, analyze_dichotomous, pool_outcome_sums
+from app.effect_sizes import (
+    CONTINUOUS_MEASURES,
+    DICHOTOMOUS_MEASURES,
+    RATIO_MEASURES,
+    discard_study_effect_sizes,
+    get_outcome_effect_stats,
+    refresh_study_effect_sizes,
+)
+from app.outcomes import link_outcome_rows, outcome_ids_by_name, outcome_key, unlink_outcome_rows
+from app.exports import EXPORT_KINDS, build_export, export_download_name, load_project_frame, safe_filename
+from app.form_schema import get_form_schema, invalidate_form_schema
+from app.study_listing import load_study_page
+from app.dashboard import load_dashboard
+from app.export_cache import get_cached_export, iter_and_cache, purge_project_exports
+from app.export_jobs import enqueue_export_job, export_job_artifact_path, get_export_job
+from app.project_state import (
+    bump_project_version,
+    get_project_stats,
+    project_created_stamp,
+    project_etag,
+    shift_project_stats,
+)
 import json # Import json for handling dichotomous_outcome
-from pandas import DataFrame # Import pandas DataFrame
 
 # -------------------- Health endpoint (no auth) --------------------
 
@@ -34,29 +60,21 @@ def healthz():
 # -------------------- RBAC helpers --------------------
 
 def is_admin() -> bool:
-    return bool(getattr(current_user, 'is_authenticated', False) and getattr(current_user, 'is_admin', False))
+    return current_user_is_admin()
 
 
-def get_membership_for(project_id: int):
-    if not getattr(current_user, 'is_authenticated', False):
-        return None
-    return ProjectMembership.query.filter_by(user_id=current_user.id, project_id=project_id).first()
-
-
-def require_project_member(project_id: int):
-    if is_admin():
-        return
-    ms = get_membership_for(project_id)
-    if not ms:
+def require_project_member(project_id: int) -> ProjectAccess:
+    access = project_access(project_id)
+    if not access.can_view:
         abort(403)
+    return access
 
 
-def require_project_owner(project_id: int):
-    if is_admin():
-        return
-    ms = get_membership_for(project_id)
-    if not ms or (ms.role or '').lower() != 'owner':
+def require_project_owner(project_id: int) -> ProjectAccess:
+    access = project_access(project_id)
+    if not access.is_owner_or_admin:
         abort(403)
+    return access
 
 
 FORM_TEMPLATE_META: dict[str, dict[str, str]] = {
@@ -104,6 +122,7 @@ def _propose_change(project_id: int, action_type: str, payload: dict, reason: st
         status='pending',
     )
     db.session.add(fcr)
+    shift_project_stats(project_id, pending_request_count=1)
     db.session.commit()
     return fcr
 
@@ -119,27 +138,14 @@ def index():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    if is_admin():
-        projects = Project.query.order_by(Project.id.asc()).all()
-        roles_by_project = {p.id: 'Admin' for p in projects}
-    else:
-        # Only projects where the user is a member/owner
-        projects = (
-            Project.query
-            .join(ProjectMembership, ProjectMembership.project_id == Project.id)
-            .filter(ProjectMembership.user_id == current_user.id)
-            .order_by(Project.id.asc())
-            .all()
-        )
-        # Map project -> role label
-        pm_rows = (
-            ProjectMembership.query
-            .filter(ProjectMembership.user_id == current_user.id,
-                    ProjectMembership.project_id.in_([p.id for p in projects]))
-            .all()
-        )
-        roles_by_project = {pm.project_id: (pm.role or '').capitalize() for pm in pm_rows}
-    return render_template('index.html', projects=projects, roles_by_project=roles_by_project)
+    # Admins see every project, everyone else only projects they belong to
+    page = load_dashboard(
+        current_user.id,
+        is_admin(),
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+    )
+    return render_template('index.html', projects=page.projects, page=page)
 
 
 # -------------------- Auth routes --------------------
@@ -269,6 +275,7 @@ def reset_password(token):
         # Clean up any other outstanding tokens for this user
         _purge_expired_tokens(user.id)
         db.session.commit()
+        invalidate_user(user.id)
         flash('Your password has been reset. You can now log in.', 'success')
         return redirect(url_for('login'))
     return render_template('auth_reset_password.html', form=form)
@@ -297,80 +304,38 @@ def add_project():
 def project_detail(project_id):
     project = Project.query.get_or_404(project_id)
     require_project_member(project.id)
-    studies = project.studies.all()
-    try:
-        field_count = project.form_fields.count()
-    except Exception:
-        # In case relationship is not loaded as query
-        field_count = len(project.form_fields.all()) if hasattr(project.form_fields, 'all') else 0
-    # Count recorded outcomes (any type) for this project
-    try:
-        dich_count = (
-            db.session.query(db.func.count(StudyNumericalOutcome.id))
-            .join(Study, StudyNumericalOutcome.study_id == Study.id)
-            .filter(Study.project_id == project.id)
-            .scalar()
-        ) or 0
-    except Exception:
-        dich_count = 0
-    try:
-        cont_count = (
-            db.session.query(db.func.count(StudyContinuousOutcome.id))
-            .join(Study, StudyContinuousOutcome.study_id == Study.id)
-            .filter(Study.project_id == project.id)
-            .scalar()
-        ) or 0
-    except Exception:
-        cont_count = 0
-    outcome_row_count = int(dich_count) + int(cont_count)
+    # Header counters come from one maintained row instead of COUNT queries
+    stats = get_project_stats(project.id)
 
     # Pending change requests for owners/admins
-    ms = get_membership_for(project.id)
-    is_owner_or_admin = bool(is_admin() or (ms and (ms.role or '').lower() == 'owner'))
-    if is_admin():
-        role_label = 'Admin'
-    elif ms and ms.role:
-        role_label = ms.role.capitalize()
-    else:
-        role_label = ''
-    is_member = bool(ms and ms.is_member())
-    pending_count = project.change_requests.filter_by(status='pending').count() if is_owner_or_admin else 0
-
-    # Resolve Study ID values for listing, if a field labeled "Study ID" exists
-    study_id_map = {}
-    try:
-        sid_field = (
-            CustomFormField.query
-            .filter_by(project_id=project.id)
-            .filter(db.func.lower(CustomFormField.label) == 'study id')
-            .order_by(CustomFormField.id.asc())
-            .first()
-        )
-        if sid_field and studies:
-            study_ids = [s.id for s in studies]
-            rows = (
-                StudyDataValue.query
-                .filter(StudyDataValue.form_field_id == sid_field.id)
-                .filter(StudyDataValue.study_id.in_(study_ids))
-                .all()
-            )
-            for r in rows:
-                if r and r.value:
-                    study_id_map[r.study_id] = r.value
-    except Exception:
-        study_id_map = {}
+    access = project_access(project.id)
+    is_owner_or_admin = access.is_owner_or_admin
+    role_label = access.role_label
+    is_member = access.is_member
+    pending_count = stats.pending_request_count if is_owner_or_admin else 0
+
+    # One page of studies, with Study ID values when a field labeled "Study ID" exists
+    page = load_study_page(
+        project.id,
+        get_form_schema(project.id, project).study_id_field_id,
+        sort=request.args.get('sort', 'id'),
+        direction=request.args.get('dir', 'asc'),
+        q=request.args.get('q'),
+        cursor=request.args.get('cursor'),
+    )
 
     return render_template(
         'project_detail.html',
         project=project,
-        studies=studies,
-        field_count=field_count,
-        study_count=len(studies),
-        outcome_row_count=outcome_row_count,
+        studies=page.studies,
+        page=page,
+        field_count=stats.field_count,
+        study_count=stats.study_count,
+        outcome_row_count=stats.outcome_row_count,
         pending_count=pending_count,
         is_owner_or_admin=is_owner_or_admin,
         role_label=role_label,
-        study_id_map=study_id_map,
+        study_id_map=page.study_id_map,
         is_member=is_member,
     )
 
@@ -380,38 +345,16 @@ def project_detail(project_id):
 def list_form_fields(project_id):
     project = Project.query.get_or_404(project_id)
     require_project_member(project.id)
-    fields = (
-        CustomFormField.query
-        .filter_by(project_id=project.id)
-        .order_by(
-            db.func.coalesce(CustomFormField.section_order, 999999).asc(),
-            CustomFormField.section.asc(),
-            db.func.coalesce(CustomFormField.sort_order, CustomFormField.id).asc(),
-            CustomFormField.id.asc(),
-        )
-        .all()
-    )
-    # Build ordered sections preserving section order
-    grouped_fields = []
-    cur_section = None
-    for f in fields:
-        if not grouped_fields or grouped_fields[-1]['name'] != f.section:
-            grouped_fields.append({'name': f.section, 'fields': []})
-        grouped_fields[-1]['fields'].append(f)
+    grouped_fields = get_form_schema(project.id, project).sections
     outcomes = project.outcomes.order_by(ProjectOutcome.name.asc()).all()
     outcome_form = OutcomeForm()
     # Show pending change request count to owners
     pending_count = 0
-    ms = get_membership_for(project.id)
-    is_owner_or_admin = bool(is_admin() or (ms and (ms.role or '').lower() == 'owner'))
+    access = project_access(project.id)
+    is_owner_or_admin = access.is_owner_or_admin
     if is_owner_or_admin:
         pending_count = project.change_requests.filter_by(status='pending').count()
-    if is_admin():
-        role_label = 'Admin'
-    elif ms and ms.role:
-        role_label = ms.role.capitalize()
-    else:
-        role_label = ''
+    role_label = access.role_label
     return render_template(
         'form_fields.html',
         project=project,
@@ -514,6 +457,16 @@ def list_change_requests(project_id):
     return render_template('requests.html', project=project, requests=pending)
 
 
+def _shift_study_delete_stats(project_id: int, study: Study):
+    """Take a study about to be deleted, and its outcome rows, off the counters."""
+    shift_project_stats(
+        project_id,
+        study_count=-1,
+        dichotomous_count=-study.numerical_outcomes.count(),
+        continuous_count=-study.continuous_outcomes.count(),
+    )
+
+
 def _apply_change_request(project, req: FormChangeRequest):
     payload = json.loads(req.payload or '{}')
     action = (req.action_type or '').lower()
@@ -546,6 +499,8 @@ def _apply_change_request(project, req: FormChangeRequest):
             sort_order=next_order,
         )
         db.session.add(cf)
+        bump_project_version(project.id, form_changed=True)
+        shift_project_stats(project.id, field_count=1)
         db.session.commit()
         return True
     elif action == 'edit_field':
@@ -574,12 +529,16 @@ def _apply_change_request(project, req: FormChangeRequest):
         if 'label' in changes and changes['label'] is not None:
             f.label = (changes['label'] or '').strip()
         if 'field_type' in changes and changes['field_type'] is not None:
-            f.field_type = (changes['field_type'] or '').strip()
+            new_type = (changes['field_type'] or '').strip()
+            if new_type != f.field_type:
+                f.field_type = new_type
+                retype_field_values(f.id, new_type)
         if 'required' in changes and changes['required'] is not None:
             f.required = bool(changes['required'])
         if 'help_text' in changes:
             txt = changes['help_text']
             f.help_text = (txt.strip() if isinstance(txt, str) else None)
+        bump_project_version(project.id, form_changed=True)
         db.session.commit()
         return True
     elif action == 'delete_field':
@@ -589,6 +548,8 @@ def _apply_change_request(project, req: FormChangeRequest):
             return False
         section = f.section
         db.session.delete(f)
+        bump_project_version(project.id, form_changed=True)
+        shift_project_stats(project.id, field_count=-1)
         db.session.commit()
         # normalize order
         _normalize_section_order(project.id, section)
@@ -606,6 +567,9 @@ def _apply_change_request(project, req: FormChangeRequest):
             return True
         po = ProjectOutcome(project_id=project.id, name=name, outcome_type=otype)
         db.session.add(po)
+        db.session.flush()
+        link_outcome_rows(po)
+        bump_project_version(project.id)
         db.session.commit()
         return True
     elif action == 'delete_outcome':
@@ -621,7 +585,9 @@ def _apply_change_request(project, req: FormChangeRequest):
             ).first()
         if not outcome:
             return False
+        unlink_outcome_rows(outcome)
         db.session.delete(outcome)
+        bump_project_version(project.id)
         db.session.commit()
         return True
     elif action == 'delete_study':
@@ -632,7 +598,10 @@ def _apply_change_request(project, req: FormChangeRequest):
         study = Study.query.filter_by(project_id=project.id, id=sid).first()
         if not study:
             return False
+        _shift_study_delete_stats(project.id, study)
+        discard_study_effect_sizes(study.id)
         db.session.delete(study)
+        bump_project_version(project.id)
         db.session.commit()
         return True
     return False
@@ -655,12 +624,15 @@ def act_on_change_request(project_id, req_id, action):
             req.status = 'approved'
             req.reviewed_by = current_user.id
             req.reviewed_at = db.func.now()
+            # Counters touched by the change itself were shifted as it applied
+            shift_project_stats(project.id, pending_request_count=-1)
             db.session.commit()
             flash('Change request approved and applied.')
     elif action == 'reject':
         req.status = 'rejected'
         req.reviewed_by = current_user.id
         req.reviewed_at = db.func.now()
+        shift_project_stats(project.id, pending_request_count=-1)
         db.session.commit()
         flash('Change request rejected.')
     else:
@@ -691,6 +663,7 @@ def _move_section(project_id: int, section_name: str, direction: str):
     # Reassign orders based on new sequence
     for idx, name in enumerate(names, start=1):
         CustomFormField.query.filter_by(project_id=project_id, section=name).update({CustomFormField.section_order: idx})
+    bump_project_version(project_id, form_changed=True)
     db.session.commit()
 
 
@@ -698,8 +671,7 @@ def _move_section(project_id: int, section_name: str, direction: str):
 @login_required
 def move_form_section_up(project_id, section):
     project = Project.query.get_or_404(project_id)
-    ms = get_membership_for(project.id)
-    if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+    if not project_access(project.id).is_owner_or_admin:
         _propose_change(
             project.id,
             'reorder_section',
@@ -716,8 +688,7 @@ def move_form_section_up(project_id, section):
 @login_required
 def move_form_section_down(project_id, section):
     project = Project.query.get_or_404(project_id)
-    ms = get_membership_for(project.id)
-    if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+    if not project_access(project.id).is_owner_or_admin:
         _propose_change(
             project.id,
             'reorder_section',
@@ -752,8 +723,7 @@ def add_form_field(project_id):
     if request.method == 'GET' and prefill_section:
         form.section.data = prefill_section
     if form.validate_on_submit():
-        ms = get_membership_for(project.id)
-        if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+        if not project_access(project.id).is_owner_or_admin:
             payload = {
                 'section': form.section.data.strip(),
                 'label': form.label.data.strip(),
@@ -796,6 +766,8 @@ def add_form_field(project_id):
             sort_order=next_order,
         )
         db.session.add(field)
+        bump_project_version(project.id, form_changed=True)
+        shift_project_stats(project.id, field_count=1)
         db.session.commit()
         flash('Field added.')
         return redirect(url_for('list_form_fields', project_id=project.id))
@@ -821,8 +793,7 @@ def edit_form_field(project_id, field_id):
         if row[0]
     ]
     if form.validate_on_submit():
-        ms = get_membership_for(project.id)
-        if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+        if not project_access(project.id).is_owner_or_admin:
             payload = {
                 'field_id': field.id,
                 'changes': {
@@ -839,7 +810,9 @@ def edit_form_field(project_id, field_id):
         old_section = field.section
         field.section = form.section.data.strip()
         field.label = form.label.data.strip()
-        field.field_type = form.field_type.data
+        if form.field_type.data != field.field_type:
+            field.field_type = form.field_type.data
+            retype_field_values(field.id, field.field_type)
         field.required = bool(form.required.data)
         field.help_text = form.help_text.data.strip() if form.help_text.data else None
         # If section changed, move to end of new section
@@ -864,6 +837,7 @@ def edit_form_field(project_id, field_id):
                 .scalar()
             )
             field.sort_order = (max_order + 1) if max_order is not None else 1
+        bump_project_version(project.id, form_changed=True)
         db.session.commit()
         flash('Field updated.')
         return redirect(url_for('list_form_fields', project_id=project.id))
@@ -879,8 +853,7 @@ def add_project_outcome(project_id):
     if form.validate_on_submit():
         name = form.name.data.strip()
         outcome_type = form.outcome_type.data
-        ms = get_membership_for(project.id)
-        if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+        if not project_access(project.id).is_owner_or_admin:
             _propose_change(project.id, 'add_outcome', {'name': name, 'outcome_type': outcome_type}, reason=form.reason.data)
             flash('Outcome addition proposed for approval.')
             return redirect(url_for('list_form_fields', project_id=project.id))
@@ -896,6 +869,9 @@ def add_project_outcome(project_id):
         else:
             po = ProjectOutcome(project_id=project.id, name=name, outcome_type=outcome_type)
             db.session.add(po)
+            db.session.flush()
+            link_outcome_rows(po)
+            bump_project_version(project.id)
             db.session.commit()
             flash('Outcome added.')
     else:
@@ -908,13 +884,14 @@ def add_project_outcome(project_id):
 def delete_project_outcome(project_id, outcome_id):
     project = Project.query.get_or_404(project_id)
     require_project_member(project.id)
-    ms = get_membership_for(project.id)
-    if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+    if not project_access(project.id).is_owner_or_admin:
         _propose_change(project.id, 'delete_outcome', {'outcome_id': outcome_id}, reason=request.form.get('reason'))
         flash('Outcome deletion proposed for approval.')
         return redirect(url_for('list_form_fields', project_id=project.id))
     outcome = ProjectOutcome.query.filter_by(project_id=project.id, id=outcome_id).first_or_404()
+    unlink_outcome_rows(outcome)
     db.session.delete(outcome)
+    bump_project_version(project.id)
     db.session.commit()
     flash('Outcome deleted.')
     return redirect(url_for('list_form_fields', project_id=project.id))
@@ -926,13 +903,14 @@ def delete_form_field(project_id, field_id):
     project = Project.query.get_or_404(project_id)
     require_project_member(project.id)
     field = CustomFormField.query.filter_by(project_id=project.id, id=field_id).first_or_404()
-    ms = get_membership_for(project.id)
-    if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+    if not project_access(project.id).is_owner_or_admin:
         _propose_change(project.id, 'delete_field', {'field_id': field.id}, reason=request.form.get('reason'))
         flash('Field deletion proposed for approval.')
         return redirect(url_for('list_form_fields', project_id=project.id))
     section = field.section
     db.session.delete(field)
+    bump_project_version(project.id, form_changed=True)
+    shift_project_stats(project.id, field_count=-1)
     db.session.commit()
     _normalize_section_order(project.id, section)
     flash('Field deleted.')
@@ -959,8 +937,7 @@ def _normalize_section_order(project_id: int, section: str):
 @login_required
 def move_form_field_up(project_id, field_id):
     project = Project.query.get_or_404(project_id)
-    ms = get_membership_for(project.id)
-    if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+    if not project_access(project.id).is_owner_or_admin:
         _propose_change(project.id, 'reorder_field', {'field_id': field_id, 'direction': 'up'}, reason=request.form.get('reason'))
         flash('Move field request submitted for approval.')
         return redirect(url_for('list_form_fields', project_id=project.id))
@@ -975,6 +952,7 @@ def move_form_field_up(project_id, field_id):
     )
     if prev_field:
         field.sort_order, prev_field.sort_order = prev_field.sort_order, field.sort_order
+        bump_project_version(project.id, form_changed=True)
         db.session.commit()
     return redirect(url_for('list_form_fields', project_id=project.id))
 
@@ -983,8 +961,7 @@ def move_form_field_up(project_id, field_id):
 @login_required
 def move_form_field_down(project_id, field_id):
     project = Project.query.get_or_404(project_id)
-    ms = get_membership_for(project.id)
-    if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+    if not project_access(project.id).is_owner_or_admin:
         _propose_change(project.id, 'reorder_field', {'field_id': field_id, 'direction': 'down'}, reason=request.form.get('reason'))
         flash('Move field request submitted for approval.')
         return redirect(url_for('list_form_fields', project_id=project.id))
@@ -999,6 +976,7 @@ def move_form_field_down(project_id, field_id):
     )
     if next_field:
         field.sort_order, next_field.sort_order = next_field.sort_order, field.sort_order
+        bump_project_version(project.id, form_changed=True)
         db.session.commit()
     return redirect(url_for('list_form_fields', project_id=project.id))
 
@@ -1029,6 +1007,8 @@ def delete_project(project_id):
     # Finally delete the project itself
     db.session.delete(project)
     db.session.commit()
+    invalidate_form_schema(project_id)
+    purge_project_exports(project_id)
     flash(f"Project deleted. Removed {study_count} study(ies) and {field_count} form field(s).")
     return redirect(url_for('dashboard'))
 
@@ -1041,6 +1021,8 @@ def add_study(project_id):
     if form.validate_on_submit():
         study = Study(title=form.title.data, author=form.author.data, year=form.year.data, project=project, created_by=current_user.id)
         db.session.add(study)
+        bump_project_version(project.id)
+        shift_project_stats(project.id, study_count=1)
         db.session.commit()
         flash('Study added successfully!')
         return redirect(url_for('project_detail', project_id=project.id))
@@ -1053,8 +1035,7 @@ def delete_study(project_id, study_id):
     project = Project.query.get_or_404(project_id)
     require_project_member(project.id)
     study = Study.query.filter_by(project_id=project.id, id=study_id).first_or_404()
-    ms = get_membership_for(project.id)
-    if not (is_admin() or (ms and (ms.role or '').lower() == 'owner')):
+    if not project_access(project.id).is_owner_or_admin:
         reason = (request.form.get('reason') or '').strip()
         _propose_change(
             project.id,
@@ -1065,7 +1046,10 @@ def delete_study(project_id, study_id):
         flash('Study deletion request submitted for approval.', 'info')
         return redirect(url_for('project_detail', project_id=project.id))
 
+    _shift_study_delete_stats(project.id, study)
+    discard_study_effect_sizes(study.id)
     db.session.delete(study)
+    bump_project_version(project.id)
     db.session.commit()
     flash('Study deleted.', 'success')
     return redirect(url_for('project_detail', project_id=project.id))
@@ -1202,27 +1186,13 @@ def enter_data(project_id, study_id):
     require_project_member(project.id)
     study = Study.query.get_or_404(study_id)
     
-    # Get custom form fields for this project, ordered by section and in-section order
-    form_fields = (
-        CustomFormField.query
-        .filter_by(project_id=project.id)
-        .order_by(
-            db.func.coalesce(CustomFormField.section_order, 999999).asc(),
-            CustomFormField.section.asc(),
-            db.func.coalesce(CustomFormField.sort_order, CustomFormField.id).asc(),
-            CustomFormField.id.asc(),
-        )
-        .all()
-    )
-    # Build ordered sections for rendering without re-sorting by section name
-    grouped_fields = []
-    for f in form_fields:
-        if not grouped_fields or grouped_fields[-1]['name'] != f.section:
-            grouped_fields.append({'name': f.section, 'fields': []})
-        grouped_fields[-1]['fields'].append(f)
+    # Compiled form: fields in section/in-section order, grouped by section
+    schema = get_form_schema(project.id, project)
+    form_fields = schema.fields
+    grouped_fields = schema.sections
 
     # Get existing data values for static fields for this study
-    existing_data = {dv.form_field_id: dv.value for dv in study.data_values}
+    existing_data = load_study_values(study.id)
 
     # Prepare autofill defaults for certain fields (e.g., Study ID)
     # Map: form_field_id -> default string to display when empty
@@ -1267,8 +1237,7 @@ def enter_data(project_id, study_id):
     invalid_field_ids: set[int] = set()
 
     # Membership role for enforcement
-    ms = get_membership_for(project.id)
-    is_owner_or_admin = bool(is_admin() or (ms and (ms.role or '').lower() == 'owner'))
+    is_owner_or_admin = project_access(project.id).is_owner_or_admin
 
     def _process_field_input(field):
         field_name = f'field_{field.id}'
@@ -1467,28 +1436,23 @@ def enter_data(project_id, study_id):
         if field_errors:
             flash('Please correct the highlighted fields.', 'error')
         else:
+            values_to_save = {}
             for field, value_str in processed_fields:
-                field_name = f'field_{field.id}'
                 is_study_id_field = ((field.label or '').strip().lower() == 'study id') and (field.field_type == 'text')
-                data_value = StudyDataValue.query.filter_by(study_id=study.id, form_field_id=field.id).first()
 
                 if is_study_id_field and not is_owner_or_admin:
                     try:
                         enforced = f"{(study.author or '').strip()} et al, {study.year}"
                     except Exception:
                         enforced = None
-                    if data_value:
-                        if not data_value.value and enforced:
-                            data_value.value = enforced
+                    if field.id in existing_data:
+                        if not existing_data[field.id] and enforced:
+                            values_to_save[field.id] = enforced
                     else:
-                        data_value = StudyDataValue(study_id=study.id, form_field_id=field.id, value=enforced)
-                        db.session.add(data_value)
+                        values_to_save[field.id] = enforced
                 else:
-                    if data_value:
-                        data_value.value = value_str
-                    else:
-                        data_value = StudyDataValue(study_id=study.id, form_field_id=field.id, value=value_str)
-                        db.session.add(data_value)
+                    values_to_save[field.id] = value_str
+            upsert_study_values(study.id, study.project_id, values_to_save, schema)
 
             outcome_indices = set()
             for index_str in request.form.getlist('outcome_row_index'):
@@ -1511,31 +1475,37 @@ def enter_data(project_id, study_id):
                     'tc': request.form.get(f'total_control_{index}', type=int),
                 })
 
+            # Outcome rows added minus removed, for the project counters
+            row_deltas = {'dichotomous_count': 0, 'continuous_count': 0}
+            dich_ids = outcome_ids_by_name(project.id, 'dichotomous')
             if is_owner_or_admin:
-                StudyNumericalOutcome.query.filter_by(study_id=study.id).delete()
+                row_deltas['dichotomous_count'] -= StudyNumericalOutcome.query.filter_by(study_id=study.id).delete()
                 for row in submitted_dich:
+                    row_deltas['dichotomous_count'] += 1
                     db.session.add(StudyNumericalOutcome(
                         study_id=study.id,
                         outcome_name=row['name'],
+                        project_outcome_id=dich_ids.get(outcome_key(row['name'])),
                         events_intervention=row['ei'],
                         total_intervention=row['ti'],
                         events_control=row['ec'],
                         total_control=row['tc'],
                     ))
             else:
-                allowed_dich = set([ (o.name or '').strip().lower() for o in project.outcomes.filter_by(outcome_type='dichotomous').all() ])
-                names_to_apply = [r['name'] for r in submitted_dich if r['name'].lower() in allowed_dich]
+                names_to_apply = [r['name'] for r in submitted_dich if outcome_key(r['name']) in dich_ids]
                 if names_to_apply:
-                    (StudyNumericalOutcome.query
+                    row_deltas['dichotomous_count'] -= (StudyNumericalOutcome.query
                         .filter_by(study_id=study.id)
                         .filter(StudyNumericalOutcome.outcome_name.in_(names_to_apply))
                         .delete(synchronize_session=False))
                     for row in submitted_dich:
-                        if row['name'].lower() not in allowed_dich:
+                        if outcome_key(row['name']) not in dich_ids:
                             continue
+                        row_deltas['dichotomous_count'] += 1
                         db.session.add(StudyNumericalOutcome(
                             study_id=study.id,
                             outcome_name=row['name'],
+                            project_outcome_id=dich_ids.get(outcome_key(row['name'])),
                             events_intervention=row['ei'],
                             total_intervention=row['ti'],
                             events_control=row['ec'],
@@ -1577,12 +1547,15 @@ def enter_data(project_id, study_id):
                 if cname:
                     submitted_cont.append({'name': cname, 'mi': mi, 'sdi': sdi, 'ni': ni, 'mc': mc, 'sdc': sdc, 'nc': nc})
 
+            cont_ids = outcome_ids_by_name(project.id, 'continuous')
             if is_owner_or_admin:
-                StudyContinuousOutcome.query.filter_by(study_id=study.id).delete()
+                row_deltas['continuous_count'] -= StudyContinuousOutcome.query.filter_by(study_id=study.id).delete()
                 for row in submitted_cont:
+                    row_deltas['continuous_count'] += 1
                     db.session.add(StudyContinuousOutcome(
                         study_id=study.id,
                         outcome_name=row['name'],
+                        project_outcome_id=cont_ids.get(outcome_key(row['name'])),
                         mean_intervention=row['mi'],
                         sd_intervention=row['sdi'],
                         n_intervention=row['ni'],
@@ -1591,19 +1564,20 @@ def enter_data(project_id, study_id):
                         n_control=row['nc'],
                     ))
             else:
-                allowed_cont = set([ (o.name or '').strip().lower() for o in project.outcomes.filter_by(outcome_type='continuous').all() ])
-                names_to_apply_c = [r['name'] for r in submitted_cont if r['name'].lower() in allowed_cont]
+                names_to_apply_c = [r['name'] for r in submitted_cont if outcome_key(r['name']) in cont_ids]
                 if names_to_apply_c:
-                    (StudyContinuousOutcome.query
+                    row_deltas['continuous_count'] -= (StudyContinuousOutcome.query
                         .filter_by(study_id=study.id)
                         .filter(StudyContinuousOutcome.outcome_name.in_(names_to_apply_c))
                         .delete(synchronize_session=False))
                     for row in submitted_cont:
-                        if row['name'].lower() not in allowed_cont:
+                        if outcome_key(row['name']) not in cont_ids:
                             continue
+                        row_deltas['continuous_count'] += 1
                         db.session.add(StudyContinuousOutcome(
                             study_id=study.id,
                             outcome_name=row['name'],
+                            project_outcome_id=cont_ids.get(outcome_key(row['name'])),
                             mean_intervention=row['mi'],
                             sd_intervention=row['sdi'],
                             n_intervention=row['ni'],
@@ -1612,17 +1586,15 @@ def enter_data(project_id, study_id):
                             n_control=row['nc'],
                         ))
 
+            refresh_study_effect_sizes(study.id, project.id, 'dichotomous', 'continuous')
+            bump_project_version(project.id)
+            shift_project_stats(project.id, **row_deltas)
             db.session.commit()
             flash('Study data saved successfully!')
             return redirect(url_for('project_detail', project_id=project.id))
 
     # Role label for UI badge
-    if is_admin():
-        role_label = 'Admin'
-    elif ms and ms.role:
-        role_label = ms.role.capitalize()
-    else:
-        role_label = ''
+    role_label = project_access(project.id).role_label
 
     member_choices = []
     memberships = (
@@ -1655,9 +1627,30 @@ def enter_data(project_id, study_id):
         member_choices=member_choices,
         field_errors=field_errors,
         invalid_field_ids=invalid_field_ids,
+        pooled={
+            'dichotomous': _running_pools(project.id, 'dichotomous'),
+            'continuous': _running_pools(project.id, 'continuous'),
+        },
     )
 
 
+def _running_pools(project_id: int, outcome_type: str, outcome_ids: dict | None = None) -> dict:
+    """{outcome_key(name): {measure: RunningPool as dict}} of the declared outcomes of one type.
+
+    Read from the running sums, so the cost does not grow with the number of
+    studies. ``outcome_ids`` is outcome_ids_by_name() when already loaded.
+    """
+    if outcome_ids is None:
+        outcome_ids = outcome_ids_by_name(project_id, outcome_type)
+    keys = {oid: key for key, oid in outcome_ids.items()}
+    pools = pool_outcome_sums(get_outcome_effect_stats(project_id, outcome_type))
+    return {
+        keys[oid]: {measure: asdict(pool) for measure, pool in by_measure.items()}
+        for oid, by_measure in pools.items()
+        if oid in keys
+    }
+
+
 @app.route('/project/<int:project_id>/study/<int:study_id>/autosave', methods=['POST'])
 @login_required
 def autosave_study_data(project_id, study_id):
@@ -1673,19 +1666,20 @@ def autosave_study_data(project_id, study_id):
     try:
         if section == 'numerical_outcomes':
             rows = data.get('numerical_outcomes') or []
-            ms = get_membership_for(project.id)
-            is_owner_or_admin = bool(is_admin() or (ms and (ms.role or '').lower() == 'owner'))
-            allowed = set([ (o.name or '').strip().lower() for o in project.outcomes.filter_by(outcome_type='dichotomous').all() ])
+            is_owner_or_admin = project_access(project.id).is_owner_or_admin
+            outcome_ids = outcome_ids_by_name(project.id, 'dichotomous')
+            # Rows added minus removed, for the project counters
+            row_delta = 0
             # Validate first for members
             if not is_owner_or_admin:
                 for row in rows:
                     name = (row.get('outcome_name') or '').strip()
-                    if name and name.lower() not in allowed:
+                    if name and outcome_key(name) not in outcome_ids:
                         return jsonify({'ok': False, 'error': f'Unauthorized outcome name: {name}'}), 400
                 # Upsert by names provided; preserve others
                 names = [ (row.get('outcome_name') or '').strip() for row in rows if (row.get('outcome_name') or '').strip() ]
                 if names:
-                    (StudyNumericalOutcome.query
+                    row_delta -= (StudyNumericalOutcome.query
                         .filter_by(study_id=study.id)
                         .filter(StudyNumericalOutcome.outcome_name.in_(names))
                         .delete(synchronize_session=False))
@@ -1700,9 +1694,11 @@ def autosave_study_data(project_id, study_id):
                     name = (row.get('outcome_name') or '').strip()
                     if not name:
                         continue
+                    row_delta += 1
                     db.session.add(StudyNumericalOutcome(
                         study_id=study.id,
                         outcome_name=name,
+                        project_outcome_id=outcome_ids.get(outcome_key(name)),
                         events_intervention=to_int(row.get('events_intervention')),
                         total_intervention=to_int(row.get('total_intervention')),
                         events_control=to_int(row.get('events_control')),
@@ -1710,7 +1706,7 @@ def autosave_study_data(project_id, study_id):
                     ))
             else:
                 # Owners/admins replace all rows
-                StudyNumericalOutcome.query.filter_by(study_id=study.id).delete()
+                row_delta -= StudyNumericalOutcome.query.filter_by(study_id=study.id).delete()
                 def to_int(v):
                     if v is None or v == '':
                         return None
@@ -1722,22 +1718,28 @@ def autosave_study_data(project_id, study_id):
                     name = (row.get('outcome_name') or '').strip()
                     if not name:
                         continue
+                    row_delta += 1
                     db.session.add(StudyNumericalOutcome(
                         study_id=study.id,
                         outcome_name=name,
+                        project_outcome_id=outcome_ids.get(outcome_key(name)),
                         events_intervention=to_int(row.get('events_intervention')),
                         total_intervention=to_int(row.get('total_intervention')),
                         events_control=to_int(row.get('events_control')),
                         total_control=to_int(row.get('total_control')),
                     ))
+            refresh_study_effect_sizes(study.id, project.id, 'dichotomous')
+            bump_project_version(project.id)
+            shift_project_stats(project.id, dichotomous_count=row_delta)
             db.session.commit()
-            return jsonify({'ok': True})
+            return jsonify({'ok': True, 'pooled': _running_pools(project.id, 'dichotomous', outcome_ids)})
 
         if section == 'continuous_outcomes':
             rows = data.get('continuous_outcomes') or []
-            ms = get_membership_for(project.id)
-            is_owner_or_admin = bool(is_admin() or (ms and (ms.role or '').lower() == 'owner'))
-            allowed = set([ (o.name or '').strip().lower() for o in project.outcomes.filter_by(outcome_type='continuous').all() ])
+            is_owner_or_admin = project_access(project.id).is_owner_or_admin
+            outcome_ids = outcome_ids_by_name(project.id, 'continuous')
+            # Rows added minus removed, for the project counters
+            row_delta = 0
             def to_float(v):
                 if v is None or v == '':
                     return None
@@ -1755,11 +1757,11 @@ def autosave_study_data(project_id, study_id):
             if not is_owner_or_admin:
                 for row in rows:
                     name = (row.get('outcome_name') or '').strip()
-                    if name and name.lower() not in allowed:
+                    if name and outcome_key(name) not in outcome_ids:
                         return jsonify({'ok': False, 'error': f'Unauthorized outcome name: {name}'}), 400
                 names = [ (row.get('outcome_name') or '').strip() for row in rows if (row.get('outcome_name') or '').strip() ]
                 if names:
-                    (StudyContinuousOutcome.query
+                    row_delta -= (StudyContinuousOutcome.query
                         .filter_by(study_id=study.id)
                         .filter(StudyContinuousOutcome.outcome_name.in_(names))
                         .delete(synchronize_session=False))
@@ -1767,9 +1769,11 @@ def autosave_study_data(project_id, study_id):
                     name = (row.get('outcome_name') or '').strip()
                     if not name:
                         continue
+                    row_delta += 1
                     db.session.add(StudyContinuousOutcome(
                         study_id=study.id,
                         outcome_name=name,
+                        project_outcome_id=outcome_ids.get(outcome_key(name)),
                         mean_intervention=to_float(row.get('mean_intervention')),
                         sd_intervention=to_float(row.get('sd_intervention')),
                         n_intervention=to_int(row.get('n_intervention')),
@@ -1778,14 +1782,16 @@ def autosave_study_data(project_id, study_id):
                         n_control=to_int(row.get('n_control')),
                     ))
             else:
-                StudyContinuousOutcome.query.filter_by(study_id=study.id).delete()
+                row_delta -= StudyContinuousOutcome.query.filter_by(study_id=study.id).delete()
                 for row in rows:
                     name = (row.get('outcome_name') or '').strip()
                     if not name:
                         continue
+                    row_delta += 1
                     db.session.add(StudyContinuousOutcome(
                         study_id=study.id,
                         outcome_name=name,
+                        project_outcome_id=outcome_ids.get(outcome_key(name)),
                         mean_intervention=to_float(row.get('mean_intervention')),
                         sd_intervention=to_float(row.get('sd_intervention')),
                         n_intervention=to_int(row.get('n_intervention')),
@@ -1793,8 +1799,11 @@ def autosave_study_data(project_id, study_id):
                         sd_control=to_float(row.get('sd_control')),
                         n_control=to_int(row.get('n_control')),
                     ))
+            refresh_study_effect_sizes(study.id, project.id, 'continuous')
+            bump_project_version(project.id)
+            shift_project_stats(project.id, continuous_count=row_delta)
             db.session.commit()
-            return jsonify({'ok': True})
+            return jsonify({'ok': True, 'pooled': _running_pools(project.id, 'continuous', outcome_ids)})
 
         # Otherwise handle a regular section of static form fields
         fields = data.get('fields') or []
@@ -1819,9 +1828,10 @@ def autosave_study_data(project_id, study_id):
         )
 
         # Role to enforce per-field constraints
-        ms = get_membership_for(project.id)
-        is_owner_or_admin = bool(is_admin() or (ms and (ms.role or '').lower() == 'owner'))
+        is_owner_or_admin = project_access(project.id).is_owner_or_admin
 
+        values_to_save = {}
+        existing_values = None
         for db_field in db_fields:
             payload = by_id.get(db_field.id) or {}
             if db_field.field_type == 'dichotomous_outcome':
@@ -1900,21 +1910,19 @@ def autosave_study_data(project_id, study_id):
                     default_sid = None
                 value_str = None  # will be replaced with existing/default below
 
-            sdv = StudyDataValue.query.filter_by(study_id=study.id, form_field_id=db_field.id).first()
             if is_study_id_field and not is_owner_or_admin:
-                if sdv:
-                    if not sdv.value and default_sid:
-                        sdv.value = default_sid
+                if existing_values is None:
+                    existing_values = load_study_values(study.id)
+                if db_field.id in existing_values:
+                    if not existing_values[db_field.id] and default_sid:
+                        values_to_save[db_field.id] = default_sid
                 else:
-                    sdv = StudyDataValue(study_id=study.id, form_field_id=db_field.id, value=default_sid)
-                    db.session.add(sdv)
+                    values_to_save[db_field.id] = default_sid
             else:
-                if sdv:
-                    sdv.value = value_str
-                else:
-                    sdv = StudyDataValue(study_id=study.id, form_field_id=db_field.id, value=value_str)
-                    db.session.add(sdv)
+                values_to_save[db_field.id] = value_str
 
+        upsert_study_values(study.id, study.project_id, values_to_save, get_form_schema(project.id, project))
+        bump_project_version(project.id)
         db.session.commit()
         return jsonify({'ok': True})
 
@@ -1922,147 +1930,135 @@ def autosave_study_data(project_id, study_id):
         db.session.rollback()
         return jsonify({'ok': False, 'error': str(e)}), 500
 
-@app.route('/project/<int:project_id>/export_outcomes')
-@app.route('/project/<int:project_id>/export_jamovi')  # backward-compatible alias
+@app.route('/project/<int:project_id>/analysis')
+@login_required
+def project_analysis(project_id):
+    project = Project.query.get_or_404(project_id)
+    require_project_member(project.id)
+    tau2_method = (request.args.get('tau2') or DEFAULT_TAU2_ESTIMATOR).upper()
+    if tau2_method not in TAU2_ESTIMATORS:
+        tau2_method = DEFAULT_TAU2_ESTIMATOR
+    if request.args.get('format') == 'json':
+        return _conditional_export(project, f'analysis-{tau2_method}-json', lambda: jsonify({
+            'project_id': project.id,
+            'tau2_method': tau2_method,
+            'dichotomous': [asdict(outcome) for outcome in analyze_dichotomous(project.id, tau2_method)],
+            'continuous': [asdict(outcome) for outcome in analyze_continuous(project.id, tau2_method)],
+        }))
+    return render_template(
+        'analysis.html',
+        project=project,
+        dichotomous=analyze_dichotomous(project.id, tau2_method),
+        continuous=analyze_continuous(project.id, tau2_method),
+        tau2_method=tau2_method,
+        tau2_methods=list(TAU2_ESTIMATORS),
+        dichotomous_measures=DICHOTOMOUS_MEASURES,
+        continuous_measures=CONTINUOUS_MEASURES,
+        ratio_measures=RATIO_MEASURES,
+    )
+
+
+@app.route('/project/<int:project_id>/export_outcomes', methods=['GET', 'POST'])
+@app.route('/project/<int:project_id>/export_jamovi', methods=['GET', 'POST'])  # backward-compatible alias
 @login_required
 def export_outcomes(project_id):
     project = Project.query.get_or_404(project_id)
     require_project_member(project.id)
+    if request.method == 'POST':
+        return _enqueue_export_job(project, 'outcomes')
+    return _conditional_export(project, 'outcomes', lambda: _export_response(project, 'outcomes'))
 
-    # Get all studies for the project in a stable order
-    studies = project.studies.order_by(Study.id.asc()).all()
 
-    # Create an in-memory buffer for the zip file
-    zip_buffer = io.BytesIO()
+def _conditional_export(project, kind: str, build_response):
+    """Answer repeat downloads of unchanged project data with 304 Not Modified.
 
-    def safe(name: str) -> str:
-        return "".join([c for c in (name or '') if c.isalnum() or c in (' ', '.', '_', '-')]).strip() or 'outcome'
+    The validator derives from ``Project.data_version``, so the export itself is
+    only built when the client's copy is stale. No Last-Modified is sent:
+    HTTP dates stop at whole seconds, so a client revalidating by date alone
+    could be told a copy from before a write in the same second is current.
+    """
+    etag = project_etag(project, kind)
+    if is_resource_modified(request.environ, etag=etag):
+        response = build_response()
+    else:
+        response = Response(status=304)
+    response.set_etag(etag)
+    # Per-user authorization applies, so only the browser may keep a copy and
+    # it must revalidate before reuse.
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
-    with zipfile.ZipFile(zip_buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
-        # Define columns for outcomes export
-        outcome_columns = ['Study', 'Intervention_events', 'Intervention_total', 'Control_events', 'Control_Total']
 
-        # Try primary source: StudyNumericalOutcome rows
-        outcomes_data = {}
-        for study in studies:
-            for num_outcome in study.numerical_outcomes.all():
-                name = (num_outcome.outcome_name or '').strip()
-                if not name:
-                    # Skip unnamed outcomes
-                    continue
-                outcomes_data.setdefault(name, []).append({
-                    'Study': study.title,
-                    'Intervention_events': num_outcome.events_intervention,
-                    'Intervention_total': num_outcome.total_intervention,
-                    'Control_events': num_outcome.events_control,
-                    'Control_Total': num_outcome.total_control,
-                })
+def _export_response(project, kind: str):
+    """Send an export as an attachment, from the export cache when possible.
 
-        wrote_any = False
-        for outcome_name, data_rows in outcomes_data.items():
-            if not data_rows:
-                continue
-            df = DataFrame(data_rows, columns=outcome_columns)
-            output = io.StringIO()
-            df.to_csv(output, index=False)
-            output.seek(0)
-            zf.writestr(f"{safe(project.name)}_{safe(outcome_name)}_Dichotomous_Export.csv", output.getvalue())
-            wrote_any = True
-
-        # Fallback: build outcomes from legacy 'dichotomous_outcome' static fields
-        if not wrote_any:
-            legacy_fields = (
-                CustomFormField.query
-                .filter_by(project_id=project.id, field_type='dichotomous_outcome')
-                .order_by(
-                    CustomFormField.section.asc(),
-                    db.func.coalesce(CustomFormField.sort_order, CustomFormField.id).asc(),
-                    CustomFormField.id.asc(),
-                )
-                .all()
-            )
+    On a miss the artifact is streamed to the client and written to the cache
+    as it goes, so the next request for the same data version is a file copy.
+    """
+    cached = get_cached_export(project.id, project_created_stamp(project), project.data_version, kind)
+    if cached:
+        return send_file(
+            cached,
+            download_name=export_download_name(kind, project.name),
+            as_attachment=True,
+            mimetype=EXPORT_KINDS[kind][1],
+            conditional=False,
+            etag=False,
+        )
+    download_name, mimetype, chunks = build_export(kind, project.id, project.name)
+    chunks = iter_and_cache(
+        project.id, project_created_stamp(project), project.data_version, kind, chunks
+    )
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
 
-            for f in legacy_fields:
-                rows = []
-                for study in studies:
-                    dv = StudyDataValue.query.filter_by(study_id=study.id, form_field_id=f.id).first()
-                    events_val = total_val = None
-                    if dv and dv.value:
-                        try:
-                            parsed = json.loads(dv.value)
-                            events_val = parsed.get('events')
-                            total_val = parsed.get('total')
-                        except Exception:
-                            pass
-                    # Only add row if at least one value present
-                    if events_val is not None or total_val is not None:
-                        rows.append({
-                            'Study': study.title,
-                            'Intervention_events': events_val,
-                            'Intervention_total': total_val,
-                            'Control_events': None,
-                            'Control_Total': None,
-                        })
-                if rows:
-                    df = DataFrame(rows, columns=outcome_columns)
-                    output = io.StringIO()
-                    df.to_csv(output, index=False)
-                    output.seek(0)
-                    zf.writestr(f"{safe(project.name)}_{safe(f.label)}_Dichotomous_Export.csv", output.getvalue())
-                    wrote_any = True
-
-        # Additionally include continuous outcomes, grouped per outcome name
-        cont_columns = [
-            'Study',
-            'Intervention_mean', 'Intervention_sd', 'Intervention_n',
-            'Control_mean', 'Control_sd', 'Control_n',
-        ]
-        cont_data = {}
-        for study in studies:
-            for co in study.continuous_outcomes.all():
-                name = (co.outcome_name or '').strip()
-                if not name:
-                    continue
-                cont_data.setdefault(name, []).append({
-                    'Study': study.title,
-                    'Intervention_mean': co.mean_intervention,
-                    'Intervention_sd': co.sd_intervention,
-                    'Intervention_n': co.n_intervention,
-                    'Control_mean': co.mean_control,
-                    'Control_sd': co.sd_control,
-                    'Control_n': co.n_control,
-                })
-        wrote_any_cont = False
-        for outcome_name, data_rows in cont_data.items():
-            if not data_rows:
-                continue
-            dfc = DataFrame(data_rows, columns=cont_columns)
-            outc = io.StringIO()
-            dfc.to_csv(outc, index=False)
-            outc.seek(0)
-            # add a type suffix to distinguish
-            zf.writestr(f"{safe(project.name)}_{safe(outcome_name)}_Continuous_Export.csv", outc.getvalue())
-            wrote_any_cont = True
-
-        # If still nothing to write, include a README in the zip to avoid an empty archive
-        if not wrote_any and not wrote_any_cont:
-            zf.writestr(
-                "README.txt",
-                "No outcomes found for this project.\n"
-                "- Enter dichotomous outcomes or continuous outcomes on the study page, or\n"
-                "- Use legacy dichotomous outcome fields and resubmit.\n",
-            )
 
-    zip_buffer.seek(0)
+def _enqueue_export_job(project, kind: str):
+    job = enqueue_export_job(project.id, project.name, kind, requested_by=current_user.id)
+    return jsonify({
+        'ok': True,
+        'job': job,
+        'status_url': url_for('export_job_status', project_id=project.id, job_id=job['id']),
+        'download_url': url_for('download_export_job', project_id=project.id, job_id=job['id']),
+    }), 202
+
+
+@app.route('/project/<int:project_id>/export_jobs/<job_id>')
+@login_required
+def export_job_status(project_id, job_id):
+    project = Project.query.get_or_404(project_id)
+    require_project_member(project.id)
+    job = get_export_job(job_id)
+    if not job or job.get('project_id') != project.id:
+        abort(404)
+    return jsonify({
+        'ok': True,
+        'job': job,
+        'download_url': url_for('download_export_job', project_id=project.id, job_id=job['id']) if job['status'] == 'done' else None,
+    })
+
+
+@app.route('/project/<int:project_id>/export_jobs/<job_id>/download')
+@login_required
+def download_export_job(project_id, job_id):
+    project = Project.query.get_or_404(project_id)
+    require_project_member(project.id)
+    job = get_export_job(job_id)
+    if not job or job.get('project_id') != project.id:
+        abort(404)
+    if job['status'] != 'done':
+        return jsonify({'ok': False, 'error': 'Export is not ready', 'job': job}), 409
     return send_file(
-        zip_buffer,
-        download_name=f"{safe(project.name)}_Outcomes_Export.zip",
+        export_job_artifact_path(job),
+        download_name=job['download_name'],
         as_attachment=True,
-        mimetype='application/zip',
+        mimetype=job['mimetype'],
     )
 
 
-@app.route('/project/<int:project_id>/export_static')
+@app.route('/project/<int:project_id>/export_static', methods=['GET', 'POST'])
 @login_required
 def export_static(project_id):
     """Export all static (non-tabular) custom form fields for all studies in a project as CSV.
@@ -2070,283 +2066,46 @@ def export_static(project_id):
     Produces a flat table with columns:
     - Study metadata: Study, Author, Year
     - One column per CustomFormField (or multiple columns for composite types)
+
+    Pass ``stream=1`` to stream rows straight from the database cursor instead
+    of building the whole table in memory first. POST queues a background job.
     """
     project = Project.query.get_or_404(project_id)
     require_project_member(project.id)
+    if request.method == 'POST':
+        return _enqueue_export_job(project, 'static')
+    if request.args.get('stream') in ('1', 'true', 'yes'):
+        return _conditional_export(project, 'static-stream', lambda: _export_response(project, 'static'))
 
-    # Load fields in a stable, user-visible order
-    fields = (
-        CustomFormField.query
-        .filter_by(project_id=project.id)
-        .order_by(
-            db.func.coalesce(CustomFormField.section_order, 999999).asc(),
-            CustomFormField.section.asc(),
-            db.func.coalesce(CustomFormField.sort_order, CustomFormField.id).asc(),
-            CustomFormField.id.asc(),
+    def build_response():
+        df = load_project_frame(project.id, get_form_schema(project.id, project))
+
+        # CSV only
+        sio = io.StringIO()
+        df.to_csv(sio, index=False)
+        data = io.BytesIO(sio.getvalue().encode('utf-8'))
+        data.seek(0)
+        return send_file(
+            data,
+            download_name=f"{safe_filename(project.name)}_Static_Fields.csv",
+            as_attachment=True,
+            mimetype='text/csv',
         )
-        .all()
-    )
 
-    # Build ordered column list
-    def col_base(field):
-        return f"{field.section} - {field.label}".strip()
-
-    columns = ['Study', 'Author', 'Year']
-    expanded_fields = []  # (field, kind) where kind is 'single'|'events'|'total'
-    for f in fields:
-        if f.field_type == 'dichotomous_outcome':
-            columns.append(f"{col_base(f)} (events)")
-            columns.append(f"{col_base(f)} (total)")
-            expanded_fields.append((f, 'events'))
-            expanded_fields.append((f, 'total'))
-        elif f.field_type == 'baseline_continuous':
-            columns.append(f"{col_base(f)} (intervention mean)")
-            columns.append(f"{col_base(f)} (intervention sd)")
-            columns.append(f"{col_base(f)} (control mean)")
-            columns.append(f"{col_base(f)} (control sd)")
-            expanded_fields.append((f, 'int_mean'))
-            expanded_fields.append((f, 'int_sd'))
-            expanded_fields.append((f, 'ctrl_mean'))
-            expanded_fields.append((f, 'ctrl_sd'))
-        elif f.field_type == 'baseline_categorical':
-            columns.append(f"{col_base(f)} (intervention %)")
-            columns.append(f"{col_base(f)} (control %)")
-            expanded_fields.append((f, 'int_pct'))
-            expanded_fields.append((f, 'ctrl_pct'))
-        else:
-            columns.append(col_base(f))
-            expanded_fields.append((f, 'single'))
-
-    # Gather rows across studies
-    rows = []
-    for study in project.studies.order_by(Study.id.asc()).all():
-        row = { 'Study': study.title, 'Author': study.author, 'Year': study.year }
-        # Map of form_field_id -> raw value string
-        data_map = { dv.form_field_id: dv.value for dv in study.data_values }
-        for f, kind in expanded_fields:
-            base = col_base(f)
-            if kind == 'single':
-                row[f"{base}"] = data_map.get(f.id)
-            else:
-                raw = data_map.get(f.id)
-                parsed = None
-                if raw:
-                    try:
-                        parsed = json.loads(raw)
-                    except Exception:
-                        parsed = None
-                if f.field_type == 'dichotomous_outcome':
-                    events_val = parsed.get('events') if parsed else None
-                    total_val = parsed.get('total') if parsed else None
-                    if kind == 'events':
-                        row[f"{base} (events)"] = events_val
-                    else:
-                        row[f"{base} (total)"] = total_val
-                elif f.field_type == 'baseline_continuous':
-                    int_mean = parsed.get('intervention', {}).get('mean') if parsed else None
-                    int_sd = parsed.get('intervention', {}).get('sd') if parsed else None
-                    ctrl_mean = parsed.get('control', {}).get('mean') if parsed else None
-                    ctrl_sd = parsed.get('control', {}).get('sd') if parsed else None
-                    if kind == 'int_mean':
-                        row[f"{base} (intervention mean)"] = int_mean
-                    elif kind == 'int_sd':
-                        row[f"{base} (intervention sd)"] = int_sd
-                    elif kind == 'ctrl_mean':
-                        row[f"{base} (control mean)"] = ctrl_mean
-                    elif kind == 'ctrl_sd':
-                        row[f"{base} (control sd)"] = ctrl_sd
-                elif f.field_type == 'baseline_categorical':
-                    int_pct = parsed.get('intervention', {}).get('percent') if parsed else None
-                    ctrl_pct = parsed.get('control', {}).get('percent') if parsed else None
-                    if kind == 'int_pct':
-                        row[f"{base} (intervention %)"] = int_pct
-                    elif kind == 'ctrl_pct':
-                        row[f"{base} (control %)"] = ctrl_pct
-        rows.append(row)
-
-    df = DataFrame(rows, columns=columns)
-
-    # Safe filename components
-    def safe(name: str):
-        return "".join([c for c in name or '' if c.isalnum() or c in (' ', '.', '_', '-')]).strip() or 'project'
-    # CSV only
-    sio = io.StringIO()
-    df.to_csv(sio, index=False)
-    data = io.BytesIO(sio.getvalue().encode('utf-8'))
-    data.seek(0)
-    return send_file(
-        data,
-        download_name=f"{safe(project.name)}_Static_Fields.csv",
-        as_attachment=True,
-        mimetype='text/csv',
-    )
+    return _conditional_export(project, 'static', build_response)
 
 
-@app.route('/project/<int:project_id>/export_all_zip')
+@app.route('/project/<int:project_id>/export_all_zip', methods=['GET', 'POST'])
 @login_required
 def export_all_zip(project_id):
-    """Create a single zip containing:
+    """Stream a single zip containing:
     - One CSV with all static fields across studies
     - One CSV per numerical outcome (jamovi-style), if present
+
+    POST queues the same export as a background job instead.
     """
     project = Project.query.get_or_404(project_id)
     require_project_member(project.id)
-
-    def safe(name: str):
-        return "".join([c for c in (name or '') if c.isalnum() or c in (' ', '.', '_', '-')]).strip() or 'project'
-
-    # Build static DataFrame (reuse logic similar to export_static)
-    fields = (
-        CustomFormField.query
-        .filter_by(project_id=project.id)
-        .order_by(
-            db.func.coalesce(CustomFormField.section_order, 999999).asc(),
-            CustomFormField.section.asc(),
-            db.func.coalesce(CustomFormField.sort_order, CustomFormField.id).asc(),
-            CustomFormField.id.asc(),
-        )
-        .all()
-    )
-    def col_base(field):
-        return f"{field.section} - {field.label}".strip()
-    columns = ['Study', 'Author', 'Year']
-    expanded_fields = []
-    for f in fields:
-        if f.field_type == 'dichotomous_outcome':
-            columns += [f"{col_base(f)} (events)", f"{col_base(f)} (total)"]
-            expanded_fields += [(f, 'events'), (f, 'total')]
-        elif f.field_type == 'baseline_continuous':
-            columns += [
-                f"{col_base(f)} (intervention mean)",
-                f"{col_base(f)} (intervention sd)",
-                f"{col_base(f)} (control mean)",
-                f"{col_base(f)} (control sd)",
-            ]
-            expanded_fields += [(f, 'int_mean'), (f, 'int_sd'), (f, 'ctrl_mean'), (f, 'ctrl_sd')]
-        elif f.field_type == 'baseline_categorical':
-            columns += [f"{col_base(f)} (intervention %)", f"{col_base(f)} (control %)"]
-            expanded_fields += [(f, 'int_pct'), (f, 'ctrl_pct')]
-        else:
-            columns.append(col_base(f))
-            expanded_fields.append((f, 'single'))
-
-    rows = []
-    for study in project.studies.order_by(Study.id.asc()).all():
-        row = {'Study': study.title, 'Author': study.author, 'Year': study.year}
-        data_map = {dv.form_field_id: dv.value for dv in study.data_values}
-        for f, kind in expanded_fields:
-            base = col_base(f)
-            raw = data_map.get(f.id)
-            parsed = None
-            if raw:
-                try:
-                    parsed = json.loads(raw)
-                except Exception:
-                    parsed = None
-            if kind == 'single':
-                row[f"{base}"] = raw
-            elif f.field_type == 'dichotomous_outcome':
-                if kind == 'events':
-                    row[f"{base} (events)"] = parsed.get('events') if parsed else None
-                else:
-                    row[f"{base} (total)"] = parsed.get('total') if parsed else None
-            elif f.field_type == 'baseline_continuous':
-                if kind == 'int_mean':
-                    row[f"{base} (intervention mean)"] = parsed.get('intervention', {}).get('mean') if parsed else None
-                elif kind == 'int_sd':
-                    row[f"{base} (intervention sd)"] = parsed.get('intervention', {}).get('sd') if parsed else None
-                elif kind == 'ctrl_mean':
-                    row[f"{base} (control mean)"] = parsed.get('control', {}).get('mean') if parsed else None
-                elif kind == 'ctrl_sd':
-                    row[f"{base} (control sd)"] = parsed.get('control', {}).get('sd') if parsed else None
-            elif f.field_type == 'baseline_categorical':
-                if kind == 'int_pct':
-                    row[f"{base} (intervention %)"] = parsed.get('intervention', {}).get('percent') if parsed else None
-                elif kind == 'ctrl_pct':
-                    row[f"{base} (control %)"] = parsed.get('control', {}).get('percent') if parsed else None
-        rows.append(row)
-
-    static_df = DataFrame(rows, columns=columns)
-
-    # Build outcome CSVs (same logic as export_outcomes)
-    outcome_columns = ['Study', 'Intervention_events', 'Intervention_total', 'Control_events', 'Control_Total']
-    outcomes_data = {}
-    studies = project.studies.order_by(Study.id.asc()).all()
-    for study in studies:
-        for num_outcome in study.numerical_outcomes.all():
-            name = (num_outcome.outcome_name or '').strip()
-            if not name:
-                continue
-            outcomes_data.setdefault(name, []).append({
-                'Study': study.title,
-                'Intervention_events': num_outcome.events_intervention,
-                'Intervention_total': num_outcome.total_intervention,
-                'Control_events': num_outcome.events_control,
-                'Control_Total': num_outcome.total_control,
-            })
-
-    # Create zip
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
-        # Write static CSV
-        sio = io.StringIO()
-        static_df.to_csv(sio, index=False)
-        sio.seek(0)
-        zf.writestr(f"{safe(project.name)}_Static_Fields.csv", sio.getvalue())
-
-        wrote_any_dich = False
-        for outcome_name, data_rows in outcomes_data.items():
-            if not data_rows:
-                continue
-            df = DataFrame(data_rows, columns=outcome_columns)
-            out_sio = io.StringIO()
-            df.to_csv(out_sio, index=False)
-            out_sio.seek(0)
-            zf.writestr(f"{safe(project.name)}_{safe(outcome_name)}_Dichotomous_Export.csv", out_sio.getvalue())
-            wrote_any_dich = True
-
-        # Continuous outcomes per outcome file
-        cont_columns = [
-            'Study', 'Intervention_mean', 'Intervention_sd', 'Intervention_n',
-            'Control_mean', 'Control_sd', 'Control_n',
-        ]
-        cont_data = {}
-        for study in studies:
-            for co in study.continuous_outcomes.all():
-                name = (co.outcome_name or '').strip()
-                if not name:
-                    continue
-                cont_data.setdefault(name, []).append({
-                    'Study': study.title,
-                    'Intervention_mean': co.mean_intervention,
-                    'Intervention_sd': co.sd_intervention,
-                    'Intervention_n': co.n_intervention,
-                    'Control_mean': co.mean_control,
-                    'Control_sd': co.sd_control,
-                    'Control_n': co.n_control,
-                })
-        wrote_any_cont = False
-        for outcome_name, data_rows in cont_data.items():
-            if not data_rows:
-                continue
-            cont_df = DataFrame(data_rows, columns=cont_columns)
-            csio = io.StringIO()
-            cont_df.to_csv(csio, index=False)
-            csio.seek(0)
-            zf.writestr(f"{safe(project.name)}_{safe(outcome_name)}_Continuous_Export.csv", csio.getvalue())
-            wrote_any_cont = True
-
-        if not wrote_any_dich and not wrote_any_cont:
-            zf.writestr(
-                "README_outcomes.txt",
-                "No outcomes found for this project.\n"
-                "The zip includes only the static fields CSV.\n",
-            )
-
-    zip_buffer.seek(0)
-    return send_file(
-        zip_buffer,
-        download_name=f"{safe(project.name)}_All_Data.zip",
-        as_attachment=True,
-        mimetype='application/zip',
-    )
+    if request.method == 'POST':
+        return _enqueue_export_job(project, 'all')
+    return _conditional_export(project, 'all', lambda: _export_response(project, 'all'))
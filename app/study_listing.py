@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from app import app, db
+from app.models import Study, StudyDataValue
+
+# The project_detail study list is keyset-paginated: each page is one query
+# ordered by (sort key, study id) and continues strictly after/before the
+# boundary row encoded in an opaque cursor, so deep pages cost the same as the
+# first one. The per-sort (project_id, key, id) indexes on Study serve these
+# queries directly; sorting by the Study ID value orders on an outer join.
+
+SORT_KEYS = ('id', 'year', 'author', 'study_id')
+
+
+@dataclass(frozen=True)
+class StudyPage:
+    studies: list
+    # study id -> "Study ID" field value, for the studies on this page only
+    study_id_map: dict
+    sort: str
+    direction: str
+    q: str
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+def _encode_cursor(sort: str, direction: str, towards: str, key, study_id: int) -> str:
+    payload = json.dumps({'s': sort, 'o': direction, 'd': towards, 'k': key, 'i': study_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str | None, sort: str, direction: str) -> dict | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    # A cursor only makes sense for the ordering it was issued for
+    if not isinstance(data, dict) or data.get('s') != sort or data.get('o') != direction:
+        return None
+    if data.get('d') not in ('after', 'before') or not isinstance(data.get('i'), int):
+        return None
+    return data
+
+
+def _escape_like(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def load_study_page(
+    project_id: int,
+    study_id_field_id: int | None = None,
+    sort: str = 'id',
+    direction: str = 'asc',
+    q: str | None = None,
+    cursor: str | None = None,
+    page_size: int | None = None,
+) -> StudyPage:
+    """Return one page of a project's studies in a single query.
+
+    ``q`` filters case-insensitively on title, author and the Study ID value.
+    Unknown sort keys or directions fall back to ascending id, and a cursor
+    issued for a different ordering is ignored (the first page is returned).
+    """
+    page_size = page_size or app.config['STUDY_PAGE_SIZE']
+    if sort not in SORT_KEYS or (sort == 'study_id' and study_id_field_id is None):
+        sort = 'id'
+    direction = direction if direction in ('asc', 'desc') else 'asc'
+    q = (q or '').strip()
+
+    if study_id_field_id is not None:
+        sid_value = StudyDataValue.value
+    else:
+        sid_value = db.literal(None, db.String)
+    sort_expr = {
+        'id': Study.id,
+        'year': Study.year,
+        'author': Study.author,
+        'study_id': db.func.coalesce(sid_value, ''),
+    }[sort]
+
+    stmt = db.select(Study, sid_value).where(Study.project_id == project_id)
+    if study_id_field_id is not None:
+        stmt = stmt.outerjoin(
+            StudyDataValue,
+            db.and_(StudyDataValue.study_id == Study.id, StudyDataValue.form_field_id == study_id_field_id),
+        )
+    if q:
+        pattern = f'%{_escape_like(q)}%'
+        conditions = [Study.title.ilike(pattern, escape='\\'), Study.author.ilike(pattern, escape='\\')]
+        if study_id_field_id is not None:
+            conditions.append(sid_value.ilike(pattern, escape='\\'))
+        stmt = stmt.where(db.or_(*conditions))
+
+    boundary = _decode_cursor(cursor, sort, direction)
+    backwards = bool(boundary and boundary['d'] == 'before')
+    ascending = (direction == 'asc') != backwards
+    if boundary:
+        if sort == 'id':
+            position = Study.id
+            value = boundary['i']
+        else:
+            position = db.tuple_(sort_expr, Study.id)
+            value = db.tuple_(db.literal(boundary['k']), db.literal(boundary['i']))
+        stmt = stmt.where(position > value if ascending else position < value)
+    if sort == 'id':
+        order = [Study.id.asc() if ascending else Study.id.desc()]
+    else:
+        order = [sort_expr.asc(), Study.id.asc()] if ascending else [sort_expr.desc(), Study.id.desc()]
+    rows = db.session.execute(stmt.order_by(*order).limit(page_size + 1)).all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    has_next = True if backwards else has_more
+    has_prev = has_more if backwards else boundary is not None
+
+    def key_of(study, sid):
+        return {'id': study.id, 'year': study.year, 'author': study.author, 'study_id': sid or ''}[sort]
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        study, sid = rows[-1]
+        next_cursor = _encode_cursor(sort, direction, 'after', key_of(study, sid), study.id)
+    if rows and has_prev:
+        study, sid = rows[0]
+        prev_cursor = _encode_cursor(sort, direction, 'before', key_of(study, sid), study.id)
+
+    return StudyPage(
+        studies=[study for study, _sid in rows],
+        study_id_map={study.id: sid for study, sid in rows if sid},
+        sort=sort,
+        direction=direction,
+        q=q,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+    )
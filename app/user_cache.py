@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from app import app, db
+from app.models import User
+
+# Flask-Login resolves the session's user on every request, including each
+# debounced autosave. Column snapshots of recently seen users are kept per
+# process for USER_CACHE_TTL_SECONDS and turned back into a session-attached
+# User without a SELECT. invalidate_user() drops the local copy and touches a
+# stamp file under the instance folder, which other gunicorn workers and the
+# CLI share, so password resets, admin promotion and deactivation take effect
+# everywhere on the next request.
+
+_cache: dict[int, tuple[float, dict]] = {}
+_cache_lock = threading.Lock()
+
+_COLUMN_KEYS = tuple(attr.key for attr in inspect(User).column_attrs)
+
+
+def _ttl() -> int:
+    return app.config['USER_CACHE_TTL_SECONDS']
+
+
+def _stamp_path(user_id: int) -> str:
+    return os.path.join(app.config['USER_CACHE_DIR'], str(int(user_id)))
+
+
+def _invalidated_since(user_id: int, cached_at: float) -> bool:
+    try:
+        return os.stat(_stamp_path(user_id)).st_mtime >= cached_at
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+
+
+def invalidate_user(user_id: int):
+    """Forget a cached user here and in every other process on this host."""
+    with _cache_lock:
+        _cache.pop(int(user_id), None)
+    try:
+        os.makedirs(app.config['USER_CACHE_DIR'], exist_ok=True)
+        with open(_stamp_path(user_id), 'a'):
+            pass
+        os.utime(_stamp_path(user_id))
+    except OSError:
+        app.logger.warning('Could not record user cache invalidation for %s', user_id, exc_info=True)
+
+
+def _from_snapshot(snapshot: dict) -> User:
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def load_cached_user(user_id: int) -> User | None:
+    user_id = int(user_id)
+    if _ttl() <= 0:
+        return db.session.get(User, user_id)
+    now = time.time()
+    with _cache_lock:
+        entry = _cache.get(user_id)
+    if entry is not None:
+        cached_at, snapshot = entry
+        if now - cached_at < _ttl() and not _invalidated_since(user_id, cached_at):
+            return _from_snapshot(snapshot)
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    snapshot = {key: getattr(user, key) for key in _COLUMN_KEYS}
+    with _cache_lock:
+        _cache[user_id] = (now, snapshot)
+    return user
+
+
+# Invalidate only once the change is committed: dropping the entry during the
+# flush would let another worker re-cache the old row before the commit lands.
+_PENDING_KEY = 'user_cache_invalidate'
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_write(_mapper, _connection, target):
+    session = object_session(target)
+    if session is None:
+        invalidate_user(target.id)
+        return
+    session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,6 +1,7 @@
 import yaml
 from app import db
 from app.models import CustomFormField
+from app.project_state import bump_project_version, shift_project_stats
 import json
 import os
 import smtplib
@@ -65,6 +66,7 @@ def _validate_template_data(template_data: dict):
 
 
 def _create_fields_from_template_data(project_id, template_data):
+    added = 0
     for idx, section_data in enumerate(template_data.get('sections', []), start=1):
         section_name = section_data.get('section_name')
         for field_data in section_data.get('fields', []):
@@ -80,6 +82,9 @@ def _create_fields_from_template_data(project_id, template_data):
                 options=json.dumps(options) if options is not None else None,
             )
             db.session.add(field)
+            added += 1
+    bump_project_version(project_id, form_changed=True)
+    shift_project_stats(project_id, field_count=added)
     db.session.commit()
 
 def load_template_and_create_form_fields(project_id, template_id):
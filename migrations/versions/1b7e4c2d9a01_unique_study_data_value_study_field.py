@@ -0,0 +1,35 @@
+"""Add unique (study_id, form_field_id) constraint to study_data_value
+
+Revision ID: 1b7e4c2d9a01
+Revises: b6d7e8f90123
+Create Date: 2026-10-17 09:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7e4c2d9a01'
+down_revision = 'b6d7e8f90123'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep only the most recent row per (study, field) before enforcing uniqueness
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        'DELETE FROM study_data_value WHERE id NOT IN ('
+        ' SELECT keep_id FROM ('
+        '  SELECT MAX(id) AS keep_id FROM study_data_value GROUP BY study_id, form_field_id'
+        ' ) AS latest'
+        ')'
+    ))
+    with op.batch_alter_table('study_data_value') as batch_op:
+        batch_op.create_unique_constraint('uq_study_data_value_study_field', ['study_id', 'form_field_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('study_data_value') as batch_op:
+        batch_op.drop_constraint('uq_study_data_value_study_field', type_='unique')
@@ -0,0 +1,31 @@
+"""Add data_version and data_updated_at columns to project
+
+Revision ID: 2c8f5d3e0b12
+Revises: 1b7e4c2d9a01
+Create Date: 2026-10-17 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8f5d3e0b12'
+down_revision = '1b7e4c2d9a01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('project') as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('data_updated_at', sa.DateTime(), nullable=True))
+
+    conn = op.get_bind()
+    conn.execute(sa.text('UPDATE project SET data_updated_at = created_at WHERE data_updated_at IS NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('project') as batch_op:
+        batch_op.drop_column('data_updated_at')
+        batch_op.drop_column('data_version')
@@ -0,0 +1,26 @@
+"""Add form_version column to project
+
+Revision ID: 3d9a6e4f1c23
+Revises: 2c8f5d3e0b12
+Create Date: 2026-10-17 14:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9a6e4f1c23'
+down_revision = '2c8f5d3e0b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('project') as batch_op:
+        batch_op.add_column(sa.Column('form_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('project') as batch_op:
+        batch_op.drop_column('form_version')
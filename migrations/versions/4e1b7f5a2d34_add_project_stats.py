@@ -0,0 +1,58 @@
+"""Add project_stats table with maintained per-project counters
+
+Revision ID: 4e1b7f5a2d34
+Revises: 3d9a6e4f1c23
+Create Date: 2026-10-17 16:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e1b7f5a2d34'
+down_revision = '3d9a6e4f1c23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'project_stats',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('study_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('field_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('dichotomous_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('continuous_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending_request_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id']),
+        sa.PrimaryKeyConstraint('project_id'),
+    )
+
+    # Backfill one row per existing project
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        """
+        INSERT INTO project_stats (
+            project_id, study_count, field_count, dichotomous_count,
+            continuous_count, pending_request_count, updated_at
+        )
+        SELECT
+            p.id,
+            (SELECT COUNT(*) FROM study s WHERE s.project_id = p.id),
+            (SELECT COUNT(*) FROM custom_form_field f WHERE f.project_id = p.id),
+            (SELECT COUNT(*) FROM study_numerical_outcome o
+                JOIN study s ON s.id = o.study_id WHERE s.project_id = p.id),
+            (SELECT COUNT(*) FROM study_continuous_outcome o
+                JOIN study s ON s.id = o.study_id WHERE s.project_id = p.id),
+            (SELECT COUNT(*) FROM form_change_request r
+                WHERE r.project_id = p.id AND r.status = 'pending'),
+            CURRENT_TIMESTAMP
+        FROM project p
+        """
+    ))
+
+
+def downgrade():
+    op.drop_table('project_stats')
@@ -0,0 +1,27 @@
+"""Add composite indexes for keyset pagination of studies
+
+Revision ID: 5f2c8a6b3e45
+Revises: 4e1b7f5a2d34
+Create Date: 2026-10-17 18:00:00.000000
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2c8a6b3e45'
+down_revision = '4e1b7f5a2d34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_study_project_id_id', 'study', ['project_id', 'id'])
+    op.create_index('ix_study_project_year_id', 'study', ['project_id', 'year', 'id'])
+    op.create_index('ix_study_project_author_id', 'study', ['project_id', 'author', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_study_project_author_id', table_name='study')
+    op.drop_index('ix_study_project_year_id', table_name='study')
+    op.drop_index('ix_study_project_id_id', table_name='study')
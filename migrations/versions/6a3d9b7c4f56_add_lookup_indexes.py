@@ -0,0 +1,40 @@
+"""Add composite and foreign-key lookup indexes
+
+Revision ID: 6a3d9b7c4f56
+Revises: 5f2c8a6b3e45
+Create Date: 2026-10-17 19:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a3d9b7c4f56'
+down_revision = '5f2c8a6b3e45'
+branch_labels = None
+depends_on = None
+
+# study_data_value (study_id, form_field_id) and project_membership
+# (user_id, project_id) are already covered by their unique constraints.
+INDEXES = [
+    ('ix_custom_form_field_project_section_sort', 'custom_form_field', ['project_id', 'section', 'sort_order']),
+    ('ix_study_data_value_form_field_id', 'study_data_value', ['form_field_id']),
+    ('ix_study_numerical_outcome_study_name', 'study_numerical_outcome', ['study_id', 'outcome_name']),
+    ('ix_study_continuous_outcome_study_name', 'study_continuous_outcome', ['study_id', 'outcome_name']),
+    ('ix_project_outcome_project_name', 'project_outcome', ['project_id', 'name']),
+    ('ix_project_membership_project_role', 'project_membership', ['project_id', 'role']),
+    ('ix_form_change_request_project_status', 'form_change_request', ['project_id', 'status']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')])
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user')
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,52 @@
+"""Add denormalized project_id to study_data_value
+
+Revision ID: 7b4e0c8d5a67
+Revises: 6a3d9b7c4f56
+Create Date: 2026-10-17 20:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4e0c8d5a67'
+down_revision = '6a3d9b7c4f56'
+branch_labels = None
+depends_on = None
+
+# Rows updated per backfill statement, so large tables are not rewritten in
+# one long-running UPDATE
+BACKFILL_BATCH_SIZE = 10000
+
+
+def upgrade():
+    with op.batch_alter_table('study_data_value') as batch_op:
+        batch_op.add_column(sa.Column('project_id', sa.Integer(), nullable=True))
+
+    conn = op.get_bind()
+    low, high = conn.execute(sa.text('SELECT MIN(id), MAX(id) FROM study_data_value')).one()
+    if low is not None:
+        for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+            conn.execute(
+                sa.text(
+                    'UPDATE study_data_value SET project_id = ('
+                    '  SELECT study.project_id FROM study WHERE study.id = study_data_value.study_id'
+                    ') WHERE id >= :start AND id < :stop'
+                ),
+                {'start': start, 'stop': start + BACKFILL_BATCH_SIZE},
+            )
+    # Values whose study no longer exists are unreachable; drop them
+    conn.execute(sa.text('DELETE FROM study_data_value WHERE project_id IS NULL'))
+
+    with op.batch_alter_table('study_data_value') as batch_op:
+        batch_op.alter_column('project_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_study_data_value_project_id', 'project', ['project_id'], ['id'])
+        batch_op.create_index('ix_study_data_value_project_field', ['project_id', 'form_field_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('study_data_value') as batch_op:
+        batch_op.drop_index('ix_study_data_value_project_field')
+        batch_op.drop_constraint('fk_study_data_value_project_id', type_='foreignkey')
+        batch_op.drop_column('project_id')
@@ -0,0 +1,91 @@
+"""Add typed value_num and value_json columns to study_data_value
+
+Revision ID: 8c5f1d9e6b78
+Revises: 7b4e0c8d5a67
+Create Date: 2026-10-17 21:00:00.000000
+"""
+
+import json
+import math
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8c5f1d9e6b78'
+down_revision = '7b4e0c8d5a67'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+# Field types mirrored into the typed columns at the time of this migration
+NUMERIC_FIELD_TYPES = {'integer'}
+JSON_FIELD_TYPES = {'dichotomous_outcome', 'baseline_continuous', 'baseline_categorical'}
+
+
+def _json_type():
+    return sa.JSON(none_as_null=True).with_variant(postgresql.JSONB(none_as_null=True), 'postgresql')
+
+
+def _typed(field_type, value):
+    value_num = value_json = None
+    if field_type in NUMERIC_FIELD_TYPES:
+        try:
+            value_num = float(value)
+        except ValueError:
+            pass
+        if value_num is not None and not math.isfinite(value_num):
+            value_num = None
+    elif field_type in JSON_FIELD_TYPES:
+        try:
+            value_json = json.loads(value)
+        except ValueError:
+            pass
+    return value_num, value_json
+
+
+def upgrade():
+    with op.batch_alter_table('study_data_value') as batch_op:
+        batch_op.add_column(sa.Column('value_num', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('value_json', _json_type(), nullable=True))
+
+    conn = op.get_bind()
+    values = sa.table(
+        'study_data_value',
+        sa.column('id', sa.Integer),
+        sa.column('value_num', sa.Float),
+        sa.column('value_json', _json_type()),
+    )
+    set_typed = (
+        values.update()
+        .where(values.c.id == sa.bindparam('row_id'))
+        .values(value_num=sa.bindparam('num'), value_json=sa.bindparam('doc', type_=_json_type()))
+    )
+    low, high = conn.execute(sa.text('SELECT MIN(id), MAX(id) FROM study_data_value')).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+        rows = conn.execute(
+            sa.text(
+                'SELECT v.id, f.field_type, v.value FROM study_data_value v '
+                'JOIN custom_form_field f ON f.id = v.form_field_id '
+                'WHERE v.id >= :start AND v.id < :stop AND v.value IS NOT NULL'
+            ),
+            {'start': start, 'stop': start + BACKFILL_BATCH_SIZE},
+        ).all()
+        updates = []
+        for row_id, field_type, value in rows:
+            num, doc = _typed(field_type, value)
+            if num is not None or doc is not None:
+                updates.append({'row_id': row_id, 'num': num, 'doc': doc})
+        if updates:
+            conn.execute(set_typed, updates)
+
+
+def downgrade():
+    with op.batch_alter_table('study_data_value') as batch_op:
+        batch_op.drop_column('value_json')
+        batch_op.drop_column('value_num')
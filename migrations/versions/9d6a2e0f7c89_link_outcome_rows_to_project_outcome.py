@@ -0,0 +1,57 @@
+"""Link outcome rows to project_outcome by id
+
+Revision ID: 9d6a2e0f7c89
+Revises: 8c5f1d9e6b78
+Create Date: 2026-10-17 22:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d6a2e0f7c89'
+down_revision = '8c5f1d9e6b78'
+branch_labels = None
+depends_on = None
+
+# outcome row table -> (ProjectOutcome.outcome_type it refers to, index name)
+OUTCOME_TABLES = {
+    'study_numerical_outcome': ('dichotomous', 'ix_study_numerical_outcome_outcome_study'),
+    'study_continuous_outcome': ('continuous', 'ix_study_continuous_outcome_outcome_study'),
+}
+
+
+def upgrade():
+    conn = op.get_bind()
+    for table, (outcome_type, index_name) in OUTCOME_TABLES.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('project_outcome_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(
+                f'fk_{table}_project_outcome_id', 'project_outcome',
+                ['project_outcome_id'], ['id'], ondelete='SET NULL',
+            )
+            batch_op.create_index(index_name, ['project_outcome_id', 'study_id'])
+
+        # Map names to the study's project outcomes of the same type, matching
+        # case-insensitively after trimming; the oldest outcome wins on ties
+        conn.execute(
+            sa.text(
+                f'UPDATE {table} SET project_outcome_id = ('
+                '  SELECT MIN(po.id) FROM project_outcome po'
+                '  JOIN study s ON s.project_id = po.project_id'
+                f'  WHERE s.id = {table}.study_id'
+                '    AND po.outcome_type = :outcome_type'
+                f'    AND lower(trim(po.name)) = lower(trim({table}.outcome_name))'
+                ')'
+            ),
+            {'outcome_type': outcome_type},
+        )
+
+
+def downgrade():
+    for table, (_outcome_type, index_name) in OUTCOME_TABLES.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(index_name)
+            batch_op.drop_constraint(f'fk_{table}_project_outcome_id', type_='foreignkey')
+            batch_op.drop_column('project_outcome_id')
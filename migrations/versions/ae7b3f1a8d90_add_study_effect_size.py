@@ -0,0 +1,141 @@
+"""Add study_effect_size table with stored per-study effect sizes
+
+Revision ID: ae7b3f1a8d90
+Revises: 9d6a2e0f7c89
+Create Date: 2026-10-17 23:00:00.000000
+"""
+
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ae7b3f1a8d90'
+down_revision = '9d6a2e0f7c89'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+# Effect size formulas at the time of this migration (app.effect_sizes);
+# `flask rebuild-effect-sizes` recomputes with the current ones
+ZERO_CELL_CORRECTION = 0.5
+
+
+def _dichotomous(a, n1, c, n2):
+    """measure -> (yi, vi) for one 2x2 table."""
+    if None in (a, n1, c, n2) or n1 <= 0 or n2 <= 0:
+        return {}
+    b, d = n1 - a, n2 - c
+    if min(a, b, c, d) < 0:
+        return {}
+    add = ZERO_CELL_CORRECTION if 0 in (a, b, c, d) else 0.0
+    ac, bc, cc, dc = a + add, b + add, c + add, d + add
+    n1c, n2c = ac + bc, cc + dc
+    p1c, p2c = ac / n1c, cc / n2c
+    effects = {'RD': (a / n1 - c / n2, p1c * (1 - p1c) / n1c + p2c * (1 - p2c) / n2c)}
+    if not ((a == 0 and c == 0) or (b == 0 and d == 0)):
+        effects['RR'] = (math.log(p1c / p2c), 1 / ac - 1 / n1c + 1 / cc - 1 / n2c)
+        effects['OR'] = (math.log((ac * dc) / (bc * cc)), 1 / ac + 1 / bc + 1 / cc + 1 / dc)
+    return effects
+
+
+def _continuous(m1, s1, n1, m2, s2, n2):
+    """measure -> (yi, vi) for one pair of arm summaries."""
+    if None in (m1, s1, n1, m2, s2, n2) or n1 < 1 or n2 < 1 or s1 < 0 or s2 < 0:
+        return {}
+    effects = {'MD': (m1 - m2, s1 ** 2 / n1 + s2 ** 2 / n2)}
+    df = n1 + n2 - 2
+    if df >= 1:
+        sd_pooled = math.sqrt(((n1 - 1) * s1 ** 2 + (n2 - 1) * s2 ** 2) / df)
+        if sd_pooled > 0:
+            g = (1 - 3 / (4 * df - 1)) * (m1 - m2) / sd_pooled
+            effects['SMD'] = (g, 1 / n1 + 1 / n2 + g * g / (2 * (n1 + n2)))
+    return effects
+
+
+# outcome row table -> (effect size column referencing it, value columns, formulas)
+OUTCOME_TABLES = {
+    'study_numerical_outcome': (
+        'numerical_outcome_id',
+        'events_intervention, total_intervention, events_control, total_control',
+        _dichotomous,
+    ),
+    'study_continuous_outcome': (
+        'continuous_outcome_id',
+        'mean_intervention, sd_intervention, n_intervention, mean_control, sd_control, n_control',
+        _continuous,
+    ),
+}
+
+
+def upgrade():
+    op.create_table(
+        'study_effect_size',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('study_id', sa.Integer(), nullable=False),
+        sa.Column('numerical_outcome_id', sa.Integer(), nullable=True),
+        sa.Column('continuous_outcome_id', sa.Integer(), nullable=True),
+        sa.Column('measure', sa.String(length=8), nullable=False),
+        sa.Column('yi', sa.Float(), nullable=False),
+        sa.Column('vi', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id']),
+        sa.ForeignKeyConstraint(['study_id'], ['study.id']),
+        sa.ForeignKeyConstraint(['numerical_outcome_id'], ['study_numerical_outcome.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['continuous_outcome_id'], ['study_continuous_outcome.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('numerical_outcome_id', 'measure', name='uq_study_effect_size_numerical_measure'),
+        sa.UniqueConstraint('continuous_outcome_id', 'measure', name='uq_study_effect_size_continuous_measure'),
+    )
+    op.create_index('ix_study_effect_size_project_measure', 'study_effect_size', ['project_id', 'measure'])
+    op.create_index('ix_study_effect_size_study_id', 'study_effect_size', ['study_id'])
+
+    conn = op.get_bind()
+    effect_sizes = sa.table(
+        'study_effect_size',
+        sa.column('project_id', sa.Integer),
+        sa.column('study_id', sa.Integer),
+        sa.column('numerical_outcome_id', sa.Integer),
+        sa.column('continuous_outcome_id', sa.Integer),
+        sa.column('measure', sa.String),
+        sa.column('yi', sa.Float),
+        sa.column('vi', sa.Float),
+    )
+    for table, (row_column, value_columns, formulas) in OUTCOME_TABLES.items():
+        low, high = conn.execute(sa.text(f'SELECT MIN(id), MAX(id) FROM {table}')).one()
+        if low is None:
+            continue
+        for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+            rows = conn.execute(
+                sa.text(
+                    f'SELECT o.id, o.study_id, s.project_id, {value_columns} FROM {table} o '
+                    'JOIN study s ON s.id = o.study_id '
+                    'WHERE o.id >= :start AND o.id < :stop'
+                ),
+                {'start': start, 'stop': start + BACKFILL_BATCH_SIZE},
+            ).all()
+            params = []
+            for row_id, study_id, project_id, *values in rows:
+                for measure, (yi, vi) in formulas(*values).items():
+                    if math.isfinite(yi) and math.isfinite(vi) and vi > 0:
+                        params.append({
+                            'project_id': project_id,
+                            'study_id': study_id,
+                            'numerical_outcome_id': None,
+                            'continuous_outcome_id': None,
+                            row_column: row_id,
+                            'measure': measure,
+                            'yi': yi,
+                            'vi': vi,
+                        })
+            if params:
+                conn.execute(effect_sizes.insert(), params)
+
+
+def downgrade():
+    op.drop_index('ix_study_effect_size_study_id', table_name='study_effect_size')
+    op.drop_index('ix_study_effect_size_project_measure', table_name='study_effect_size')
+    op.drop_table('study_effect_size')
@@ -0,0 +1,67 @@
+"""Add outcome_effect_stats and link stored effect sizes to project outcomes
+
+Revision ID: bf8c4a2e9d01
+Revises: ae7b3f1a8d90
+Create Date: 2026-10-17 23:30:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bf8c4a2e9d01'
+down_revision = 'ae7b3f1a8d90'
+branch_labels = None
+depends_on = None
+
+# study_effect_size column -> outcome row table it references
+ROW_COLUMNS = {
+    'numerical_outcome_id': 'study_numerical_outcome',
+    'continuous_outcome_id': 'study_continuous_outcome',
+}
+
+
+def upgrade():
+    with op.batch_alter_table('study_effect_size') as batch_op:
+        batch_op.add_column(sa.Column('project_outcome_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_study_effect_size_project_outcome_id', 'project_outcome',
+            ['project_outcome_id'], ['id'], ondelete='SET NULL',
+        )
+        batch_op.create_index('ix_study_effect_size_outcome_measure', ['project_outcome_id', 'measure'])
+
+    conn = op.get_bind()
+    # Only outcomes that still exist: SQLite does not enforce ON DELETE SET
+    # NULL, so an outcome row may name a deleted outcome's id
+    for column, table in ROW_COLUMNS.items():
+        conn.execute(sa.text(
+            f'UPDATE study_effect_size SET project_outcome_id = ('
+            f'  SELECT o.project_outcome_id FROM {table} o'
+            f'  JOIN project_outcome p ON p.id = o.project_outcome_id'
+            f'  WHERE o.id = study_effect_size.{column}'
+            f') WHERE {column} IS NOT NULL'
+        ))
+
+    # Rows are built from the stored effect sizes on first read
+    op.create_table(
+        'outcome_effect_stats',
+        sa.Column('project_outcome_id', sa.Integer(), nullable=False),
+        sa.Column('measure', sa.String(length=8), nullable=False),
+        sa.Column('k', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('sum_w', sa.Float(), server_default='0', nullable=False),
+        sa.Column('sum_wy', sa.Float(), server_default='0', nullable=False),
+        sa.Column('sum_wy2', sa.Float(), server_default='0', nullable=False),
+        sa.Column('sum_w2', sa.Float(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['project_outcome_id'], ['project_outcome.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_outcome_id', 'measure'),
+    )
+
+
+def downgrade():
+    op.drop_table('outcome_effect_stats')
+    with op.batch_alter_table('study_effect_size') as batch_op:
+        batch_op.drop_index('ix_study_effect_size_outcome_measure')
+        batch_op.drop_constraint('fk_study_effect_size_project_outcome_id', type_='foreignkey')
+        batch_op.drop_column('project_outcome_id')
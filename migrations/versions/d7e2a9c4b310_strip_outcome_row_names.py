@@ -0,0 +1,43 @@
+"""Strip surrounding whitespace from stored outcome row names
+
+Revision ID: d7e2a9c4b310
+Revises: bf8c4a2e9d01
+Create Date: 2026-10-18 10:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2a9c4b310'
+down_revision = 'bf8c4a2e9d01'
+branch_labels = None
+depends_on = None
+
+OUTCOME_TABLES = ('study_numerical_outcome', 'study_continuous_outcome')
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    # The forms strip names with str.strip() before saving; rows written
+    # before that keep their padding. SQL trim() only removes spaces, so the
+    # names are rewritten in Python to match the write paths exactly.
+    bind = op.get_bind()
+    for table in OUTCOME_TABLES:
+        rows = bind.execute(sa.text(f'SELECT id, outcome_name FROM {table}')).fetchall()
+        changed = [
+            {'id': row_id, 'name': name.strip()}
+            for row_id, name in rows
+            if name is not None and name != name.strip()
+        ]
+        for start in range(0, len(changed), BATCH_SIZE):
+            bind.execute(
+                sa.text(f'UPDATE {table} SET outcome_name = :name WHERE id = :id'),
+                changed[start:start + BATCH_SIZE],
+            )
+
+
+def downgrade():
+    # The original padding is not recoverable and was never meaningful
+    pass
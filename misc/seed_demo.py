@@ -10,6 +10,8 @@ from app.models import (
     User,
     ProjectMembership,
 )
+from app.effect_sizes import refresh_study_effect_sizes
+from app.project_state import bump_project_version, refresh_project_stats
 import json
 
 
@@ -111,7 +113,7 @@ def set_field_value(study: Study, field: CustomFormField, value_obj_or_str):
     if sdv:
         sdv.value = value_str
     else:
-        sdv = StudyDataValue(study_id=study.id, form_field_id=field.id, value=value_str)
+        sdv = StudyDataValue(study_id=study.id, project_id=study.project_id, form_field_id=field.id, value=value_str)
         db.session.add(sdv)
 
 
@@ -156,15 +158,19 @@ def seed():
     # Clear any prior rows to keep idempotence on rerun
     StudyNumericalOutcome.query.filter_by(study_id=s1.id).delete()
     StudyNumericalOutcome.query.filter_by(study_id=s2.id).delete()
-    db.session.add(StudyNumericalOutcome(study_id=s1.id, outcome_name=out_mortality.name, events_intervention=12, total_intervention=200, events_control=18, total_control=198))
-    db.session.add(StudyNumericalOutcome(study_id=s2.id, outcome_name=out_mortality.name, events_intervention=8, total_intervention=150, events_control=11, total_control=152))
+    db.session.add(StudyNumericalOutcome(study_id=s1.id, outcome_name=out_mortality.name, project_outcome_id=out_mortality.id, events_intervention=12, total_intervention=200, events_control=18, total_control=198))
+    db.session.add(StudyNumericalOutcome(study_id=s2.id, outcome_name=out_mortality.name, project_outcome_id=out_mortality.id, events_intervention=8, total_intervention=150, events_control=11, total_control=152))
 
     # Continuous outcomes (BMI)
     StudyContinuousOutcome.query.filter_by(study_id=s1.id).delete()
     StudyContinuousOutcome.query.filter_by(study_id=s2.id).delete()
-    db.session.add(StudyContinuousOutcome(study_id=s1.id, outcome_name=out_bmi.name, mean_intervention=27.4, sd_intervention=3.2, n_intervention=200, mean_control=27.1, sd_control=3.0, n_control=198))
-    db.session.add(StudyContinuousOutcome(study_id=s2.id, outcome_name=out_bmi.name, mean_intervention=28.0, sd_intervention=2.8, n_intervention=150, mean_control=27.9, sd_control=2.7, n_control=152))
+    db.session.add(StudyContinuousOutcome(study_id=s1.id, outcome_name=out_bmi.name, project_outcome_id=out_bmi.id, mean_intervention=27.4, sd_intervention=3.2, n_intervention=200, mean_control=27.1, sd_control=3.0, n_control=198))
+    db.session.add(StudyContinuousOutcome(study_id=s2.id, outcome_name=out_bmi.name, project_outcome_id=out_bmi.id, mean_intervention=28.0, sd_intervention=2.8, n_intervention=150, mean_control=27.9, sd_control=2.7, n_control=152))
 
+    refresh_study_effect_sizes(s1.id, project.id)
+    refresh_study_effect_sizes(s2.id, project.id)
+    bump_project_version(project.id, form_changed=True)
+    refresh_project_stats(project.id)
     db.session.commit()
     print(f"Seeded demo project '{project.name}' with 2 studies, baseline fields, and outcomes.")
     print(f"Login as owner: {OWNER_EMAIL} / {OWNER_PASSWORD}")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark SQL query counts and timings for the outcome exports.
+
+Seeds throwaway projects of increasing size into a temporary SQLite database
+and counts the statements issued while exporting them. The script exits with
+status 1 when a checked stage issues more queries for a larger project than
+for a smaller one, so it can be used as a regression check.
+
+Usage:
+  PYTHONPATH=. python scripts/bench_export_queries.py [--sizes 10,100,1000]
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+_TMPDIR = tempfile.mkdtemp(prefix='srma-bench-')
+atexit.register(shutil.rmtree, _TMPDIR, True)
+# Must be set before the app is imported so it binds to the scratch database
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_TMPDIR, 'bench.db')
+os.environ['SESSION_COOKIE_SECURE'] = '0'
+
+from sqlalchemy import event  # noqa: E402
+from app import app, db  # noqa: E402
+from app.models import (  # noqa: E402
+    CustomFormField,
+    Project,
+    Study,
+    StudyContinuousOutcome,
+    StudyDataValue,
+    StudyNumericalOutcome,
+    User,
+)
+from app.exports import legacy_dichotomous_tables  # noqa: E402
+
+LEGACY_FIELD_COUNT = 5
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def seed_project(n_studies: int, outcome_rows: bool = True) -> int:
+    """Create a project with legacy dichotomous fields per study.
+
+    With ``outcome_rows`` the studies also get numerical and continuous
+    outcome rows, which export_outcomes prefers; without them the route has
+    to take the legacy fallback.
+    """
+    project = Project(name=f"Bench {n_studies}{'' if outcome_rows else ' legacy'}")
+    db.session.add(project)
+    db.session.flush()
+    fields = []
+    for i in range(LEGACY_FIELD_COUNT):
+        f = CustomFormField(
+            project_id=project.id,
+            section='Outcomes',
+            section_order=1,
+            sort_order=i + 1,
+            label=f'Outcome {i + 1}',
+            field_type='dichotomous_outcome',
+        )
+        db.session.add(f)
+        fields.append(f)
+    db.session.flush()
+    studies = [
+        Study(title=f'Study {i}', author=f'Author {i}', year=2000 + (i % 25), project_id=project.id)
+        for i in range(n_studies)
+    ]
+    db.session.add_all(studies)
+    db.session.flush()
+    db.session.add_all([
+        StudyDataValue(
+            study=s,
+            project_id=project.id,
+            form_field=f,
+            value=json.dumps({'events': (s.id + f.id) % 10, 'total': 20}),
+        )
+        for s in studies
+        for f in fields
+    ])
+    if not outcome_rows:
+        db.session.commit()
+        return project.id
+    db.session.add_all([
+        StudyNumericalOutcome(
+            study_id=s.id,
+            outcome_name=name,
+            events_intervention=s.id % 7,
+            total_intervention=50,
+            events_control=s.id % 5,
+            total_control=50,
+        )
+        for s in studies
+        for name in ('Mortality', 'Sepsis')
+    ])
+    db.session.add_all([
+        StudyContinuousOutcome(
+            study_id=s.id,
+            outcome_name='Length of stay',
+            mean_intervention=5.0,
+            sd_intervention=1.5,
+            n_intervention=50,
+            mean_control=6.0,
+            sd_control=1.7,
+            n_control=50,
+        )
+        for s in studies
+    ])
+    db.session.commit()
+    return project.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count queries issued by outcome exports')
+    parser.add_argument('--sizes', default='10,100,1000', help='Comma-separated study counts')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    app.config['TESTING'] = True
+    results = []
+    with app.app_context():
+        db.create_all()
+        admin = User(name='Bench Admin', email='bench@example.com', is_admin=True)
+        admin.set_password('bench')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(admin_id)
+            sess['_fresh'] = True
+
+        def export_outcomes(project_id):
+            started = time.perf_counter()
+            with QueryCounter(db.engine) as route_q:
+                resp = client.get(f'/project/{project_id}/export_outcomes')
+                resp.get_data()
+            assert resp.status_code == 200, resp.status_code
+            return route_q.count, time.perf_counter() - started
+
+        for n in sizes:
+            legacy_id = seed_project(n, outcome_rows=False)
+            studies = Study.query.filter_by(project_id=legacy_id).order_by(Study.id.asc()).all()
+            with QueryCounter(db.engine) as legacy_q:
+                tables = legacy_dichotomous_tables(legacy_id, studies)
+            assert len(tables) == LEGACY_FIELD_COUNT
+            legacy_route, legacy_elapsed = export_outcomes(legacy_id)
+            route, elapsed = export_outcomes(seed_project(n))
+            results.append((n, legacy_q.count, legacy_route, route, legacy_elapsed + elapsed))
+
+    print(f"{'studies':>8} {'legacy tables':>14} {'route (legacy only)':>20} {'route (outcome rows)':>21} {'seconds':>8}")
+    for n, legacy, legacy_route, route, elapsed in results:
+        print(f'{n:>8} {legacy:>14} {legacy_route:>20} {route:>21} {elapsed:>8.3f}')
+
+    stages = (
+        (1, 'legacy fallback'),
+        (2, 'export_outcomes on a legacy-only project'),
+        (3, 'export_outcomes on a project with outcome rows'),
+    )
+    failed = False
+    for column, name in stages:
+        if len({row[column] for row in results}) > 1:
+            print(f'FAIL: {name} query count grows with study count')
+            failed = True
+    if failed:
+        return 1
+    print('OK: legacy fallback and export_outcomes run in a constant number of queries')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batched tau² estimators against a per-outcome loop.
+
+Simulates random-effects data for a growing number of analyses (outcomes x
+subgroups) with 2-40 studies each, then estimates tau² by REML and
+Paule-Mandel twice: with the batched estimators of app.analysis, which
+iterate every analysis in lockstep over flat arrays, and with the same
+iterations run one analysis at a time in a Python loop. Prints both timings
+and the largest difference between the two. Exits with status 1 when the
+results disagree or an analysis fails to converge, so it can be used as a
+regression check.
+
+Usage:
+  PYTHONPATH=. python scripts/bench_tau2.py [--sizes 100,1000,10000] [--seed 1]
+"""
+import argparse
+import os
+import sys
+import time
+
+# The app is imported for its analysis module only; nothing touches the database
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ['SESSION_COOKIE_SECURE'] = '0'
+
+import numpy as np  # noqa: E402
+from app.analysis import TAU2_MAX_ITERATIONS, TAU2_TOLERANCE, tau2_paule_mandel, tau2_reml  # noqa: E402
+
+# Agreement required between the batched and the looped estimates
+MAX_DIFFERENCE = 1e-8
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated numbers of analyses')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+def simulate(analyses: int, rng):
+    """Flat (y, v, group) arrays for ``analyses`` random-effects meta-analyses."""
+    k = rng.integers(2, 41, analyses)
+    group = np.repeat(np.arange(analyses), k)
+    tau2 = rng.choice([0.0, 0.02, 0.1, 0.5], analyses)
+    v = rng.uniform(0.01, 0.5, group.size)
+    y = rng.normal(0.2, np.sqrt(v + tau2[group]))
+    return y, v, group
+
+
+def _converged(old: float, new: float) -> bool:
+    return abs(new - old) <= TAU2_TOLERANCE * max(1.0, old)
+
+
+def reml_one(y, v) -> tuple:
+    """REML tau² of one analysis by Newton / Fisher scoring steps, started from DL."""
+    w = 1.0 / v
+    mu = (w * y).sum() / w.sum()
+    q = (w * (y - mu) ** 2).sum()
+    tau2 = max(0.0, (q - (len(y) - 1)) / (w.sum() - (w * w).sum() / w.sum()))
+    for _ in range(TAU2_MAX_ITERATIONS):
+        w = 1.0 / (v + tau2)
+        sw, sw2, sw3 = w.sum(), (w * w).sum(), (w ** 3).sum()
+        mu = (w * y).sum() / sw
+        r = y - mu
+        ypy = ((w * r) ** 2).sum()
+        yp3y = (w ** 3 * r * r).sum() - (w * w * r).sum() ** 2 / sw
+        trace_pp = sw2 - 2 * sw3 / sw + (sw2 / sw) ** 2
+        curvature = 2 * yp3y - trace_pp
+        step = (ypy - (sw - sw2 / sw)) / (curvature if curvature > 0 else trace_pp)
+        new = max(0.0, tau2 + step)
+        if _converged(tau2, new):
+            return new, True
+        tau2 = new
+    return tau2, False
+
+
+def paule_mandel_one(y, v) -> tuple:
+    """Paule-Mandel tau² of one analysis by Newton steps from zero."""
+    tau2 = 0.0
+    for _ in range(TAU2_MAX_ITERATIONS):
+        w = 1.0 / (v + tau2)
+        mu = (w * y).sum() / w.sum()
+        r = y - mu
+        q = (w * r * r).sum()
+        if tau2 == 0.0 and q <= len(y) - 1:
+            return 0.0, True
+        new = max(0.0, tau2 + (q - (len(y) - 1)) / ((w * r) ** 2).sum())
+        if _converged(tau2, new):
+            return new, True
+        tau2 = new
+    return tau2, False
+
+
+def run_batched(estimator, y, v, group, analyses):
+    start = time.perf_counter()
+    tau2, converged = estimator(y, v, group, analyses)
+    return tau2, converged, time.perf_counter() - start
+
+
+def run_looped(estimator, parts):
+    start = time.perf_counter()
+    results = [estimator(y, v) for y, v in parts]
+    elapsed = time.perf_counter() - start
+    tau2 = np.array([t for t, _c in results])
+    converged = np.array([c for _t, c in results])
+    return tau2, converged, elapsed
+
+
+def main() -> int:
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    methods = (('REML', tau2_reml, reml_one), ('PM', tau2_paule_mandel, paule_mandel_one))
+    failures = 0
+    print(f"{'method':<6} {'analyses':>9} {'rows':>8} {'batched ms':>11} {'loop ms':>9} {'speedup':>8} {'max diff':>9}")
+    for analyses in (int(size) for size in args.sizes.split(',')):
+        y, v, group = simulate(analyses, rng)
+        # Splitting the rows per analysis is not part of the timed loop
+        bounds = np.cumsum(np.bincount(group, minlength=analyses))[:-1]
+        parts = list(zip(np.split(y, bounds), np.split(v, bounds)))
+        for name, batched, looped in methods:
+            tau2_b, conv_b, time_b = run_batched(batched, y, v, group, analyses)
+            tau2_l, conv_l, time_l = run_looped(looped, parts)
+            difference = float(np.max(np.abs(tau2_b - tau2_l)))
+            ok = difference <= MAX_DIFFERENCE and conv_b.all() and conv_l.all()
+            failures += not ok
+            print(
+                f"{name:<6} {analyses:>9} {y.size:>8} {time_b * 1000:>11.1f} {time_l * 1000:>9.1f} "
+                f"{time_l / time_b:>7.1f}x {difference:>9.1e}{'' if ok else '  FAIL'}"
+            )
+    if failures:
+        print(f'{failures} run(s) where batched and looped estimates disagree or did not converge', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Check that deleting a declared outcome leaves no stored effect sizes behind.
+
+Seeds a throwaway project into a temporary SQLite database with one
+dichotomous and one continuous outcome, stores the studies' effect sizes and
+builds the outcomes' running sums, then deletes one outcome directly and the
+other through an approved change request. Asserts that no outcome row,
+study_effect_size row or outcome_effect_stats row still references either
+outcome, and that an outcome declared afterwards (which SQLite may give a
+freed id) starts from empty sums. Exits with status 1 when any check fails.
+
+Usage:
+  PYTHONPATH=. python scripts/check_effect_sizes.py [--studies 20]
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+_TMPDIR = tempfile.mkdtemp(prefix='srma-effects-')
+atexit.register(shutil.rmtree, _TMPDIR, True)
+# Must be set before the app is imported so it binds to the scratch database
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_TMPDIR, 'effects.db')
+os.environ['SESSION_COOKIE_SECURE'] = '0'
+
+from app import app, db  # noqa: E402
+from app.effect_sizes import get_outcome_effect_stats, refresh_study_effect_sizes  # noqa: E402
+from app.models import (  # noqa: E402
+    FormChangeRequest,
+    OutcomeEffectStats,
+    Project,
+    ProjectMembership,
+    ProjectOutcome,
+    Study,
+    StudyContinuousOutcome,
+    StudyEffectSize,
+    StudyNumericalOutcome,
+    User,
+)
+
+
+def seed_project(n_studies: int) -> tuple[int, int, int, int]:
+    """Create a project whose studies all report both outcomes.
+
+    Returns (project id, owner id, dichotomous outcome id, continuous outcome id).
+    """
+    owner = User(name='Check Owner', email='owner@example.com')
+    owner.set_password('check')
+    project = Project(name='Effect size check')
+    db.session.add_all([owner, project])
+    db.session.flush()
+    db.session.add(ProjectMembership(user_id=owner.id, project_id=project.id, role='owner'))
+    mortality = ProjectOutcome(project_id=project.id, name='Mortality', outcome_type='dichotomous')
+    pain = ProjectOutcome(project_id=project.id, name='Pain', outcome_type='continuous')
+    db.session.add_all([mortality, pain])
+    db.session.flush()
+    for i in range(n_studies):
+        study = Study(title=f'Study {i}', author=f'Author {i}', year=2000 + i % 25, project_id=project.id)
+        db.session.add(study)
+        db.session.flush()
+        db.session.add(StudyNumericalOutcome(
+            study_id=study.id,
+            outcome_name='Mortality',
+            project_outcome_id=mortality.id,
+            events_intervention=1 + i % 7,
+            total_intervention=50,
+            events_control=2 + i % 5,
+            total_control=50,
+        ))
+        db.session.add(StudyContinuousOutcome(
+            study_id=study.id,
+            outcome_name='Pain',
+            project_outcome_id=pain.id,
+            mean_intervention=4.0 + i % 3,
+            sd_intervention=1.5,
+            n_intervention=40,
+            mean_control=5.0,
+            sd_control=1.7,
+            n_control=40,
+        ))
+        refresh_study_effect_sizes(study.id, project.id)
+    db.session.commit()
+    for outcome_type in ('dichotomous', 'continuous'):
+        get_outcome_effect_stats(project.id, outcome_type)
+    return project.id, owner.id, mortality.id, pain.id
+
+
+def leftovers(outcome_id: int) -> dict[str, int]:
+    """Rows of each table that still reference ``outcome_id``."""
+    counts = {}
+    for name, column in (
+        ('study_numerical_outcome', StudyNumericalOutcome.project_outcome_id),
+        ('study_continuous_outcome', StudyContinuousOutcome.project_outcome_id),
+        ('study_effect_size', StudyEffectSize.project_outcome_id),
+        ('outcome_effect_stats', OutcomeEffectStats.project_outcome_id),
+    ):
+        counts[name] = db.session.scalar(db.select(db.func.count()).where(column == outcome_id))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check outcome deletes against stored effect sizes')
+    parser.add_argument('--studies', type=int, default=20, help='Studies in the seeded project')
+    args = parser.parse_args()
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    failures = 0
+
+    def check(description: str, ok: bool, detail=''):
+        nonlocal failures
+        failures += not ok
+        print(f"  [{'ok' if ok else 'FAIL'}] {description}{': ' if detail else ''}{detail}")
+
+    with app.app_context():
+        db.create_all()
+        project_id, owner_id, mortality_id, pain_id = seed_project(args.studies)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(owner_id)
+            sess['_fresh'] = True
+
+        before = leftovers(mortality_id)
+        check(
+            'seeded effect sizes and sums reference the outcome',
+            before['study_effect_size'] > 0 and before['outcome_effect_stats'] > 0,
+            before,
+        )
+
+        resp = client.post(f'/project/{project_id}/outcomes/{mortality_id}/delete')
+        check('outcome deleted directly', resp.status_code == 302, resp.status_code)
+        counts = leftovers(mortality_id)
+        check('no rows left after a direct delete', not any(counts.values()), counts)
+
+        req = FormChangeRequest(
+            project_id=project_id,
+            requested_by=owner_id,
+            action_type='delete_outcome',
+            payload=json.dumps({'outcome_id': pain_id}),
+            status='pending',
+        )
+        db.session.add(req)
+        db.session.commit()
+        resp = client.post(f'/project/{project_id}/requests/{req.id}/approve')
+        check('outcome deleted by an approved request', resp.status_code == 302, resp.status_code)
+        db.session.expire_all()
+        counts = leftovers(pain_id)
+        check('no rows left after an approved delete', not any(counts.values()), counts)
+
+        kept = db.session.scalar(
+            db.select(db.func.count()).select_from(StudyEffectSize).where(StudyEffectSize.project_id == project_id)
+        )
+        check('effect sizes of the unlinked rows are kept', kept > 0, kept)
+
+        stroke = ProjectOutcome(project_id=project_id, name='Stroke', outcome_type='dichotomous')
+        db.session.add(stroke)
+        db.session.commit()
+        stats = get_outcome_effect_stats(project_id, 'dichotomous')
+        sums = {measure: k for outcome_id, measure, k, *_sums in stats if outcome_id == stroke.id}
+        check(
+            f'outcome declared afterwards (id {stroke.id}) starts empty',
+            bool(sums) and not any(sums.values()),
+            sums,
+        )
+
+    if failures:
+        print(f'{failures} check(s) failed', file=sys.stderr)
+        return 1
+    print('OK: deleting an outcome leaves no effect sizes or running sums behind')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
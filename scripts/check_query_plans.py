@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Check that the hot lookups of the app are served by indexes.
+
+Builds the schema with the Alembic migrations (so the migrations themselves
+are what is being checked), then runs EXPLAIN on the statements the routes
+issue for study listings, data entry, membership checks, change requests and
+logins, and asserts each plan searches the expected index instead of scanning
+the table. Exits with status 1 when any plan does not.
+
+By default a temporary SQLite database is used. Pass --database-url to check
+a PostgreSQL database instead; it must be an empty scratch database, as the
+migrations are applied to it. Sequential scans are disabled for the session
+there, since on empty tables the planner would otherwise never pick an index.
+
+Usage:
+  PYTHONPATH=. python scripts/check_query_plans.py [--database-url URL]
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Scratch database to migrate and check (default: temporary SQLite)')
+    return parser.parse_args()
+
+
+args = parse_args()
+if args.database_url:
+    os.environ['DATABASE_URL'] = args.database_url
+else:
+    _TMPDIR = tempfile.mkdtemp(prefix='srma-plans-')
+    atexit.register(shutil.rmtree, _TMPDIR, True)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_TMPDIR, 'plans.db')
+# Must be set before the app is imported so it binds to the scratch database
+os.environ['SESSION_COOKIE_SECURE'] = '0'
+
+from flask_migrate import upgrade  # noqa: E402
+from sqlalchemy import exc, inspect  # noqa: E402
+from app import app, db  # noqa: E402
+from app.models import (  # noqa: E402
+    CustomFormField,
+    FormChangeRequest,
+    ProjectMembership,
+    ProjectOutcome,
+    Study,
+    StudyContinuousOutcome,
+    StudyDataValue,
+    StudyEffectSize,
+    StudyNumericalOutcome,
+    User,
+)
+
+# SQLite cannot reflect expression indexes such as lower(email); reflection
+# here and in batch migrations warns about it on every run
+warnings.filterwarnings('ignore', message='.*expression-based index', category=exc.SAWarning)
+
+
+def planned_statements():
+    """(description, statement, acceptable index names) for each checked lookup."""
+    select, func = db.select, db.func
+    return [
+        ('study list by id',
+         select(Study).where(Study.project_id == 1).order_by(Study.id).limit(51),
+         {'ix_study_project_id_id'}),
+        ('study list by year',
+         select(Study).where(Study.project_id == 1).order_by(Study.year, Study.id).limit(51),
+         {'ix_study_project_year_id'}),
+        ('study list by author',
+         select(Study).where(Study.project_id == 1).order_by(Study.author, Study.id).limit(51),
+         {'ix_study_project_author_id'}),
+        ('field values of a study',
+         select(StudyDataValue).where(StudyDataValue.study_id == 1),
+         {'uq_study_data_value_study_field'}),
+        ('values of selected fields',
+         select(StudyDataValue)
+         .where(StudyDataValue.project_id == 1, StudyDataValue.form_field_id.in_([1, 2, 3])),
+         {'ix_study_data_value_project_field'}),
+        ('all values of a project',
+         select(StudyDataValue.study_id, StudyDataValue.form_field_id, StudyDataValue.value)
+         .where(StudyDataValue.project_id == 1),
+         {'ix_study_data_value_project_field'}),
+        ('next sort order in a section',
+         select(func.max(CustomFormField.sort_order))
+         .where(CustomFormField.project_id == 1, CustomFormField.section == 'General'),
+         {'ix_custom_form_field_project_section_sort'}),
+        ('membership of a user',
+         select(ProjectMembership).where(ProjectMembership.user_id == 1, ProjectMembership.project_id == 1),
+         {'uq_membership_user_project'}),
+        ('owners of a project',
+         select(func.count()).select_from(ProjectMembership)
+         .where(ProjectMembership.project_id == 1, ProjectMembership.role == 'owner'),
+         {'ix_project_membership_project_role'}),
+        ('pending change requests',
+         select(func.count()).select_from(FormChangeRequest)
+         .where(FormChangeRequest.project_id == 1, FormChangeRequest.status == 'pending'),
+         {'ix_form_change_request_project_status'}),
+        ('login by email',
+         select(User).where(func.lower(User.email) == 'someone@example.org'),
+         {'ix_user_email_lower'}),
+        ('dichotomous outcome of a study',
+         select(StudyNumericalOutcome)
+         .where(StudyNumericalOutcome.study_id == 1, StudyNumericalOutcome.outcome_name == 'Mortality'),
+         {'ix_study_numerical_outcome_study_name'}),
+        ('continuous outcome of a study',
+         select(StudyContinuousOutcome)
+         .where(StudyContinuousOutcome.study_id == 1, StudyContinuousOutcome.outcome_name == 'Pain'),
+         {'ix_study_continuous_outcome_study_name'}),
+        ('dichotomous rows of an outcome',
+         select(StudyNumericalOutcome)
+         .where(StudyNumericalOutcome.project_outcome_id == 1)
+         .order_by(StudyNumericalOutcome.study_id),
+         {'ix_study_numerical_outcome_outcome_study'}),
+        ('continuous rows of an outcome',
+         select(StudyContinuousOutcome)
+         .where(StudyContinuousOutcome.project_outcome_id == 1)
+         .order_by(StudyContinuousOutcome.study_id),
+         {'ix_study_continuous_outcome_outcome_study'}),
+        ('project outcomes by name',
+         select(ProjectOutcome).where(ProjectOutcome.project_id == 1).order_by(ProjectOutcome.name),
+         {'ix_project_outcome_project_name'}),
+        ('effect sizes of a project',
+         select(StudyEffectSize.numerical_outcome_id, StudyEffectSize.measure, StudyEffectSize.yi, StudyEffectSize.vi)
+         .where(StudyEffectSize.project_id == 1, StudyEffectSize.measure.in_(['RR', 'OR', 'RD'])),
+         {'ix_study_effect_size_project_measure'}),
+        ('effect sizes of a study',
+         select(StudyEffectSize.id)
+         .where(StudyEffectSize.study_id == 1, StudyEffectSize.measure.in_(['MD', 'SMD'])),
+         {'ix_study_effect_size_study_id'}),
+        ('effect sizes of outcomes',
+         select(StudyEffectSize.project_outcome_id, StudyEffectSize.measure, func.count())
+         .where(StudyEffectSize.project_outcome_id.in_([1, 2]))
+         .group_by(StudyEffectSize.project_outcome_id, StudyEffectSize.measure),
+         {'ix_study_effect_size_outcome_measure'}),
+    ]
+
+
+def sqlite_constraint_indexes(conn) -> dict:
+    """Map unique constraint names to the sqlite_autoindex_* backing them."""
+    aliases = {}
+    inspector = inspect(conn)
+    for table in inspector.get_table_names():
+        by_columns = {
+            tuple(uc['column_names']): uc['name']
+            for uc in inspector.get_unique_constraints(table)
+            if uc.get('name')
+        }
+        for row in conn.exec_driver_sql(f'PRAGMA index_list("{table}")').mappings():
+            if row['origin'] != 'u':
+                continue
+            columns = tuple(
+                info['name']
+                for info in conn.exec_driver_sql(f'PRAGMA index_info("{row["name"]}")').mappings()
+            )
+            if columns in by_columns:
+                aliases[by_columns[columns]] = row['name']
+    return aliases
+
+
+def explain(conn, sql: str) -> str:
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).all()
+        return '\n'.join(row[-1] for row in rows)
+    return '\n'.join(row[0] for row in conn.exec_driver_sql('EXPLAIN ' + sql).all())
+
+
+def main() -> int:
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        failures = 0
+        with db.engine.connect() as conn:
+            dialect = conn.dialect
+            aliases = sqlite_constraint_indexes(conn) if dialect.name == 'sqlite' else {}
+            if dialect.name == 'postgresql':
+                conn.exec_driver_sql('SET enable_seqscan = off')
+            print(f'Checking query plans on {dialect.name}')
+            for description, stmt, expected in planned_statements():
+                sql = str(stmt.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+                plan = explain(conn, sql)
+                names = {aliases.get(name, name) for name in expected}
+                ok = any(name in plan for name in names)
+                failures += not ok
+                print(f"  [{'ok' if ok else 'FAIL'}] {description}: {' | '.join(plan.splitlines())}")
+        if failures:
+            print(f'{failures} lookup(s) not served by the expected index', file=sys.stderr)
+            return 1
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())